@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# 网络配置采集模块: 一次调用读取全局地址、默认网关和DNS服务器
+# 代替原来network_scan.yml中的ping和三个shell任务; 结果的指纹和变化检测由控制节点
+# (utils/network_inventory.py)完成。
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+module: network_probe
+short_description: 读取主机的全局IP地址、默认网关和DNS服务器
+'''
+
+import socket
+import struct
+
+from ansible.module_utils.basic import AnsibleModule
+
+# /proc/net/route中flags的RTF_UP | RTF_GATEWAY
+RTF_UP_GATEWAY = 0x0003
+
+
+def read_addresses(module):
+    """ip -o addr show scope global中的inet/inet6地址(CIDR形式)"""
+    ip = module.get_bin_path('ip')
+    if not ip:
+        return []
+    rc, out, _ = module.run_command([ip, '-o', 'addr', 'show', 'scope', 'global'])
+    if rc != 0:
+        return []
+    addresses = []
+    for line in out.splitlines():
+        fields = line.split()
+        for i, field in enumerate(fields[:-1]):
+            if field in ('inet', 'inet6'):
+                addresses.append(fields[i + 1])
+    return addresses
+
+
+def read_gateway():
+    """/proc/net/route中第一条默认路由的网关"""
+    try:
+        with open('/proc/net/route') as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if len(fields) < 4 or fields[1] != '00000000':
+                    continue
+                if int(fields[3], 16) & RTF_UP_GATEWAY != RTF_UP_GATEWAY:
+                    continue
+                return socket.inet_ntoa(struct.pack('<L', int(fields[2], 16)))
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def read_dns():
+    servers = []
+    try:
+        with open('/etc/resolv.conf') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    servers.append(fields[1])
+    except (IOError, OSError):
+        pass
+    return servers
+
+
+def main():
+    module = AnsibleModule(argument_spec=dict(), supports_check_mode=True)
+    module.exit_json(changed=False, network={
+        "ip": read_addresses(module),
+        "gateway": read_gateway(),
+        "dns": read_dns()
+    })
+
+
+if __name__ == '__main__':
+    main()
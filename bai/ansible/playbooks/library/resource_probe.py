@@ -0,0 +1,138 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# 资源采集模块: 一次读取/proc和statvfs, 返回原始计数器
+# CPU使用率和网络速率需要两次采样的差值, 由控制节点(utils/resource_collector.py)计算,
+# 目标主机上不保存任何状态, 也不运行top等需要等待采样周期的命令。
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+module: resource_probe
+short_description: 读取CPU、内存、负载、磁盘和网络计数器
+options:
+  fstypes_exclude:
+    description: 不统计的文件系统类型(伪文件系统、只读镜像等), 挂载在/的文件系统总是统计
+    type: list
+    elements: str
+'''
+
+import os
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+DEFAULT_FSTYPES_EXCLUDE = [
+    'proc', 'sysfs', 'devtmpfs', 'devpts', 'tmpfs', 'cgroup', 'cgroup2', 'pstore', 'bpf', 'securityfs',
+    'debugfs', 'tracefs', 'configfs', 'fusectl', 'mqueue', 'hugetlbfs', 'autofs', 'binfmt_misc',
+    'rpc_pipefs', 'nsfs', 'squashfs', 'overlay', 'ramfs', 'efivarfs', 'selinuxfs', 'fuse.lxcfs'
+]
+
+
+def read_cpu():
+    """/proc/stat中的cpu行: 总计和每个核心的jiffies(user nice system idle iowait irq softirq steal)"""
+    total = None
+    cores = []
+    with open('/proc/stat') as f:
+        for line in f:
+            if not line.startswith('cpu'):
+                break
+            fields = line.split()
+            values = [int(v) for v in fields[1:9]]
+            if fields[0] == 'cpu':
+                total = values
+            else:
+                cores.append(values)
+    return {"total": total, "cores": cores}
+
+
+def read_memory():
+    info = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            info[key] = int(value.split()[0])
+    available = info.get('MemAvailable')
+    if available is None:
+        # 3.14之前的内核没有MemAvailable
+        available = info.get('MemFree', 0) + info.get('Buffers', 0) + info.get('Cached', 0)
+    return {
+        "total_kb": info.get('MemTotal', 0),
+        "available_kb": available,
+        "swap_total_kb": info.get('SwapTotal', 0),
+        "swap_free_kb": info.get('SwapFree', 0)
+    }
+
+
+def read_load():
+    with open('/proc/loadavg') as f:
+        return [float(v) for v in f.read().split()[:3]]
+
+
+def read_disks(exclude):
+    disks = []
+    seen = set()
+    with open('/proc/mounts') as f:
+        for line in f:
+            fields = line.split()
+            device, mount, fstype = fields[0], fields[1].replace('\\040', ' '), fields[2]
+            # 同一设备多次挂载(bind mount)只统计一次; 根文件系统不论类型都统计(容器中为overlay)
+            if (fstype in exclude and mount != '/') or device in seen:
+                continue
+            try:
+                st = os.statvfs(mount)
+            except OSError:
+                continue
+            if st.f_blocks == 0:
+                continue
+            seen.add(device)
+            disks.append({
+                "mount": mount,
+                "fstype": fstype,
+                "total": st.f_blocks * st.f_frsize,
+                "used": (st.f_blocks - st.f_bfree) * st.f_frsize,
+                "available": st.f_bavail * st.f_frsize
+            })
+    return disks
+
+
+def read_network():
+    interfaces = {}
+    with open('/proc/net/dev') as f:
+        for line in f.readlines()[2:]:
+            name, _, data = line.partition(':')
+            name = name.strip()
+            if name == 'lo':
+                continue
+            fields = [int(v) for v in data.split()]
+            interfaces[name] = {
+                "rx_bytes": fields[0],
+                "rx_packets": fields[1],
+                "tx_bytes": fields[8],
+                "tx_packets": fields[9]
+            }
+    return interfaces
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            fstypes_exclude=dict(type='list', elements='str', default=DEFAULT_FSTYPES_EXCLUDE)
+        ),
+        supports_check_mode=True
+    )
+    try:
+        probe = {
+            "time": time.time(),
+            "cpu": read_cpu(),
+            "memory": read_memory(),
+            "load": read_load(),
+            "disks": read_disks(set(module.params['fstypes_exclude'])),
+            "network": read_network()
+        }
+    except (OSError, IOError, ValueError, IndexError) as e:
+        module.fail_json(msg="读取资源信息失败: {0}".format(e))
+    module.exit_json(changed=False, probe=probe)
+
+
+if __name__ == '__main__':
+    main()
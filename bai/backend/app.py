@@ -1,13 +1,29 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, g, request, jsonify, render_template, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
 import json
 import re
 import time
-import hashlib
+import tempfile
 from werkzeug.utils import secure_filename
-from utils.ansible_runner import AnsibleRunner
+from utils.ansible_runner import AnsibleRunner, STRATEGIES
 from utils.auth import auth_manager, require_auth
+from utils.resource_collector import ResourceCollector
+from utils.metrics_store import MetricsStore
+from utils.event_bus import EventBus
+from utils.reachability import ReachabilitySweeper
+from utils.discovery import NetworkDiscovery, parse_targets, inventory_addresses, diff_inventory
+from utils.network_inventory import NetworkInventory
+from utils.power_watcher import PowerWatcher
+from utils.inventory import InventoryError, public_record
+from utils.job_manager import JobManager, JobLimitError
+from utils.artifact_store import ArtifactStore
+from utils.fanout import FanoutDistributor
+from utils.command_cache import CommandCache
+from utils.ansible_results import add_task_result, render_adhoc_host
+from utils.chunked_upload import ChunkedUploadStore, UploadError, UploadNotFound, UploadOffsetError
+from utils.shared_state import SharedState, LeaderElection
+from utils.telemetry import registry, Registry, SnapshotPublisher, PARSE_DURATION
 
 app = Flask(__name__, 
            template_folder='../frontend/templates',
@@ -29,9 +45,152 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# 树形分发时目标主机上临时HTTP中继服务的端口
+FANOUT_PORT = int(os.environ.get('FANOUT_PORT', 8765))
+
+# 分片上传: 分片直接写入磁盘, 支持断点续传, 不受MAX_CONTENT_LENGTH限制
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+chunked_uploads = ChunkedUploadStore(
+    os.path.join(app.config['UPLOAD_FOLDER'], 'chunks'),
+    max_size=int(os.environ.get('UPLOAD_MAX_SIZE', 4 * 1024 ** 3)),
+    max_chunk=UPLOAD_CHUNK_SIZE
+)
+
 # 初始化Ansible运行器
 ansible_runner = AnsibleRunner()
 
+# 多工作进程部署(gunicorn)时的共享状态: 任务登记表、资源采集快照和主进程选举;
+# 未设置SHARED_STATE_DB时为单进程模式, 所有状态都在进程内
+SHARED_STATE_DB = os.environ.get('SHARED_STATE_DB', '')
+shared_state = SharedState(SHARED_STATE_DB) if SHARED_STATE_DB else None
+leader_election = LeaderElection(
+    shared_state, ttl=int(os.environ.get('LEADER_LEASE_TTL', 15))
+) if shared_state else None
+
+# 上传文件按内容SHA-256存储, 重复上传和重复分发不再传输相同内容;
+# 多工作进程时pin状态记录在共享状态中, 一个进程清理容量时不会删除其他进程正在分发的文件
+artifact_store = ArtifactStore(
+    os.path.join(app.config['UPLOAD_FOLDER'], 'artifacts'),
+    max_bytes=int(os.environ.get('ARTIFACT_STORE_MAX_BYTES', 10 * 1024 ** 3)),
+    shared=shared_state
+)
+
+# 后台任务: 长时间的命令/上传/关机不占用请求线程, 也不受同步请求的超时限制
+job_manager = JobManager(
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    per_user_limit=int(os.environ.get('JOB_PER_USER_LIMIT', 2)),
+    max_queued=int(os.environ.get('JOB_MAX_QUEUED', 100)),
+    registry=shared_state
+)
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 3600))
+
+# inventory索引, 文件变化时才重新解析
+inventory = ansible_runner.inventory
+
+# /api/command中只读命令的结果缓存(请求中带cache时使用), 按主机保存
+command_cache = CommandCache(
+    ttl=int(os.environ.get('COMMAND_CACHE_TTL', 30)),
+    max_entries=int(os.environ.get('COMMAND_CACHE_MAX_ENTRIES', 10000))
+)
+
+# 快速连通性检测(ICMP/TCP), 不经过SSH
+reachability_sweeper = ReachabilitySweeper(
+    method=os.environ.get('PING_METHOD', 'auto'),
+    port=int(os.environ.get('PING_PORT', 22)),
+    timeout=float(os.environ.get('PING_TIMEOUT', 2)),
+    concurrency=int(os.environ.get('PING_CONCURRENCY', 512))
+)
+
+# 网段扫描(发现新主机)的默认参数, 可在请求中覆盖(速率和超时不超过这里的上限)
+DISCOVERY_RATE = int(os.environ.get('DISCOVERY_RATE', 2000))
+DISCOVERY_TIMEOUT = float(os.environ.get('DISCOVERY_TIMEOUT', 1))
+DISCOVERY_CONCURRENCY = int(os.environ.get('DISCOVERY_CONCURRENCY', 512))
+DISCOVERY_MAX_ADDRESSES = int(os.environ.get('DISCOVERY_MAX_ADDRESSES', 4 * 65536))
+
+# 推送给浏览器的实时事件(SSE)
+event_bus = EventBus()
+
+# 关机命令下发后在服务端跟踪各主机的实际状态, 结果通过事件流推送
+power_watcher = PowerWatcher(
+    reachability_sweeper,
+    ports=inventory.ports,
+    timeout=int(os.environ.get('POWER_WATCH_TIMEOUT', 600)),
+    event_bus=event_bus,
+    shared=shared_state,
+    election=leader_election
+)
+
+# 后台资源采集器, 所有请求共享同一份快照
+resource_collector = ResourceCollector(
+    ansible_runner,
+    interval=int(os.environ.get('RESOURCE_POLL_INTERVAL', 30)),
+    stale_after=int(os.environ.get('RESOURCE_STALE_AFTER', 0)) or None,
+    event_bus=event_bus,
+    shared=shared_state,
+    election=leader_election
+)
+
+# 资源历史数据, 每轮采集完成后写入
+metrics_store = MetricsStore(
+    raw_step=resource_collector.interval,
+    raw_retention=int(os.environ.get('METRICS_RAW_RETENTION', 2 * 3600)),
+    minute_retention=int(os.environ.get('METRICS_1M_RETENTION', 24 * 3600)),
+    hour_retention=int(os.environ.get('METRICS_1H_RETENTION', 30 * 86400))
+)
+resource_collector.add_listener(metrics_store.record_snapshot)
+
+# 网络配置(地址、网关、DNS)很少变化: 后台按较长的间隔全量刷新, /api/network读取保存的结果
+network_inventory = NetworkInventory(
+    ansible_runner,
+    interval=int(os.environ.get('NETWORK_REFRESH_INTERVAL', 3600)),
+    shared=shared_state,
+    election=leader_election
+)
+
+# Prometheus指标(/metrics): 接口延迟、Ansible执行耗时与结果、解析耗时、队列深度和缓存命中;
+# 多进程部署时各进程定期把指标写入共享状态, 任一进程导出所有进程的合计
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+metrics_publisher = SnapshotPublisher(
+    registry, shared_state, interval=int(os.environ.get('METRICS_FLUSH_INTERVAL', 10))
+) if shared_state else None
+HTTP_DURATION = registry.histogram(
+    'dashboard_http_request_duration_seconds', 'HTTP请求处理耗时(流式响应只计到开始发送)', ('method', 'route')
+)
+HTTP_REQUESTS = registry.counter(
+    'dashboard_http_requests_total', 'HTTP请求数, 按状态码统计', ('method', 'route', 'status')
+)
+registry.gauge(
+    'dashboard_jobs', '后台任务队列中排队和执行中的任务数', ('state',),
+    callback=lambda: {(key,): job_manager.stats()[key] for key in ('queued', 'running')}
+)
+registry.gauge(
+    'dashboard_power_watch_hosts', '进行中的关机跟踪按主机状态计数(只由执行检测的主进程导出)', ('state',),
+    callback=lambda: {(state,): count for state, count in power_watcher.state_counts().items()}
+    if power_watcher.is_leader() else {}
+)
+registry.counter(
+    'dashboard_command_cache_lookups_total', '/api/command结果缓存的查询次数(按主机计)', ('result',),
+    callback=lambda: {('hit',): command_cache.hits, ('miss',): command_cache.misses}
+)
+registry.gauge(
+    'dashboard_sse_subscribers', '订阅实时事件(SSE)的浏览器连接数',
+    callback=lambda: {(): event_bus.subscriber_count()}
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # 按路由模板统计(/api/hosts/<host_ip>), 避免每台主机一个标签
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_DURATION.observe(time.perf_counter() - started, method=request.method, route=route)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
 @app.route('/')
 def index():
     """主页"""
@@ -62,76 +221,114 @@ def logout():
     auth_manager.logout(token)
     return jsonify({"message": "登出成功"})
 
-@app.route('/api/ping', methods=['GET'])
-def ping_hosts():
-    """ping所有主机"""
-    result = ansible_runner.ping_all_hosts()
-    
-    # 即使有主机离线(返回码非0)，只要有输出就尝试解析
-    if result["stdout"].strip():
-        try:
-            hosts_status = ansible_runner.parse_ping_results(result["stdout"])
-            return jsonify({
-                "success": True,
-                "hosts": hosts_status,
-                "raw_output": result["stdout"],
-                "return_code": result["return_code"]
-            })
-        except Exception as e:
-            app.logger.error(f"解析ping结果失败: {str(e)}")
-            return jsonify({
-                "success": False,
-                "error": f"解析ping结果失败: {str(e)}",
-                "raw_output": result["stdout"]
-            }), 500
+def ping_deep(pattern="all"):
+    """使用Ansible ping模块检测(验证SSH登录和Python环境), 返回(主机结果, 错误)"""
+    if pattern == "all":
+        result = ansible_runner.ping_all_hosts()
     else:
+        result = ansible_runner.run_adhoc_command("ping", hosts=pattern, structured=True)
+    if not result.get("host_results"):
+        return None, result["stderr"] or "没有ping输出结果"
+    hosts = ansible_runner.ping_results(result)
+    for host in hosts:
+        if host["status"] != "unknown":
+            event_bus.set_host_status(host["host"], host["status"], source="ping", raw_status=host["raw_status"])
+    return hosts, None
+
+def sweep_hosts(hosts, port=None):
+    """快速连通性检测, 按主机应答先后产出结果"""
+    sweeper = reachability_sweeper
+    if port and port != sweeper.port:
+        sweeper = ReachabilitySweeper(sweeper.method, port, sweeper.timeout, sweeper.concurrency)
+    # 未指定端口时使用inventory中的ansible_port
+    for result in sweeper.iter_sweep(hosts, None if port else inventory.ports()):
+        # 只记录inventory中的主机, 其他地址(如未登录时检测的任意地址)只返回检测结果
+        if result["host"] in inventory:
+            event_bus.set_host_status(result["host"], result["status"], source="ping",
+                                      raw_status=result["raw_status"], response_time=result["rtt_ms"])
+        yield result
+
+def ping_response(hosts, mode, stream, port=None):
+    """根据mode返回JSON结果, stream为真时按主机应答顺序逐行输出NDJSON"""
+    if mode == "deep":
+        results, error = ping_deep(",".join(hosts) if hosts else "all")
+        if results is None:
+            return jsonify({"success": False, "error": error}), 500
+        return jsonify({"success": True, "mode": mode, "hosts": results})
+
+    if not stream:
+        start_time = time.time()
+        results = list(sweep_hosts(hosts, port))
         return jsonify({
-            "success": False,
-            "error": result["stderr"] or "没有ping输出结果",
-            "raw_output": result["stdout"]
-        }), 500
+            "success": True,
+            "mode": mode,
+            "hosts": results,
+            "online": sum(1 for r in results if r["status"] == "online"),
+            "duration_ms": round((time.time() - start_time) * 1000, 2)
+        })
+
+    def generate():
+        start_time = time.time()
+        online = 0
+        for result in sweep_hosts(hosts, port):
+            online += result["status"] == "online"
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps({
+            "done": True,
+            "total": len(hosts),
+            "online": online,
+            "duration_ms": round((time.time() - start_time) * 1000, 2)
+        }) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/ping', methods=['GET'])
+def ping_hosts():
+    """检测所有主机的连通性(默认快速检测, ?mode=deep 使用Ansible ping)"""
+    mode = request.args.get('mode', 'fast')
+    if mode not in ('fast', 'deep'):
+        return jsonify({"success": False, "error": "mode必须是fast或deep"}), 400
+    hosts = [] if mode == 'deep' else inventory.host_names()
+    return ping_response(hosts, mode, request.args.get('stream') == '1')
+
+@app.route('/api/ping/batch', methods=['POST'])
+def ping_batch():
+    """批量检测指定主机(仅限inventory中的主机)"""
+    data = request.get_json() or {}
+    mode = data.get('mode', 'fast')
+    hosts = data.get('hosts') or []
+    if mode not in ('fast', 'deep') or not isinstance(hosts, list):
+        return jsonify({"success": False, "error": "hosts必须是主机列表, mode必须是fast或deep"}), 400
+
+    unknown = [host for host in hosts if host not in inventory]
+    if unknown:
+        return jsonify({"success": False, "error": f"主机不在inventory中: {', '.join(unknown)}"}), 400
+    if not hosts:
+        return jsonify({"success": True, "mode": mode, "hosts": []})
+
+    try:
+        port = int(data['port']) if data.get('port') not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "port必须是数字"}), 400
+    if port is not None and not 1 <= port <= 65535:
+        return jsonify({"success": False, "error": "port必须在1-65535之间"}), 400
+    return ping_response(hosts, mode, bool(data.get('stream')), port)
 
 @app.route('/api/ping/host/<host_ip>', methods=['GET'])
 def ping_single_host(host_ip):
     """检查单个主机的连通性"""
     try:
-        import subprocess
-        import time
-        
-        start_time = time.time()
-        result = subprocess.run(
-            ['ping', '-c', '1', '-W', '2', host_ip],
-            capture_output=True,
-            text=True,
-            timeout=3
-        )
-        end_time = time.time()
-        
-        response_time = round((end_time - start_time) * 1000, 2)  # 毫秒
-        
-        if result.returncode == 0:
-            status = "online"
-            raw_status = "SUCCESS"
-        else:
-            status = "offline"
-            raw_status = "UNREACHABLE"
-            
-        return jsonify({
-            "success": True,
-            "host": host_ip,
-            "status": status,
-            "raw_status": raw_status,
-            "response_time": response_time,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-        })
-        
-    except subprocess.TimeoutExpired:
+        result = next(sweep_hosts([host_ip]))
         return jsonify({
             "success": True,
             "host": host_ip,
-            "status": "offline",
-            "raw_status": "TIMEOUT",
-            "response_time": 3000,
+            "status": result["status"],
+            "raw_status": result["raw_status"],
+            "method": result["method"],
+            "response_time": result["rtt_ms"] if result["rtt_ms"] is not None
+                             else round(reachability_sweeper.timeout * 1000),
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
         })
     except Exception as e:
@@ -141,64 +338,95 @@ def ping_single_host(host_ip):
             "host": host_ip
         }), 500
 
+def discovery_scanner(data):
+    """根据请求参数创建扫描器, 速率不超过DISCOVERY_RATE"""
+    ports = data.get('ports') or [reachability_sweeper.port]
+    if not isinstance(ports, list) or not all(isinstance(port, int) and 0 < port < 65536 for port in ports):
+        raise ValueError("ports必须是端口号列表")
+    rate = data.get('rate')
+    timeout = data.get('timeout')
+    try:
+        rate = DISCOVERY_RATE if rate in (None, '') else float(rate)
+        timeout = min(DISCOVERY_TIMEOUT, 10) if timeout in (None, '') else float(timeout)
+    except (TypeError, ValueError):
+        raise ValueError("rate和timeout必须是数字")
+    # 不限速(rate为0)只能由DISCOVERY_RATE配置, 请求中指定的rate必须为正数
+    if data.get('rate') not in (None, '') and not rate > 0:
+        raise ValueError("rate必须大于0")
+    if not 0 < timeout <= 10:
+        raise ValueError("timeout必须大于0且不超过10秒")
+    if DISCOVERY_RATE:
+        rate = min(rate, DISCOVERY_RATE)
+    return NetworkDiscovery(data.get('method', reachability_sweeper.method), ports, timeout,
+                            DISCOVERY_CONCURRENCY, rate)
+
+def iter_discovery(networks, scanner, summary):
+    """按发现先后产出在线地址, 结束后在summary中填入与inventory的比较结果"""
+    start_time = time.time()
+    known = inventory_addresses(inventory)
+    progress = {}
+    found = []
+    for item in scanner.iter_scan(networks, progress):
+        item["inventory_host"] = known.get(item["host"])
+        found.append(item)
+        yield item
+    summary.update(
+        diff_inventory(found, networks, known),
+        targets=[str(network) for network in networks],
+        scanned=progress["scanned"],
+        found=progress["found"],
+        duration_ms=round((time.time() - start_time) * 1000, 2)
+    )
+
+@app.route('/api/discovery', methods=['POST'])
+@require_auth
+def discover_hosts():
+    """扫描CIDR网段发现在线主机, 并与inventory比较(new为尚未添加的在线地址)"""
+    data = request.get_json() or {}
+    targets = data.get('targets')
+    if isinstance(targets, str):
+        targets = [targets]
+    try:
+        networks = parse_targets(targets or [], DISCOVERY_MAX_ADDRESSES)
+        scanner = discovery_scanner(data)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    def run(timeout=None, on_event=None):
+        summary = {}
+        hosts = []
+        for item in iter_discovery(networks, scanner, summary):
+            hosts.append(item)
+            if on_event:
+                on_event(item)
+        return dict(summary, success=True, hosts=hosts), 200
+    
+    if wants_async(data):
+        return submit_job('discovery', f"discovery {', '.join(map(str, networks))}", run)
+    if not data.get('stream'):
+        payload, status = run()
+        return jsonify(payload), status
+    
+    def generate():
+        summary = {}
+        for item in iter_discovery(networks, scanner, summary):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+        yield json.dumps(dict(summary, done=True), ensure_ascii=False) + "\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/hosts', methods=['GET'])
 def get_hosts():
     """获取主机列表及详细信息"""
     try:
-        hosts_detail = []
-        
-        # 读取inventory文件解析主机信息
-        with open(ansible_runner.inventory_path, 'r') as f:
-            content = f.read()
-        
-        lines = content.split('\n')
-        current_group = 'ungrouped'
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('[') and line.endswith(']'):
-                # 这是一个组名
-                current_group = line[1:-1]
-                if current_group.endswith(':vars'):
-                    current_group = 'vars'
-            elif line and not line.startswith('#') and current_group != 'vars':
-                # 这是一个主机行
-                if ' ' in line:
-                    parts = line.split(' ')
-                    host_ip = parts[0]
-                    
-                    # 解析主机参数
-                    host_info = {
-                        'ip': host_ip,
-                        'group': current_group,
-                        'username': 'root',  # 默认值
-                        'description': f'主机 {host_ip}'
-                    }
-                    
-                    # 解析ansible参数
-                    for part in parts[1:]:
-                        if '=' in part:
-                            key, value = part.split('=', 1)
-                            if key == 'ansible_user':
-                                host_info['username'] = value
-                            elif key == 'ansible_ssh_pass':
-                                host_info['has_password'] = True  # 不返回实际密码
-                    
-                    hosts_detail.append(host_info)
-                elif line:  # 只有IP没有参数的情况
-                    hosts_detail.append({
-                        'ip': line,
-                        'group': current_group,
-                        'username': 'root',
-                        'description': f'主机 {line}',
-                        'has_password': False
-                    })
-        
-        return jsonify({
-            "success": True,
-            "hosts": hosts_detail,
-            "total": len(hosts_detail)
-        })
+        version, body = inventory.hosts_json()
+        if request.if_none_match.contains(version):
+            return Response(status=304)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(version)
+        return response
     except Exception as e:
         return jsonify({
             "success": False,
@@ -206,114 +434,119 @@ def get_hosts():
             "hosts": []
         }), 500
 
+def add_host_op(editor, data):
+    """添加主机(单个和批量接口共用)"""
+    host_ip = data.get('host_ip')
+    password = data.get('password')
+    group = data.get('group', 'webservers')
+    if not host_ip or not password:
+        raise ValueError("主机IP和密码不能为空")
+    editor.add_host(host_ip, group, {
+        'ansible_user': data.get('username', 'root'),
+        'ansible_ssh_pass': password
+    })
+    return {"host": host_ip, "group": group}
+
+def update_host_op(editor, host_ip, data):
+    """修改主机, 没有提供新密码时沿用原有密码"""
+    host_vars = {'ansible_user': data.get('username', 'root')}
+    if data.get('password'):
+        host_vars['ansible_ssh_pass'] = data['password']
+    group = data.get('group', 'managed_hosts')
+    editor.update_host(host_ip, group, host_vars)
+    return {
+        "ip": host_ip,
+        "username": host_vars['ansible_user'],
+        "group": group,
+        "description": data.get('description', f'主机 {host_ip}')
+    }
+
 @app.route('/api/hosts', methods=['POST'])
 @require_auth
 def add_host():
     """添加主机"""
     data = request.get_json()
     host_ip = data.get('host_ip')
-    username = data.get('username', 'root')
-    password = data.get('password')
-    group = data.get('group', 'webservers')
-    
-    if not host_ip or not password:
-        return jsonify({"error": "主机IP和密码不能为空"}), 400
     
     try:
-        # 读取现有的hosts文件
-        with open(ansible_runner.inventory_path, 'r') as f:
-            content = f.read()
+        with inventory.transaction() as editor:
+            added = add_host_op(editor, data)
+        command_cache.invalidate([host_ip])
         
-        # 检查主机是否已存在
-        if host_ip in content:
-            return jsonify({"error": f"主机 {host_ip} 已存在"}), 400
-        
-        # 构建新的主机条目
-        new_host_line = f"{host_ip} ansible_user={username} ansible_ssh_pass={password}"
-        
-        # 查找对应的组
-        group_pattern = f"\\[{group}\\]"
-        if re.search(group_pattern, content):
-            # 组存在，在组下添加主机
-            lines = content.split('\n')
-            new_lines = []
-            group_found = False
-            
-            for line in lines:
-                new_lines.append(line)
-                if line.strip() == f"[{group}]":
-                    group_found = True
-                    new_lines.append(new_host_line)
-            
-            content = '\n'.join(new_lines)
-        else:
-            # 组不存在，创建新组
-            if not content.endswith('\n'):
-                content += '\n'
-            content += f"\n[{group}]\n{new_host_line}\n"
-        
-        # 写回文件
-        with open(ansible_runner.inventory_path, 'w') as f:
-            f.write(content)
-        
-        app.logger.info(f"Successfully added host {host_ip} to group {group}")
+        app.logger.info(f"Successfully added host {host_ip} to group {added['group']}")
         
         return jsonify({
             "message": "主机添加成功",
             "host": host_ip,
-            "group": group
+            "group": added["group"]
         })
     
+    except (ValueError, InventoryError) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         app.logger.error(f"Failed to add host {host_ip}: {str(e)}")
         return jsonify({"error": f"添加主机失败: {str(e)}"}), 500
 
+@app.route('/api/hosts/batch', methods=['POST'])
+@require_auth
+def batch_hosts():
+    """批量添加/修改/删除主机, 所有操作在一次加锁写入中完成, 任一失败则全部不生效"""
+    data = request.get_json() or {}
+    ops = data.get('ops')
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"error": "ops必须是非空的操作列表"}), 400
+    
+    results = []
+    errors = []
+    try:
+        with inventory.transaction() as editor:
+            for index, op in enumerate(ops):
+                action = op.get('op') if isinstance(op, dict) else None
+                host_ip = op.get('host_ip') if isinstance(op, dict) else None
+                try:
+                    if action == 'add':
+                        add_host_op(editor, op)
+                    elif action == 'update':
+                        update_host_op(editor, host_ip, op)
+                    elif action == 'delete':
+                        editor.delete_host(host_ip)
+                    else:
+                        raise ValueError("op必须是add、update或delete")
+                    results.append({"index": index, "op": action, "host": host_ip})
+                except (ValueError, InventoryError) as e:
+                    errors.append({"index": index, "op": action, "host": host_ip, "error": str(e)})
+            if errors:
+                # 抛出异常以放弃整个事务
+                raise InventoryError("批量操作存在错误")
+    except InventoryError:
+        return jsonify({"error": "批量操作失败, 未做任何修改", "errors": errors}), 400
+    except Exception as e:
+        app.logger.error(f"Failed to apply host batch: {str(e)}")
+        return jsonify({"error": f"批量操作失败: {str(e)}"}), 500
+    
+    command_cache.invalidate([result["host"] for result in results])
+    app.logger.info(f"Successfully applied {len(results)} host operations")
+    return jsonify({
+        "message": "批量操作成功",
+        "applied": len(results),
+        "results": results
+    })
+
 @app.route('/api/hosts/<host_ip>', methods=['GET'])
 def get_host_detail(host_ip):
     """获取单个主机的详细信息"""
     try:
-        with open(ansible_runner.inventory_path, 'r') as f:
-            content = f.read()
-        
-        lines = content.split('\n')
-        current_group = 'ungrouped'
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('[') and line.endswith(']'):
-                current_group = line[1:-1]
-                if current_group.endswith(':vars'):
-                    current_group = 'vars'
-            elif line and not line.startswith('#') and current_group != 'vars':
-                if line.startswith(host_ip):
-                    # 找到目标主机
-                    host_info = {
-                        'ip': host_ip,
-                        'group': current_group,
-                        'username': 'root',
-                        'description': f'主机 {host_ip}',
-                        'has_password': False
-                    }
-                    
-                    if ' ' in line:
-                        parts = line.split(' ')
-                        for part in parts[1:]:
-                            if '=' in part:
-                                key, value = part.split('=', 1)
-                                if key == 'ansible_user':
-                                    host_info['username'] = value
-                                elif key == 'ansible_ssh_pass':
-                                    host_info['has_password'] = True
-                    
-                    return jsonify({
-                        "success": True,
-                        "host": host_info
-                    })
+        record = inventory.get(host_ip)
+        if record is None:
+            return jsonify({
+                "success": False,
+                "error": f"主机 {host_ip} 不存在"
+            }), 404
         
         return jsonify({
-            "success": False,
-            "error": f"主机 {host_ip} 不存在"
-        }), 404
+            "success": True,
+            "host": public_record(record)
+        })
         
     except Exception as e:
         return jsonify({
@@ -327,93 +560,21 @@ def update_host(host_ip):
     """修改主机信息"""
     try:
         data = request.get_json()
-        new_username = data.get('username', 'root')
-        new_password = data.get('password')
-        new_group = data.get('group', 'managed_hosts')
-        new_description = data.get('description', f'主机 {host_ip}')
-        
-        with open(ansible_runner.inventory_path, 'r') as f:
-            content = f.read()
-        
-        lines = content.split('\n')
-        new_lines = []
-        host_found = False
-        current_group = 'ungrouped'
-        original_password = None
-        
-        # 首先查找原有密码（如果没有提供新密码）
-        if not new_password:
-            for line in lines:
-                line_stripped = line.strip()
-                if line_stripped.startswith(host_ip) and 'ansible_ssh_pass=' in line_stripped:
-                    parts = line_stripped.split(' ')
-                    for part in parts:
-                        if part.startswith('ansible_ssh_pass='):
-                            original_password = part.split('=', 1)[1]
-                            break
-                    break
         
-        # 删除旧的主机记录
-        for line in lines:
-            line_stripped = line.strip()
-            if line_stripped.startswith('[') and line_stripped.endswith(']'):
-                current_group = line_stripped[1:-1]
-                if current_group.endswith(':vars'):
-                    current_group = 'vars'
-            
-            if not line_stripped.startswith(host_ip):
-                new_lines.append(line)
-            else:
-                host_found = True
-        
-        if not host_found:
-            return jsonify({"error": f"主机 {host_ip} 不存在"}), 404
-        
-        # 构建新的主机条目
-        if new_password:
-            new_host_line = f"{host_ip} ansible_user={new_username} ansible_ssh_pass={new_password}"
-        elif original_password:
-            new_host_line = f"{host_ip} ansible_user={new_username} ansible_ssh_pass={original_password}"
-        else:
-            new_host_line = f"{host_ip} ansible_user={new_username}"
-        
-        # 添加到指定组
-        content = '\n'.join(new_lines)
-        group_pattern = f"\\[{new_group}\\]"
-        
-        if re.search(group_pattern, content):
-            # 组存在，在组下添加主机
-            lines = content.split('\n')
-            final_lines = []
-            
-            for line in lines:
-                final_lines.append(line)
-                if line.strip() == f"[{new_group}]":
-                    final_lines.append(new_host_line)
-            
-            content = '\n'.join(final_lines)
-        else:
-            # 组不存在，创建新组
-            if not content.endswith('\n'):
-                content += '\n'
-            content += f"\n[{new_group}]\n{new_host_line}\n"
-        
-        # 写回文件
-        with open(ansible_runner.inventory_path, 'w') as f:
-            f.write(content)
+        with inventory.transaction() as editor:
+            host = update_host_op(editor, host_ip, data)
+        # 地址或登录用户变化后, 缓存的结果可能来自另一台机器或另一个用户
+        command_cache.invalidate([host_ip])
         
         app.logger.info(f"Successfully updated host {host_ip}")
         
         return jsonify({
             "message": "主机更新成功",
-            "host": {
-                "ip": host_ip,
-                "username": new_username,
-                "group": new_group,
-                "description": new_description
-            }
+            "host": host
         })
         
+    except InventoryError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         app.logger.error(f"Failed to update host {host_ip}: {str(e)}")
         return jsonify({"error": f"更新主机失败: {str(e)}"}), 500
@@ -423,58 +584,49 @@ def update_host(host_ip):
 def delete_host(host_ip):
     """删除主机"""
     try:
-        with open(ansible_runner.inventory_path, 'r') as f:
-            lines = f.readlines()
-        
-        # 过滤掉包含指定IP的行
-        filtered_lines = [line for line in lines if not line.strip().startswith(host_ip)]
-        
-        if len(filtered_lines) == len(lines):
-            return jsonify({"error": f"主机 {host_ip} 不存在"}), 404
-        
-        with open(ansible_runner.inventory_path, 'w') as f:
-            f.writelines(filtered_lines)
+        with inventory.transaction() as editor:
+            editor.delete_host(host_ip)
+        command_cache.invalidate([host_ip])
         
         app.logger.info(f"Successfully deleted host {host_ip}")
         
         return jsonify({"message": "主机删除成功"})
     
+    except InventoryError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         app.logger.error(f"Failed to delete host {host_ip}: {str(e)}")
         return jsonify({"error": f"删除主机失败: {str(e)}"}), 500
 
 @app.route('/api/resources', methods=['GET'])
 def get_resources():
-    """获取资源监控数据"""
+    """获取资源监控数据(后台采集器的最新快照)"""
     try:
-        result = ansible_runner.run_playbook("resource_monitor.yml")
+        resource_collector.ensure_started()
+        if request.args.get('refresh') == '1':
+            resource_collector.trigger()
+        
+        snapshot = resource_collector.snapshot()
+        last_run = snapshot["last_run"]
         
-        # 即使部分主机失败，只要有输出就尝试解析可用的结果
-        if result["stdout"].strip():
-            try:
-                # 解析资源信息
-                resources = parse_resource_output(result["stdout"])
-                return jsonify({
-                    "success": True,
-                    "resources": resources,
-                    "raw_output": result["stdout"],
-                    "return_code": result["return_code"],
-                    "partial_failure": not result["success"]  # 标记是否有部分失败
-                })
-            except Exception as e:
-                app.logger.error(f"解析资源数据失败: {str(e)}")
-                return jsonify({
-                    "success": False,
-                    "error": f"解析资源数据失败: {str(e)}",
-                    "raw_output": result["stdout"],
-                    "resources": []
-                }), 500
+        if snapshot["pending"] or not last_run["error"]:
+            return jsonify({
+                "success": True,
+                "resources": snapshot["resources"],
+                "pending": snapshot["pending"],
+                "collected_at": snapshot["collected_at"],
+                "age": snapshot["age"],
+                "interval": snapshot["interval"],
+                "return_code": last_run["return_code"] if last_run else None,
+                "partial_failure": bool(last_run) and not last_run["success"]  # 标记是否有部分失败
+            })
         else:
             return jsonify({
                 "success": False,
-                "error": result["stderr"] or "没有资源监控输出结果",
-                "raw_output": result["stdout"],
-                "resources": []
+                "error": last_run["error"],
+                "resources": snapshot["resources"],
+                "collected_at": snapshot["collected_at"],
+                "age": snapshot["age"]
             }), 500
             
     except Exception as e:
@@ -485,42 +637,364 @@ def get_resources():
             "resources": []
         }), 500
 
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """实时事件流(SSE): 连接时发送一次完整快照, 之后只推送变化"""
+    resource_collector.ensure_started()
+    power_watcher.ensure_started()
+    # 先订阅再取快照, 避免两者之间产生的事件丢失
+    subscriber = event_bus.subscribe()
+    initial = [("snapshot", {
+        "resources": resource_collector.snapshot(),
+        "hosts": event_bus.host_statuses(),
+        "power": power_watcher.watches(active_only=True)
+    })]
+    response = Response(
+        stream_with_context(event_bus.stream(subscriber, initial)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁止nginx缓冲事件流
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/resources/history', methods=['GET'])
+def get_resource_history():
+    """获取单台主机某项指标的历史数据"""
+    host = request.args.get('host')
+    metric = request.args.get('metric')
+    if not host or metric not in metrics_store.metrics:
+        return jsonify({
+            "success": False,
+            "error": f"需要host参数, metric必须是: {', '.join(metrics_store.metrics)}"
+        }), 400
+
+    try:
+        end = float(request.args.get('to', time.time()))
+        start = float(request.args.get('from', end - 3600))
+        step = int(request.args['step']) if request.args.get('step') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "from/to/step必须是数字"}), 400
+
+    if start > end or (step is not None and step <= 0):
+        return jsonify({"success": False, "error": "时间范围或步长无效"}), 400
+
+    history = metrics_store.query(host, metric, start, end, step)
+    return jsonify({
+        "success": True,
+        "host": host,
+        "metric": metric,
+        "from": int(start),
+        "to": int(end),
+        **history
+    })
+
 @app.route('/api/network', methods=['GET'])
 def get_network_info():
-    """获取网络信息"""
-    result = ansible_runner.run_playbook("network_scan.yml")
+    """获取网络信息(后台刷新保存的结果)
     
-    if result["success"]:
-        # 解析网络信息
-        network_info = parse_network_output(result["stdout"])
-        return jsonify({
-            "success": True,
-            "network": network_info,
-            "raw_output": result["stdout"]
-        })
-    else:
-        return jsonify({
-            "success": False,
-            "error": result["stderr"],
-            "raw_output": result["stdout"]
-        }), 500
+    ?since=上次返回的as_of: 只返回之后配置或状态有变化的主机, 以及已从inventory删除的主机(removed);
+    ?hosts=逗号分隔的主机名只返回这些主机; ?refresh=1触发一次后台全量刷新。
+    """
+    try:
+        since = float(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "since必须是时间戳"}), 400
+    hosts = [host for host in request.args.get('hosts', '').split(',') if host] or None
+    
+    network_inventory.ensure_started()
+    if request.args.get('refresh') == '1':
+        network_inventory.trigger()
+    return jsonify(dict(network_inventory.view(since=since, hosts=hosts), success=True))
+
+@app.route('/api/network/refresh', methods=['POST'])
+@require_auth
+def refresh_network_info():
+    """立即对指定主机(hosts, 主机模式或列表, 默认全部)执行network_scan.yml, 返回有变化的主机"""
+    data = request.get_json() or {}
+    hosts = data.get('hosts')
+    try:
+        options = execution_options(data, playbook=True)
+        if hosts:
+            pattern = hosts if isinstance(hosts, str) else ",".join(hosts)
+            hosts = inventory.match(pattern)
+            if not hosts:
+                raise ValueError(f"没有匹配的主机: {pattern}")
+    except (ValueError, InventoryError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    def run(timeout=None, on_event=None):
+        try:
+            diff = network_inventory.refresh(hosts or None, timeout=timeout, **options)
+        except RuntimeError as e:
+            return {"success": False, "error": str(e)}, 500
+        return dict(diff, success=not diff["errors"]), 200
+    
+    if wants_async(data):
+        return submit_job('network', f"network refresh {','.join(hosts) if hosts else 'all'}", run)
+    payload, status = run()
+    return jsonify(payload), status
+
+def execution_options(data, playbook=False):
+    """读取请求中对执行参数的覆盖: forks、host_timeout、strategy, playbook还支持serial
+    
+    未指定的参数由AnsibleRunner按目标主机数自动计算; 参数不合法时抛出ValueError。
+    """
+    options = {}
+    keys = ('forks', 'host_timeout', 'serial') if playbook else ('forks', 'host_timeout')
+    for key in keys:
+        value = data.get(key)
+        if value in (None, ''):
+            continue
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            # 非数值的JSON(如列表、对象)同样按参数错误处理
+            raise ValueError(f"{key}必须为正整数")
+        if value <= 0:
+            raise ValueError(f"{key}必须为正整数")
+        options[key] = value
+    strategy = data.get('strategy')
+    if strategy:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"不支持的执行策略: {strategy}, 可选: {', '.join(STRATEGIES)}")
+        options['strategy'] = strategy
+    return options
+
+@app.route('/api/ssh/stats', methods=['GET'])
+@require_auth
+def get_ssh_stats():
+    """SSH连接复用统计: 存活的主连接数、复用/新建次数和复用率"""
+    if not ansible_runner.ssh_pool:
+        return jsonify({"success": True, "enabled": False})
+    return jsonify({"success": True, "enabled": True, **ansible_runner.ssh_pool.stats()})
+
+@app.route('/api/facts/stats', methods=['GET'])
+@require_auth
+def get_facts_stats():
+    """facts缓存统计: 缓存的主机数、各分组有效期和命中率"""
+    return jsonify({"success": True, **ansible_runner.facts_cache.stats()})
+
+@app.route('/api/command/cache', methods=['GET', 'DELETE'])
+@require_auth
+def command_cache_stats():
+    """命令结果缓存统计; DELETE清空缓存"""
+    if request.method == 'DELETE':
+        command_cache.invalidate()
+    return jsonify({"success": True, **command_cache.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus文本格式的指标; 设置了METRICS_TOKEN时需要以Bearer方式提供"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({"error": "需要认证"}), 401
+    snapshot = metrics_publisher.collect() if metrics_publisher else registry.snapshot()
+    return Response(Registry.render(snapshot), mimetype='text/plain; version=0.0.4')
+
+def wants_async(data):
+    """请求是否选择以后台任务方式执行(JSON中的async字段或表单中的async=1)"""
+    return str(data.get('async', '')).lower() in ('1', 'true', 'yes')
+
+def submit_job(kind, description, run):
+    """把run(timeout, on_event)作为后台任务提交, 立即返回任务ID"""
+    def job_fn(job):
+        payload, _ = run(timeout=JOB_TIMEOUT, on_event=lambda data: job.emit('host', data))
+        return payload
+    
+    try:
+        job = job_manager.submit(kind, request.current_user["username"], description, job_fn)
+    except JobLimitError as e:
+        return jsonify({"success": False, "error": str(e)}), 429
+    
+    return jsonify({
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "stream_url": f"/api/jobs/{job.id}/stream"
+    }), 202
 
 @app.route('/api/command', methods=['POST'])
 @require_auth
 def run_command():
-    """执行自定义ansible命令"""
+    """执行自定义ansible命令
+    
+    cache=true时使用只读命令的结果缓存: 模块须为只读模块, 或请求同时标记read_only=true
+    (如command/shell执行的df -h、uptime); 只对缓存中没有的主机执行, cached_hosts为来自缓存的主机。
+    """
     data = request.get_json()
     module = data.get('module', 'shell')
     args = data.get('args', '')
     hosts = data.get('hosts', 'all')
+    use_cache = bool(data.get('cache'))
+    read_only = command_cache.cacheable(module, bool(data.get('read_only')))
+    try:
+        options = execution_options(data)
+        if use_cache and not read_only:
+            raise ValueError(f"模块 {module} 不是只读模块, 使用缓存时需要同时指定read_only")
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
-    result = ansible_runner.run_adhoc_command(module, args, hosts)
+    def run(timeout=None, on_event=None):
+        targets = inventory.match(hosts)
+        if use_cache and targets:
+            return cached_command(module, args, targets, options, timeout, on_event), 200
+        if not read_only:
+            # 命令可能改变了主机状态, 丢弃这些主机缓存的结果
+            command_cache.invalidate(targets)
+        result = ansible_runner.run_adhoc_command(module, args, hosts, timeout=timeout, on_event=on_event, **options)
+        return {
+            "success": result["success"],
+            "output": result["stdout"],
+            "error": result["stderr"]
+        }, 200
     
-    return jsonify({
-        "success": result["success"],
-        "output": result["stdout"],
-        "error": result["stderr"]
-    })
+    if wants_async(data):
+        return submit_job('command', f"{module} {args}".strip() + f" -> {hosts}", run)
+    payload, status = run()
+    return jsonify(payload), status
+
+def cached_command(module, args, targets, options, timeout, on_event):
+    """带结果缓存执行只读命令: 只对缓存中没有的主机执行, 输出按主机从结构化结果渲染"""
+    cached, missing = command_cache.lookup(module, args, targets)
+    host_results = {host: entry for host, (_, entry) in cached.items()}
+    result = {"success": True, "stderr": ""}
+    if missing:
+        result = ansible_runner.run_adhoc_command(
+            module, args, ",".join(missing), structured=True, timeout=timeout, on_event=on_event, **options
+        )
+        executed = result.get("host_results", {})
+        command_cache.store(module, args, executed)
+        host_results.update(executed)
+        # 执行了但没有结果的主机(输出解析失败、主机未参与执行等)按失败处理, 不能从输出中消失
+        for host in missing:
+            if host not in host_results:
+                add_task_result(host_results, host, module, module, 'failed',
+                                {"msg": result["stderr"] or "没有执行结果"})
+    if on_event:
+        for host, entry in host_results.items():
+            if host in cached:
+                on_event(dict(entry["tasks"][-1], host=host, host_status=entry["status"], cached=True))
+    
+    now = time.time()
+    return {
+        "success": result["success"] and all(
+            entry["status"] in ('ok', 'changed', 'skipped') for entry in host_results.values()
+        ),
+        "output": "".join(render_adhoc_host(host, host_results[host]) + "\n" for host in targets if host in host_results),
+        "error": result["stderr"],
+        "cached_hosts": [host for host in targets if host in cached],
+        "executed_hosts": missing,
+        "cache_age": {host: round(now - stored_at, 1) for host, (stored_at, _) in cached.items()}
+    }
+
+def identical_hosts(digest, remote_file_path, target_hosts, options, timeout, on_event):
+    """目标主机中远端文件SHA-256与digest相同的主机"""
+    result = ansible_runner.run_adhoc_command(
+        "stat",
+        f"path={remote_file_path} checksum_algorithm=sha256 get_mime=no get_attributes=no",
+        target_hosts,
+        structured=True,
+        timeout=timeout,
+        **options
+    )
+    identical = []
+    for host, entry in result.get("host_results", {}).items():
+        for task in entry["tasks"]:
+            stat = task["result"].get("stat") or {}
+            if stat.get("checksum") == digest:
+                identical.append(host)
+                if on_event:
+                    on_event({
+                        "task": "内容相同, 跳过传输",
+                        "action": "copy",
+                        "status": "ok",
+                        "result": {"changed": False, "checksum": digest},
+                        "host": host,
+                        "host_status": "ok"
+                    })
+    return identical
+
+def fanout_width(data):
+    """请求中的树形分发宽度(fanout), 未指定时返回0(控制节点直接传输到所有主机)"""
+    value = data.get('fanout')
+    if value in (None, '', False, '0'):
+        return 0
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("fanout必须为正整数")
+    if width <= 0:
+        raise ValueError("fanout必须为正整数")
+    return width
+
+def distribute_artifact(digest, original_name, target_hosts, remote_path, options, fanout=0):
+    """返回把存储中的文件分发到目标主机的run(timeout, on_event)
+    
+    先比较远端文件的SHA-256, 内容相同的主机不再传输; 调用方需先pin文件, 执行结束后自动unpin。
+    fanout大于0且待传输主机多于fanout台时使用树形分发。
+    """
+    local_path = artifact_store.path(digest)
+    remote_file_path = os.path.join(remote_path, secure_filename(original_name))
+    
+    def run(timeout=None, on_event=None):
+        tree = None
+        try:
+            skipped = identical_hosts(digest, remote_file_path, target_hosts, options, timeout, on_event)
+            pattern = target_hosts + "".join(f",!{host}" for host in skipped)
+            pending = inventory.match(pattern)
+            if skipped and not pending:
+                result = {"success": True, "stdout": "", "stderr": ""}
+            elif fanout and len(pending) > fanout:
+                distributor = FanoutDistributor(ansible_runner, width=fanout, port=FANOUT_PORT)
+                tree = distributor.distribute(
+                    local_path, digest, pending, remote_file_path,
+                    timeout=timeout, on_event=on_event, options=options
+                )
+                errors = "; ".join(f"{host}: {error}" for host, error in tree["errors"].items())
+                result = {"success": tree["success"], "stdout": "", "stderr": errors}
+            else:
+                result = ansible_runner.run_adhoc_command(
+                    "copy",
+                    f"src={local_path} dest={remote_file_path} mode=0644",
+                    pattern,
+                    timeout=timeout,
+                    on_event=on_event,
+                    **options
+                )
+        finally:
+            artifact_store.unpin(digest)
+            # 目标主机上的文件已变化(包括部分主机失败的情况), 丢弃它们缓存的命令结果
+            command_cache.invalidate(inventory.match(target_hosts))
+        
+        if result["success"]:
+            return {
+                "success": True,
+                "message": f"文件 {original_name} 上传成功",
+                "remote_path": remote_file_path,
+                "hosts": target_hosts,
+                "sha256": digest,
+                "skipped_hosts": skipped,
+                "fanout": tree
+            }, 200
+        return {
+            "success": False,
+            "error": f"文件传输失败: {result['stderr']}",
+            "fanout": tree
+        }, 500
+    
+    return run, f"{original_name} -> {target_hosts}:{remote_file_path}"
+
+def start_distribution(digest, original_name, target_hosts, remote_path, options, run_async, fanout=0):
+    """同步执行或提交分发任务; 任务被拒绝时释放文件"""
+    run, description = distribute_artifact(digest, original_name, target_hosts, remote_path, options, fanout)
+    if run_async:
+        response, status = submit_job('upload', description, run)
+        if status != 202:
+            artifact_store.unpin(digest)
+        return response, status
+    payload, status = run()
+    return jsonify(payload), status
 
 @app.route('/api/upload', methods=['POST'])
 @require_auth
@@ -533,47 +1007,26 @@ def upload_file():
         file = request.files['file']
         target_hosts = request.form.get('hosts', 'all')
         remote_path = request.form.get('remote_path', '/tmp/')
+        try:
+            options = execution_options(request.form)
+            fanout = fanout_width(request.form)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         if file.filename == '':
             return jsonify({"error": "没有选择文件"}), 400
         
         if file and allowed_file(file.filename):
-            # 生成安全的文件名
-            timestamp = str(int(time.time()))
-            file_hash = hashlib.md5(file.filename.encode()).hexdigest()[:8]
-            filename = f"{timestamp}_{file_hash}_{secure_filename(file.filename)}"
-            
-            # 保存文件到本地
-            local_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(local_path)
+            # 保存到临时文件, 按内容SHA-256移入存储, 相同内容只保存一份
+            fd, local_path = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], prefix='upload_')
+            with os.fdopen(fd, 'wb') as f:
+                file.save(f)
+            digest = artifact_store.add_file(local_path)
             
             # 使用Ansible copy模块将文件传输到远程主机
-            remote_file_path = os.path.join(remote_path, secure_filename(file.filename))
-            
-            result = ansible_runner.run_adhoc_command(
-                "copy",
-                f"src={local_path} dest={remote_file_path} mode=0644",
-                target_hosts
+            return start_distribution(
+                digest, file.filename, target_hosts, remote_path, options, wants_async(request.form), fanout
             )
-            
-            # 清理本地临时文件
-            try:
-                os.remove(local_path)
-            except:
-                pass
-            
-            if result["success"]:
-                return jsonify({
-                    "success": True,
-                    "message": f"文件 {file.filename} 上传成功",
-                    "remote_path": remote_file_path,
-                    "hosts": target_hosts
-                })
-            else:
-                return jsonify({
-                    "success": False,
-                    "error": f"文件传输失败: {result['stderr']}"
-                }), 500
         else:
             return jsonify({"error": "不支持的文件类型"}), 400
             
@@ -581,6 +1034,225 @@ def upload_file():
         app.logger.error(f"文件上传失败: {str(e)}")
         return jsonify({"error": f"上传失败: {str(e)}"}), 500
 
+@app.route('/api/artifacts', methods=['GET'])
+@require_auth
+def list_artifacts():
+    """已上传文件的存储情况"""
+    artifacts = sorted(artifact_store.list(), key=lambda a: a["last_used"], reverse=True)
+    return jsonify({"success": True, "artifacts": artifacts, **artifact_store.stats()})
+
+@app.route('/api/artifacts/<digest>/distribute', methods=['POST'])
+@require_auth
+def distribute_stored_artifact(digest):
+    """把已在存储中的文件分发到目标主机, 无需重新上传"""
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    if not filename or not allowed_file(filename):
+        return jsonify({"success": False, "error": "不支持的文件类型"}), 400
+    try:
+        options = execution_options(data)
+        fanout = fanout_width(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if not artifact_store.valid_digest(digest) or not artifact_store.pin(digest):
+        return jsonify({"success": False, "error": "文件不存在, 请重新上传"}), 404
+    return start_distribution(
+        digest, filename, data.get('hosts', 'all'), data.get('remote_path', '/tmp/'), options,
+        wants_async(data), fanout
+    )
+
+def upload_error_response(e):
+    if isinstance(e, UploadNotFound):
+        return jsonify({"success": False, "error": str(e)}), 404
+    if isinstance(e, UploadOffsetError):
+        return jsonify({"success": False, "error": str(e), "offset": e.offset}), 409
+    return jsonify({"success": False, "error": str(e)}), 400
+
+def owned_upload(upload_id):
+    """当前用户的上传会话, 不存在或属于其他用户时抛出UploadNotFound"""
+    session = chunked_uploads.get(upload_id)
+    if session["user"] != request.current_user["username"]:
+        raise UploadNotFound("上传会话不存在或已过期")
+    return session
+
+def upload_status(session):
+    return {
+        "success": True,
+        "upload_id": session["id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "offset": session["offset"],
+        "chunk_size": UPLOAD_CHUNK_SIZE
+    }
+
+@app.route('/api/upload/init', methods=['POST'])
+@require_auth
+def init_chunked_upload():
+    """创建分片上传会话"""
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    if not filename or not allowed_file(filename):
+        return jsonify({"success": False, "error": "不支持的文件类型"}), 400
+    sha256 = data.get('sha256') or None
+    if sha256 is not None:
+        if not isinstance(sha256, str) or not artifact_store.valid_digest(sha256.lower()):
+            return jsonify({"success": False, "error": "sha256必须为64位十六进制字符串"}), 400
+        sha256 = sha256.lower()
+    try:
+        try:
+            size = int(data.get('size', 0))
+        except (TypeError, ValueError):
+            raise ValueError("size必须为整数")
+        options = execution_options(data)
+        if artifact_store.contains(sha256):
+            # 内容已在存储中, 无需再上传, 直接调用 /api/artifacts/<sha256>/distribute
+            return jsonify({
+                "success": True,
+                "exists": True,
+                "sha256": sha256,
+                "distribute_url": f"/api/artifacts/{sha256}/distribute"
+            })
+        session = chunked_uploads.create(
+            request.current_user["username"],
+            filename,
+            size,
+            sha256=sha256,
+            hosts=data.get('hosts', 'all'),
+            remote_path=data.get('remote_path', '/tmp/'),
+            options=options,
+            fanout=fanout_width(data)
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except UploadError as e:
+        return upload_error_response(e)
+    return jsonify(upload_status(session)), 201
+
+@app.route('/api/upload/<upload_id>', methods=['GET'])
+@require_auth
+def get_chunked_upload(upload_id):
+    """查询已接收的字节数, 断线后从返回的offset继续上传"""
+    try:
+        return jsonify(upload_status(owned_upload(upload_id)))
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route('/api/upload/<upload_id>', methods=['PUT'])
+@require_auth
+def put_upload_chunk(upload_id):
+    """写入一个分片: 请求体为原始字节, ?offset=为分片在文件中的偏移
+    
+    可选校验头 X-Chunk-SHA256 / X-Chunk-CRC32(十六进制), 校验失败时该分片被丢弃。
+    """
+    try:
+        offset = int(request.args.get('offset', -1))
+        owned_upload(upload_id)
+        session = chunked_uploads.write_chunk(
+            upload_id,
+            offset,
+            request.stream,
+            request.content_length or 0,
+            sha256=request.headers.get('X-Chunk-SHA256'),
+            crc32=request.headers.get('X-Chunk-CRC32')
+        )
+    except ValueError:
+        return jsonify({"success": False, "error": "offset必须为整数"}), 400
+    except UploadError as e:
+        return upload_error_response(e)
+    return jsonify(upload_status(session))
+
+@app.route('/api/upload/<upload_id>/finalize', methods=['POST'])
+@require_auth
+def finalize_chunked_upload(upload_id):
+    """完成上传并开始分发到目标主机, 默认以后台任务执行"""
+    data = request.get_json(silent=True) or {}
+    try:
+        owned_upload(upload_id)
+        session = chunked_uploads.finalize(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    digest = artifact_store.add_file(session["path"], session["sha256"])
+    return start_distribution(
+        digest, session["filename"], session["hosts"], session["remote_path"], session["options"],
+        data.get('async', True) in (True, 1, '1', 'true'), session.get("fanout", 0)
+    )
+
+@app.route('/api/upload/<upload_id>', methods=['DELETE'])
+@require_auth
+def abort_chunked_upload(upload_id):
+    """放弃上传, 删除已接收的数据"""
+    try:
+        owned_upload(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    chunked_uploads.abort(upload_id)
+    return jsonify({"success": True})
+
+def shutdown_payload(result, target_hosts, delay, force):
+    """根据关机命令的执行结果判断是否成功"""
+    # 关机操作的特殊处理逻辑
+    # 检查是否有成功的关机指示，即使整体状态显示失败
+    success_indicators = [
+        "Shutdown scheduled",
+        "shutdown -h",
+        "CHANGED",
+        "rc=0"
+    ]
+    
+    # 检查stderr中的连接断开信息（通常意味着关机成功）
+    connection_lost_indicators = [
+        "Connection to .* closed by remote host",
+        "Shared connection to .* closed",
+        "SSH connection was closed",
+        "Connection closed by"
+    ]
+    
+    with PARSE_DURATION.time(parser='shutdown_output'):
+        stdout_has_success = any(indicator in result["stdout"] for indicator in success_indicators)
+        stderr_has_connection_lost = any(re.search(pattern, result["stderr"], re.IGNORECASE) 
+                                       for pattern in connection_lost_indicators)
+    
+    # 判断关机是否成功：
+    # 1. 正常成功返回
+    # 2. 输出包含成功指示
+    # 3. 连接断开（通常意味着主机已关机）
+    if result["success"] or stdout_has_success or stderr_has_connection_lost:
+        # 构建详细的成功消息
+        if result["success"] and stdout_has_success:
+            status_msg = "关机命令已成功发送并确认"
+        elif stdout_has_success:
+            status_msg = "关机命令已发送并执行"
+        elif stderr_has_connection_lost:
+            status_msg = "关机命令已发送，主机连接已断开（可能已关机）"
+        else:
+            status_msg = "关机命令已发送"
+        
+        return {
+            "success": True,
+            "message": f"{status_msg}，目标主机: {target_hosts}",
+            "delay": delay,
+            "force": force,
+            "raw_output": result["stdout"],
+            "connection_status": "disconnected" if stderr_has_connection_lost else "connected",
+            "return_code": result["return_code"]
+        }, 200
+    else:
+        # 真正的失败情况
+        return {
+            "success": False,
+            "error": f"关机命令失败: {result['stderr'] or '未知错误'}",
+            "raw_output": result["stdout"],
+            "return_code": result["return_code"]
+        }, 500
+
+def shutdown_targets(result, target_hosts):
+    """关机命令已送达的主机: 有结构化结果(常驻引擎)时排除命令执行失败的主机"""
+    host_results = result.get("host_results")
+    if host_results:
+        return [host for host, entry in host_results.items() if entry["status"] != "failed"]
+    return inventory.match(target_hosts)
+
 @app.route('/api/shutdown', methods=['POST'])
 @require_auth
 def shutdown_hosts():
@@ -589,7 +1261,14 @@ def shutdown_hosts():
         data = request.get_json()
         target_hosts = data.get('hosts', 'all')
         force = data.get('force', False)
-        delay = data.get('delay', 1)  # 默认1分钟后关机
+        try:
+            delay = int(data.get('delay', 1))  # 默认1分钟后关机
+        except (TypeError, ValueError):
+            raise ValueError("delay必须为非负整数(分钟)")
+        if delay < 0:
+            raise ValueError("delay必须为非负整数(分钟)")
+        options = execution_options(data)
+        user = request.current_user["username"]
         
         # 构建关机命令
         if force:
@@ -597,69 +1276,79 @@ def shutdown_hosts():
         else:
             shutdown_cmd = f"shutdown -h +{delay} 'System shutdown initiated from Ansible Dashboard'"
         
-        result = ansible_runner.run_adhoc_command(
-            "shell",
-            shutdown_cmd,
-            target_hosts
-        )
-        
-        # 关机操作的特殊处理逻辑
-        # 检查是否有成功的关机指示，即使整体状态显示失败
-        success_indicators = [
-            "Shutdown scheduled",
-            "shutdown -h",
-            "CHANGED",
-            "rc=0"
-        ]
+        def run(timeout=None, on_event=None):
+            result = ansible_runner.run_adhoc_command(
+                "shell",
+                shutdown_cmd,
+                target_hosts,
+                timeout=timeout,
+                on_event=on_event,
+                **options
+            )
+            command_cache.invalidate(inventory.match(target_hosts))
+            payload, status = shutdown_payload(result, target_hosts, delay, force)
+            if payload["success"]:
+                # 之后由服务端跟踪主机是否真正关机, 进度见/api/power/<watch_id>和事件流的power事件
+                watch = power_watcher.watch(shutdown_targets(result, target_hosts), delay * 60, user=user)
+                payload.update(watch_id=watch["id"], watch_url=f"/api/power/{watch['id']}")
+            return payload, status
         
-        # 检查stderr中的连接断开信息（通常意味着关机成功）
-        connection_lost_indicators = [
-            "Connection to .* closed by remote host",
-            "Shared connection to .* closed",
-            "SSH connection was closed",
-            "Connection closed by"
+        if wants_async(data):
+            return submit_job('shutdown', f"shutdown +{delay} -> {target_hosts}", run)
+        payload, status = run()
+        return jsonify(payload), status
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"远程关机失败: {str(e)}")
+        return jsonify({"error": f"关机失败: {str(e)}"}), 500
+
+def cancel_shutdown_payload(result, target_hosts):
+    """根据取消关机命令的执行结果判断是否成功"""
+    # 取消关机的特殊处理
+    # 检查成功指示，包括空输出（表示成功取消）
+    success_indicators = [
+        "CHANGED",
+        "rc=0"
+    ]
+    
+    stdout_has_success = any(indicator in result["stdout"] for indicator in success_indicators)
+    # 对于取消关机，空的stderr通常表示成功
+    stderr_is_empty = not result["stderr"].strip()
+    
+    if result["success"] or stdout_has_success or (stderr_is_empty and result["return_code"] == 0):
+        return {
+            "success": True,
+            "message": f"已取消主机关机: {target_hosts}",
+            "raw_output": result["stdout"],
+            "return_code": result["return_code"]
+        }, 200
+    else:
+        # 检查是否是"没有关机计划"的错误（这也算是成功的一种）
+        no_shutdown_indicators = [
+            "No scheduled shutdown to cancel",
+            "shutdown: no shutdown scheduled",
+            "没有计划的关机"
         ]
         
-        stdout_has_success = any(indicator in result["stdout"] for indicator in success_indicators)
-        stderr_has_connection_lost = any(re.search(pattern, result["stderr"], re.IGNORECASE) 
-                                       for pattern in connection_lost_indicators)
+        has_no_shutdown = any(indicator.lower() in result["stderr"].lower() 
+                            for indicator in no_shutdown_indicators)
         
-        # 判断关机是否成功：
-        # 1. 正常成功返回
-        # 2. 输出包含成功指示
-        # 3. 连接断开（通常意味着主机已关机）
-        if result["success"] or stdout_has_success or stderr_has_connection_lost:
-            # 构建详细的成功消息
-            if result["success"] and stdout_has_success:
-                status_msg = "关机命令已成功发送并确认"
-            elif stdout_has_success:
-                status_msg = "关机命令已发送并执行"
-            elif stderr_has_connection_lost:
-                status_msg = "关机命令已发送，主机连接已断开（可能已关机）"
-            else:
-                status_msg = "关机命令已发送"
-            
-            return jsonify({
+        if has_no_shutdown:
+            return {
                 "success": True,
-                "message": f"{status_msg}，目标主机: {target_hosts}",
-                "delay": delay,
-                "force": force,
+                "message": f"主机 {target_hosts} 没有计划的关机操作",
                 "raw_output": result["stdout"],
-                "connection_status": "disconnected" if stderr_has_connection_lost else "connected",
                 "return_code": result["return_code"]
-            })
+            }, 200
         else:
-            # 真正的失败情况
-            return jsonify({
+            return {
                 "success": False,
-                "error": f"关机命令失败: {result['stderr'] or '未知错误'}",
+                "error": f"取消关机失败: {result['stderr'] or '未知错误'}",
                 "raw_output": result["stdout"],
                 "return_code": result["return_code"]
-            }), 500
-            
-    except Exception as e:
-        app.logger.error(f"远程关机失败: {str(e)}")
-        return jsonify({"error": f"关机失败: {str(e)}"}), 500
+            }, 500
 
 @app.route('/api/cancel-shutdown', methods=['POST'])
 @require_auth
@@ -668,166 +1357,161 @@ def cancel_shutdown():
     try:
         data = request.get_json()
         target_hosts = data.get('hosts', 'all')
+        options = execution_options(data)
         
-        result = ansible_runner.run_adhoc_command(
-            "shell",
-            "shutdown -c",
-            target_hosts
-        )
-        
-        # 取消关机的特殊处理
-        # 检查成功指示，包括空输出（表示成功取消）
-        success_indicators = [
-            "CHANGED",
-            "rc=0"
-        ]
-        
-        stdout_has_success = any(indicator in result["stdout"] for indicator in success_indicators)
-        # 对于取消关机，空的stderr通常表示成功
-        stderr_is_empty = not result["stderr"].strip()
+        def run(timeout=None, on_event=None):
+            result = ansible_runner.run_adhoc_command(
+                "shell",
+                "shutdown -c",
+                target_hosts,
+                timeout=timeout,
+                on_event=on_event,
+                **options
+            )
+            command_cache.invalidate(inventory.match(target_hosts))
+            payload, status = cancel_shutdown_payload(result, target_hosts)
+            if payload["success"]:
+                payload["cancelled_hosts"] = power_watcher.cancel(inventory.match(target_hosts))
+            return payload, status
         
-        if result["success"] or stdout_has_success or (stderr_is_empty and result["return_code"] == 0):
-            return jsonify({
-                "success": True,
-                "message": f"已取消主机关机: {target_hosts}",
-                "raw_output": result["stdout"],
-                "return_code": result["return_code"]
-            })
-        else:
-            # 检查是否是"没有关机计划"的错误（这也算是成功的一种）
-            no_shutdown_indicators = [
-                "No scheduled shutdown to cancel",
-                "shutdown: no shutdown scheduled",
-                "没有计划的关机"
-            ]
-            
-            has_no_shutdown = any(indicator.lower() in result["stderr"].lower() 
-                                for indicator in no_shutdown_indicators)
-            
-            if has_no_shutdown:
-                return jsonify({
-                    "success": True,
-                    "message": f"主机 {target_hosts} 没有计划的关机操作",
-                    "raw_output": result["stdout"],
-                    "return_code": result["return_code"]
-                })
-            else:
-                return jsonify({
-                    "success": False,
-                    "error": f"取消关机失败: {result['stderr'] or '未知错误'}",
-                    "raw_output": result["stdout"],
-                    "return_code": result["return_code"]
-                }), 500
-            
+        if wants_async(data):
+            return submit_job('cancel-shutdown', f"shutdown -c -> {target_hosts}", run)
+        payload, status = run()
+        return jsonify(payload), status
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         app.logger.error(f"取消关机失败: {str(e)}")
         return jsonify({"error": f"取消关机失败: {str(e)}"}), 500
 
+@app.route('/api/power', methods=['GET'])
+def list_power_watches():
+    """关机跟踪记录(最近的在前), ?active=1只返回进行中的"""
+    power_watcher.ensure_started()
+    return jsonify({
+        "success": True,
+        "watches": power_watcher.watches(active_only=request.args.get('active') == '1')
+    })
+
+@app.route('/api/power/<watch_id>', methods=['GET'])
+def get_power_watch(watch_id):
+    """单次关机的跟踪记录: 每台主机的状态及scheduled_at/unreachable_at/down_at"""
+    watch = power_watcher.get(watch_id)
+    if watch is None:
+        return jsonify({"success": False, "error": "跟踪记录不存在"}), 404
+    return jsonify({"success": True, "watch": watch})
+
+def visible_job(job_id):
+    """当前用户可以查看的任务(管理员可以查看所有任务)"""
+    job = job_manager.get(job_id)
+    user = request.current_user
+    if job is None or (job.user != user["username"] and user.get("role") != "admin"):
+        return None
+    return job
+
+@app.route('/api/jobs', methods=['GET'])
+@require_auth
+def list_jobs():
+    """列出当前用户的任务"""
+    user = request.current_user
+    jobs = job_manager.list(None if user.get("role") == "admin" else user["username"])
+    return jsonify({
+        "success": True,
+        "jobs": [job.to_dict() for job in reversed(jobs)],
+        "queue": job_manager.stats()
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    """任务状态、每台主机的结果和since之后的进度事件"""
+    job = visible_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"任务 {job_id} 不存在"}), 404
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({"success": False, "error": "since必须是数字"}), 400
+    return jsonify({"success": True, "job": job.to_dict(since=since)})
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+@require_auth
+def stream_job(job_id):
+    """以SSE推送任务进度, 支持Last-Event-ID续传"""
+    job = visible_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"任务 {job_id} 不存在"}), 404
+    try:
+        since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        since = 0
+    response = Response(stream_with_context(job_manager.stream(job, since)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/system-info', methods=['GET'])
 def get_system_info():
-    """获取系统信息"""
+    """获取系统信息
+    
+    从facts缓存读取, 只对缓存过期的主机执行setup; 参数hosts为主机模式, subsets为逗号分隔的
+    facts分组(platform/hardware/network), refresh=1时忽略缓存重新收集。
+    """
     try:
-        result = ansible_runner.run_adhoc_command("setup", "filter=ansible_distribution*,ansible_kernel,ansible_uptime_seconds,ansible_processor*")
-        
-        if result["success"]:
-            return jsonify({
-                "success": True,
-                "raw_output": result["stdout"]
-            })
-        else:
+        subsets = [name for name in request.args.get('subsets', '').split(',') if name]
+        result = ansible_runner.cached_facts(
+            request.args.get('hosts', 'all'),
+            subsets or None,
+            refresh=request.args.get('refresh', '').lower() in ('1', 'true', 'yes'),
+            **execution_options(request.args)
+        )
+        # 所有主机都收集失败且没有缓存数据时才视为失败
+        if result["errors"] and not any(entry["facts"] for entry in result["hosts"].values()):
             return jsonify({
                 "success": False,
-                "error": result["stderr"]
+                "error": "; ".join(f"{host}: {error}" for host, error in result["errors"].items())
             }), 500
-            
+        return jsonify({"success": True, **result})
+    
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
-def parse_resource_output(output):
-    """解析资源监控输出"""
-    resources = []
-    
-    # 使用正则表达式匹配整个JSON块
-    json_blocks = re.findall(r'ok: \[[^\]]+\] => \{[^}]*"msg": "([^"]+)"[^}]*\}', output, re.DOTALL)
-    
-    for msg_content in json_blocks:
-        current_resource = {}
-        
-        # 使用\\n分割消息内容
-        msg_lines = msg_content.split('\\n')
-        
-        for msg_line in msg_lines:
-            msg_line = msg_line.strip()
-            
-            if '主机:' in msg_line:
-                host_match = re.search(r'主机: (.+)', msg_line)
-                if host_match:
-                    current_resource['host'] = host_match.group(1).strip()
-            elif 'CPU使用率:' in msg_line:
-                cpu_match = re.search(r'CPU使用率: ([^%]+)%', msg_line)
-                if cpu_match:
-                    current_resource['cpu'] = cpu_match.group(1).strip()
-            elif '内存使用率:' in msg_line:
-                mem_match = re.search(r'内存使用率: ([^%]+)%', msg_line)
-                if mem_match:
-                    current_resource['memory'] = mem_match.group(1).strip()
-            elif '磁盘使用率:' in msg_line:
-                disk_match = re.search(r'磁盘使用率: ([^%]+)%', msg_line)
-                if disk_match:
-                    current_resource['disk'] = disk_match.group(1).strip()
-            elif '系统负载:' in msg_line:
-                load_match = re.search(r'系统负载: (.+)', msg_line)
-                if load_match:
-                    current_resource['load'] = load_match.group(1).strip()
-        
-        # 如果收集到了完整的资源信息，添加到结果中
-        if 'host' in current_resource and len(current_resource) > 1:
-            resources.append(current_resource)
-    
-    return resources
-
-def parse_network_output(output):
-    """解析网络信息输出"""
-    network_info = []
-    lines = output.split('\n')
-    current_host = None
-    current_info = {}
-    
-    for line in lines:
-        if line.strip().startswith('ok: [') and '] => {' in line:
-            host_match = re.search(r'ok: \[([^\]]+)\]', line)
-            if host_match:
-                current_host = host_match.group(1)
-                current_info = {"host": current_host}
-        elif current_host and '主机:' in line:
-            if '连通性:' in line:
-                status_match = re.search(r'连通性: (\w+)', line)
-                if status_match:
-                    current_info['status'] = status_match.group(1)
-            elif 'IP地址:' in line:
-                ip_match = re.search(r'IP地址: (.+)', line)
-                if ip_match:
-                    current_info['ip'] = ip_match.group(1).strip()
-            elif '网关:' in line:
-                gateway_match = re.search(r'网关: (.+)', line)
-                if gateway_match:
-                    current_info['gateway'] = gateway_match.group(1).strip()
-            elif 'DNS:' in line:
-                dns_match = re.search(r'DNS: (.+)', line)
-                if dns_match:
-                    current_info['dns'] = dns_match.group(1).strip()
-                    # 收集完一个主机的信息后添加到结果
-                    if len(current_info) > 1:
-                        network_info.append(current_info.copy())
-                        current_info = {}
-                        current_host = None
-    
-    return network_info
+def start_background():
+    """启动后台线程; 开发服务器在启动前调用, gunicorn在每个工作进程fork之后调用(见gunicorn.conf.py)"""
+    if leader_election:
+        leader_election.ensure_started()
+    if metrics_publisher:
+        metrics_publisher.ensure_started()
+    # 预热常驻Ansible执行引擎, 避免第一个请求承担加载开销
+    if ansible_runner.engine:
+        ansible_runner.engine.start()
+    resource_collector.ensure_started()
+    network_inventory.ensure_started()
+    power_watcher.ensure_started()
+    if ansible_runner.ssh_pool:
+        ansible_runner.ssh_pool.ensure_started()
+
+def stop_background():
+    """工作进程退出时释放主进程租约, 其他进程可以立即接管后台采集"""
+    resource_collector.stop()
+    network_inventory.stop()
+    power_watcher.stop()
+    if leader_election:
+        leader_election.stop()
+    if metrics_publisher:
+        metrics_publisher.stop()
+    if ansible_runner.engine:
+        ansible_runner.engine.shutdown()
 
 if __name__ == '__main__':
+    start_background()
+    
     app.run(
         host='0.0.0.0', 
         port=5000, 
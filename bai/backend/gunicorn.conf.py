@@ -0,0 +1,37 @@
+"""生产环境入口: gunicorn多进程 + 每进程多线程
+
+    cd /app/backend && gunicorn -c gunicorn.conf.py app:app
+
+每个工作进程有自己的Ansible执行引擎和请求线程池, 一个进程被长时间的Ansible调用
+占满时其他进程仍可处理请求。需要跨进程一致的状态(登录会话、任务登记表、资源采集快照、
+主进程选举)保存在 /app/data 下的SQLite文件中; 资源采集只在持有租约的主进程中执行。
+"""
+import os
+import multiprocessing
+
+# 在导入app之前设置多进程模式所需的默认值, 环境变量中已显式设置的优先
+os.environ.setdefault('SHARED_STATE_DB', '/app/data/state.db')
+os.environ.setdefault('SESSION_BACKEND', 'sqlite')
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_WORKERS', 0)) or min(multiprocessing.cpu_count(), 8)
+# SSE连接和同步的Ansible调用各占用一个线程, 线程数需要覆盖同时打开的浏览器标签页
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 32))
+# gthread的心跳由主线程发送, 长时间的请求不会触发worker超时
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# 不预加载: Ansible引擎子进程和后台线程必须在各工作进程中分别创建
+preload_app = False
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    from app import start_background
+    start_background()
+
+
+def worker_exit(server, worker):
+    from app import stop_background
+    stop_background()
@@ -0,0 +1,556 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import atexit
+import signal
+import socket
+import logging
+import threading
+import subprocess
+import importlib.util
+from multiprocessing.connection import Connection
+from typing import Dict, List, Any, Optional
+from utils.ansible_results import add_task_result, task_status, COMMAND_LIKE_MODULES
+
+logger = logging.getLogger(__name__)
+
+# ansible TaskQueueManager 的返回码
+RUN_OK = 0
+RUN_ERROR = 1
+
+# 复用VariableManager和替换PlaybookExecutor的stdout callback没有公开接口, 依赖Ansible的内部属性,
+# 只在_set_extra_vars/_set_stdout_callback中访问; 已确认这些属性存在的ansible-core版本范围(含)
+INTERNALS_VERSIONS = ((2, 9), (2, 18))
+
+
+def ansible_api_available() -> bool:
+    """当前环境是否可以导入Ansible Python API"""
+    return importlib.util.find_spec('ansible') is not None
+
+
+def _make_callback_class():
+    """在工作进程内构建callback类(需要先导入ansible)"""
+    from ansible.plugins.callback import CallbackBase
+    from ansible.module_utils.common.json import AnsibleJSONEncoder
+
+    class CaptureCallback(CallbackBase):
+        """直接收集按主机、按任务组织的结构化结果, 同时渲染与CLI一致的文本"""
+        CALLBACK_VERSION = 2.0
+        CALLBACK_TYPE = 'stdout'
+        CALLBACK_NAME = 'dashboard_capture'
+
+        def __init__(self, adhoc: bool = False):
+            super().__init__()
+            self.adhoc = adhoc
+            self.stdout_lines = []
+            self.stderr_lines = []
+            self.host_results = {}
+            self.custom_stats = {}
+            # (主机, 任务uuid) -> 开始时间, 用于记录单台主机上每个任务的耗时
+            self._started = {}
+            # 每条任务结果产生时的回调, 用于把进度实时发回父进程
+            self.on_record = None
+
+        def _record(self, result, status: Optional[str] = None):
+            # 回调收到的是clean_copy()后的结果, 其中已去掉failed/skipped字段,
+            # 失败/不可达/跳过的状态由对应的回调方法直接给出
+            host = result._host.get_name()
+            add_task_result(
+                self.host_results,
+                host,
+                result._task.get_name().strip(),
+                result._task.action,
+                status or task_status(result._result),
+                result._result
+            )
+            started = self._started.pop((host, result._task._uuid), None)
+            if started is not None:
+                self.host_results[host]["tasks"][-1]["duration"] = round(time.time() - started, 3)
+            if self.on_record:
+                entry = self.host_results[host]
+                self.on_record(json.loads(json.dumps(
+                    dict(entry["tasks"][-1], host=host, host_status=entry["status"]),
+                    cls=AnsibleJSONEncoder
+                )))
+
+        def structured(self) -> Dict[str, Any]:
+            """转换为普通的Python类型, 便于跨进程传递"""
+            return json.loads(json.dumps(
+                {"host_results": self.host_results, "custom_stats": self.custom_stats},
+                cls=AnsibleJSONEncoder
+            ))
+
+        def _emit(self, text: str):
+            self.stdout_lines.append(text)
+
+        def _command_msg(self, host: str, result: Dict, caption: str) -> str:
+            msg = f"{host} | {caption} | rc={result.get('rc', -1)} >>\n"
+            msg += result.get('stdout', '')
+            if result.get('stderr'):
+                msg += '\n' + result['stderr']
+            if result.get('msg'):
+                msg += '\n' + result['msg']
+            return msg
+
+        def _adhoc_line(self, result, caption: str, json_caption: str):
+            host = result._host.get_name()
+            if result._task.action in COMMAND_LIKE_MODULES and 'ansible_job_id' not in result._result:
+                self._emit(self._command_msg(host, result._result, caption))
+            else:
+                self._emit(f"{host} | {json_caption} => {self._dump_results(result._result, indent=4)}")
+
+        def v2_playbook_on_play_start(self, play):
+            if not self.adhoc:
+                self._emit(f"\nPLAY [{play.get_name().strip()}] " + '*' * 40)
+
+        def v2_playbook_on_task_start(self, task, is_conditional):
+            if not self.adhoc:
+                self._emit(f"\nTASK [{task.get_name().strip()}] " + '*' * 40)
+
+        def v2_runner_on_start(self, host, task):
+            self._started[(host.get_name(), task._uuid)] = time.time()
+
+        def v2_runner_on_ok(self, result):
+            self._record(result)
+            host = result._host.get_name()
+            changed = result._result.get('changed', False)
+            if self.adhoc:
+                caption = 'CHANGED' if changed else 'SUCCESS'
+                self._adhoc_line(result, caption, caption)
+                return
+            status = 'changed' if changed else 'ok'
+            if result._result.get('_ansible_verbose_always'):
+                self._emit(f"{status}: [{host}] => {self._dump_results(result._result, indent=4)}")
+            else:
+                self._emit(f"{status}: [{host}]")
+
+        def v2_runner_on_failed(self, result, ignore_errors=False):
+            self._record(result, 'ignored' if ignore_errors else 'failed')
+            host = result._host.get_name()
+            self.stderr_lines.append(f"{host} | {result._result.get('msg') or result._result.get('stderr', '')}")
+            if self.adhoc:
+                self._adhoc_line(result, 'FAILED', 'FAILED!')
+                return
+            self._emit(f"fatal: [{host}]: FAILED! => {self._dump_results(result._result, indent=4)}")
+            if ignore_errors:
+                self._emit("...ignoring")
+
+        def v2_runner_on_unreachable(self, result):
+            self._record(result, 'unreachable')
+            host = result._host.get_name()
+            self.stderr_lines.append(f"{host} | {result._result.get('msg', '')}")
+            if self.adhoc:
+                self._emit(f"{host} | UNREACHABLE! => {self._dump_results(result._result, indent=4)}")
+            else:
+                self._emit(f"fatal: [{host}]: UNREACHABLE! => {self._dump_results(result._result, indent=4)}")
+
+        def v2_runner_on_skipped(self, result):
+            self._record(result, 'skipped')
+            host = result._host.get_name()
+            self._emit(f"{host} | SKIPPED" if self.adhoc else f"skipping: [{host}]")
+
+        def v2_playbook_on_stats(self, stats):
+            self.custom_stats = {
+                host: data for host, data in stats.custom.items() if host != '_run'
+            }
+            if self.adhoc:
+                return
+            self._emit("\nPLAY RECAP " + '*' * 40)
+            for host in sorted(stats.processed.keys()):
+                s = stats.summarize(host)
+                self._emit(
+                    f"{host} : ok={s['ok']} changed={s['changed']} unreachable={s['unreachable']} "
+                    f"failed={s['failures']} skipped={s['skipped']} rescued={s['rescued']} ignored={s['ignored']}"
+                )
+
+    return CaptureCallback
+
+
+def _check_ansible_version():
+    """版本不在INTERNALS_VERSIONS范围内时给出警告, 内部属性缺失时由使用处报错"""
+    from ansible.release import __version__
+    version = tuple(int(part) for part in re.findall(r'\d+', __version__)[:2])
+    low, high = INTERNALS_VERSIONS
+    if not low <= version <= high:
+        logger.warning(f"ansible-core {__version__} 不在已验证的版本范围内, 常驻引擎依赖的内部属性可能已变化")
+
+
+def _set_extra_vars(variable_manager, extra_vars: Dict):
+    """替换常驻VariableManager的extra vars(公开接口只在创建时从命令行参数读取)"""
+    if not hasattr(variable_manager, '_extra_vars'):
+        raise RuntimeError("当前Ansible版本的VariableManager不支持替换extra vars, 请使用CLI模式(ANSIBLE_ENGINE=0)")
+    variable_manager._extra_vars = extra_vars
+
+
+def _set_stdout_callback(pbex, callback):
+    """PlaybookExecutor不接受stdout_callback参数, 直接替换其TaskQueueManager上的callback"""
+    tqm = getattr(pbex, '_tqm', None)
+    if tqm is None or not hasattr(tqm, '_stdout_callback'):
+        raise RuntimeError("当前Ansible版本的PlaybookExecutor不支持替换stdout callback, 请使用CLI模式(ANSIBLE_ENGINE=0)")
+    tqm._stdout_callback = callback
+
+
+class _WorkerState:
+    """工作进程内常驻的Ansible对象(loader、inventory、variable manager)"""
+
+    def __init__(self, inventory_path: str):
+        from ansible import context
+        from ansible.module_utils.common.collections import ImmutableDict
+        from ansible.parsing.dataloader import DataLoader
+        from ansible.inventory.manager import InventoryManager
+        from ansible.vars.manager import VariableManager
+
+        self._context = context
+        self._ImmutableDict = ImmutableDict
+        self._DataLoader = DataLoader
+        self._InventoryManager = InventoryManager
+        self._VariableManager = VariableManager
+        self.inventory_path = inventory_path
+        _check_ansible_version()
+        self.callback_class = _make_callback_class()
+        # 由_worker_main设置, 把单条任务结果作为event消息发给父进程
+        self.send_event = None
+        self._set_cli_args(forks=5)
+        self._load_inventory()
+
+    def _set_cli_args(self, forks: int):
+        self._context.CLIARGS = self._ImmutableDict(
+            connection='smart', module_path=None, forks=forks,
+            become=None, become_method=None, become_user=None,
+            check=False, diff=False, verbosity=0, syntax=False,
+            start_at_task=None, listhosts=False, listtasks=False, listtags=False,
+            tags=('all',), skip_tags=(), extra_vars=()
+        )
+
+    def _inventory_signature(self):
+        try:
+            st = os.stat(self.inventory_path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _load_inventory(self):
+        self.loader = self._DataLoader()
+        self.inventory = self._InventoryManager(loader=self.loader, sources=[self.inventory_path])
+        self.variable_manager = self._VariableManager(loader=self.loader, inventory=self.inventory)
+        self._signature = self._inventory_signature()
+
+    def refresh(self):
+        """inventory文件发生变化时重新加载, 否则直接复用"""
+        if self._inventory_signature() != self._signature:
+            self._load_inventory()
+        else:
+            # PlaybookExecutor结束时不会撤销最后一批的restrict_to_hosts, 复用前先清除
+            self.inventory.remove_restriction()
+
+    def list_hosts(self, pattern: str = 'all') -> List[str]:
+        self.refresh()
+        return [h.get_name() for h in self.inventory.list_hosts(pattern)]
+
+    def _new_callback(self, adhoc: bool, stream: bool):
+        callback = self.callback_class(adhoc=adhoc)
+        if stream:
+            callback.on_record = self.send_event
+        return callback
+
+    def run_adhoc(self, module: str, args: str, pattern: str, timeout: int, forks: int = 5,
+                  stream: bool = False, strategy: Optional[str] = None) -> Dict[str, Any]:
+        from ansible import constants as C
+        from ansible.parsing.splitter import parse_kv
+        from ansible.playbook.play import Play
+        from ansible.executor.task_queue_manager import TaskQueueManager
+
+        self.refresh()
+        if not self.inventory.list_hosts(pattern):
+            return {
+                "success": True,
+                "stdout": "",
+                "stderr": "[WARNING]: No hosts matched, nothing to do",
+                "return_code": RUN_OK,
+                "host_results": {},
+                "custom_stats": {}
+            }
+
+        self._set_cli_args(forks=forks)
+        check_raw = module in C.MODULE_REQUIRE_ARGS
+        task = {'action': {'module': module, 'args': parse_kv(args, check_raw=check_raw)}}
+        if timeout:
+            task['timeout'] = timeout
+        play_source = {
+            'name': 'Ansible Ad-Hoc',
+            'hosts': pattern,
+            'gather_facts': 'no',
+            'tasks': [task]
+        }
+        if strategy:
+            play_source['strategy'] = strategy
+        play = Play().load(play_source, variable_manager=self.variable_manager, loader=self.loader)
+        callback = self._new_callback(adhoc=True, stream=stream)
+        tqm = TaskQueueManager(
+            inventory=self.inventory,
+            variable_manager=self.variable_manager,
+            loader=self.loader,
+            passwords={},
+            stdout_callback=callback,
+            forks=forks
+        )
+        try:
+            return_code = tqm.run(play)
+        finally:
+            tqm.cleanup()
+            self.loader.cleanup_all_tmp_files()
+
+        result = {
+            "success": return_code == RUN_OK,
+            "stdout": '\n'.join(callback.stdout_lines) + '\n',
+            "stderr": '\n'.join(callback.stderr_lines),
+            "return_code": return_code
+        }
+        result.update(callback.structured())
+        return result
+
+    def run_playbook(self, playbook_path: str, extra_vars: Optional[Dict] = None, forks: int = 5,
+                     stream: bool = False) -> Dict[str, Any]:
+        from ansible.executor.playbook_executor import PlaybookExecutor
+
+        self.refresh()
+        self._set_cli_args(forks=forks)
+        _set_extra_vars(self.variable_manager, dict(extra_vars or {}))
+        callback = self._new_callback(adhoc=False, stream=stream)
+        pbex = PlaybookExecutor(
+            playbooks=[playbook_path],
+            inventory=self.inventory,
+            variable_manager=self.variable_manager,
+            loader=self.loader,
+            passwords={}
+        )
+        try:
+            _set_stdout_callback(pbex, callback)
+            return_code = pbex.run()
+        finally:
+            _set_extra_vars(self.variable_manager, {})
+            self.loader.cleanup_all_tmp_files()
+
+        result = {
+            "success": return_code == RUN_OK,
+            "stdout": '\n'.join(callback.stdout_lines) + '\n',
+            "stderr": '\n'.join(callback.stderr_lines),
+            "return_code": return_code
+        }
+        result.update(callback.structured())
+        return result
+
+
+def _worker_main(conn, inventory_path: str):
+    """工作进程入口: 预热Ansible API后循环处理请求"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        state = _WorkerState(inventory_path)
+    except Exception as e:
+        conn.send(('error', f"Ansible引擎初始化失败: {e}"))
+        return
+    conn.send(('ready', os.getpid()))
+    state.send_event = lambda data: conn.send(('event', data))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        op, kwargs = message
+        try:
+            conn.send(('result', getattr(state, op)(**kwargs)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+class _EngineWorker:
+    """父进程侧的工作进程句柄"""
+
+    def __init__(self, inventory_path: str, extra_env: Optional[Dict[str, str]] = None):
+        parent_sock, child_sock = socket.socketpair()
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, **(extra_env or {}))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [backend_dir, env.get('PYTHONPATH')]))
+        # 独立的进程会话, 超时时可以连同ansible派生的子进程一起结束;
+        # 不使用multiprocessing, 避免工作进程重新导入app.py
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'utils.ansible_engine', inventory_path, str(child_sock.fileno())],
+            pass_fds=(child_sock.fileno(),),
+            env=env,
+            start_new_session=True
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.ready = False
+
+    def wait_ready(self, timeout: float):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise TimeoutError("Ansible引擎预热超时")
+        kind, payload = self.conn.recv()
+        if kind != 'ready':
+            raise RuntimeError(payload)
+        self.ready = True
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.process.wait(timeout=2)
+            self.conn.close()
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class AnsibleEngine:
+    """常驻的Ansible执行引擎
+
+    每个工作进程只加载一次Ansible API与inventory, 之后的ad-hoc命令和playbook
+    都在已预热的进程中执行, 省去每次调用CLI的解释器启动、插件加载与inventory解析。
+    """
+
+    def __init__(self, inventory_path: str, playbook_dir: str, min_workers: int = 1, max_workers: int = 4,
+                 extra_env: Optional[Dict[str, str]] = None):
+        self.inventory_path = inventory_path
+        self.playbook_dir = playbook_dir
+        # 工作进程额外的环境变量(如SSH连接复用配置), Ansible在进程启动时读取
+        self.extra_env = extra_env or {}
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._total = 0
+        self._closed = False
+        atexit.register(self.shutdown)
+
+    def start(self):
+        """预先启动最少数量的工作进程"""
+        with self._lock:
+            while self._total < self.min_workers:
+                self._idle.put(_EngineWorker(self.inventory_path, self.extra_env))
+                self._total += 1
+
+    def _checkout(self, timeout: float) -> _EngineWorker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        # 在锁内占用名额, 在锁外启动进程, 启动期间其他调用不被阻塞
+        with self._lock:
+            spawn = self._total < self.max_workers
+            if spawn:
+                self._total += 1
+        if not spawn:
+            try:
+                return self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"{timeout:.0f}秒内没有空闲的Ansible引擎工作进程(上限{self.max_workers}个)")
+        try:
+            return _EngineWorker(self.inventory_path, self.extra_env)
+        except BaseException:
+            with self._lock:
+                self._total -= 1
+            raise
+
+    def _checkin(self, worker: _EngineWorker):
+        if self._closed:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def stats(self) -> Dict[str, int]:
+        idle = self._idle.qsize()
+        with self._lock:
+            total = self._total
+        return {"idle": idle, "busy": max(total - idle, 0)}
+
+    def _discard(self, worker: _EngineWorker):
+        worker.kill()
+        with self._lock:
+            self._total -= 1
+
+    def _call(self, op: str, call_timeout: float, on_event=None, **kwargs) -> Any:
+        """在工作进程中执行op; 给出on_event时, 每条任务结果产生后立即回调"""
+        deadline = time.monotonic() + call_timeout
+        worker = self._checkout(call_timeout)
+        if on_event:
+            kwargs['stream'] = True
+        try:
+            worker.wait_ready(max(deadline - time.monotonic(), 0.1))
+            worker.conn.send((op, kwargs))
+            while True:
+                if not worker.conn.poll(max(deadline - time.monotonic(), 0.1)):
+                    self._discard(worker)
+                    worker = None
+                    raise TimeoutError
+                kind, payload = worker.conn.recv()
+                if kind != 'event':
+                    break
+                try:
+                    on_event(payload)
+                except Exception as e:
+                    logger.error(f"处理任务事件失败: {e}")
+        except (EOFError, BrokenPipeError, OSError, RuntimeError):
+            if worker is not None:
+                self._discard(worker)
+                worker = None
+            raise
+        finally:
+            if worker is not None:
+                self._checkin(worker)
+        if kind == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+    def run_adhoc(self, module: str, args: str = "", hosts: str = "all", timeout: int = 15, forks: int = 5,
+                  on_event=None, task_timeout: Optional[int] = None, strategy: Optional[str] = None) -> Dict[str, Any]:
+        """在预热的工作进程中执行ad-hoc命令
+        
+        timeout是整个调用的超时, task_timeout是每台主机上任务的超时(默认与timeout相同)。
+        """
+        return self._call(
+            'run_adhoc', timeout, on_event,
+            module=module, args=args, pattern=hosts, timeout=task_timeout or timeout, forks=forks,
+            strategy=strategy
+        )
+
+    def run_playbook(self, playbook_name: str, extra_vars: Dict = None, timeout: int = 30, forks: int = 5,
+                     on_event=None) -> Dict[str, Any]:
+        """在预热的工作进程中执行playbook"""
+        playbook_path = os.path.join(self.playbook_dir, playbook_name)
+        return self._call(
+            'run_playbook', timeout, on_event,
+            playbook_path=playbook_path, extra_vars=extra_vars, forks=forks
+        )
+
+    def list_hosts(self, pattern: str = 'all', timeout: int = 10) -> List[str]:
+        """解析主机模式, 返回匹配的主机名"""
+        return self._call('list_hosts', timeout, pattern=pattern)
+
+    def shutdown(self):
+        """停止所有工作进程"""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+
+
+if __name__ == '__main__':
+    _worker_main(Connection(int(sys.argv[2])), sys.argv[1])
@@ -0,0 +1,91 @@
+import json
+from typing import Dict, Any, Tuple
+
+# 常驻引擎的文本输出沿用ansible CLI默认callback(ad-hoc为minimal, playbook为default)的格式,
+# 以保证现有解析逻辑不需要任何修改; ad-hoc输出中这些模块按"主机 | 状态 | rc=N >>"加原始输出显示,
+# 其余模块显示JSON结果
+COMMAND_LIKE_MODULES = {
+    'command', 'shell', 'raw', 'script',
+    'ansible.builtin.command', 'ansible.builtin.shell',
+    'ansible.builtin.raw', 'ansible.builtin.script'
+}
+
+# 主机整体状态的优先级, 取所有任务中最严重的一个
+STATUS_PRIORITY = {
+    'skipped': 0,
+    'ok': 1,
+    'ignored': 1,
+    'changed': 2,
+    'failed': 3,
+    'unreachable': 4
+}
+
+
+def clean_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉ansible内部字段, 只保留模块返回的数据"""
+    return {
+        key: value for key, value in result.items()
+        if not key.startswith('_ansible') and key != 'invocation'
+    }
+
+
+def task_status(result: Dict[str, Any], ignore_errors: bool = False) -> str:
+    """根据单个任务结果判断状态"""
+    if result.get('unreachable'):
+        return 'unreachable'
+    if result.get('failed'):
+        return 'ignored' if ignore_errors else 'failed'
+    if result.get('skipped'):
+        return 'skipped'
+    if result.get('changed'):
+        return 'changed'
+    return 'ok'
+
+
+def add_task_result(host_results: Dict[str, Dict], host: str, task: str, action: str,
+                    status: str, result: Dict[str, Any]):
+    """记录一台主机上一个任务的结果, 并更新主机整体状态"""
+    entry = host_results.setdefault(host, {"status": "skipped", "tasks": []})
+    entry["tasks"].append({
+        "task": task,
+        "action": action,
+        "status": status,
+        "result": clean_result(result)
+    })
+    if STATUS_PRIORITY[status] > STATUS_PRIORITY[entry["status"]]:
+        entry["status"] = status
+
+
+def from_json_callback(output: str) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """把ansible.posix.json callback的输出转换为按主机组织的结构"""
+    data = json.loads(output[output.index('{'):])
+    host_results = {}
+    for play in data.get('plays', []):
+        for task in play.get('tasks', []):
+            task_name = task.get('task', {}).get('name', '')
+            for host, result in task.get('hosts', {}).items():
+                add_task_result(
+                    host_results, host, task_name, result.get('action', ''),
+                    task_status(result), result
+                )
+    return host_results, data.get('custom_stats', {})
+
+
+def render_adhoc_host(host: str, entry: Dict[str, Any]) -> str:
+    """按ad-hoc命令的CLI(minimal callback)格式渲染一台主机的结构化结果"""
+    task = entry["tasks"][-1]
+    result = task["result"]
+    status = task["status"]
+    if status == 'unreachable':
+        return f"{host} | UNREACHABLE! => {json.dumps(result, indent=4, ensure_ascii=False)}"
+    if status == 'skipped':
+        return f"{host} | SKIPPED"
+    caption = {'failed': 'FAILED', 'changed': 'CHANGED'}.get(status, 'SUCCESS')
+    if task["action"] in COMMAND_LIKE_MODULES:
+        text = f"{host} | {caption} | rc={result.get('rc', -1)} >>\n" + result.get('stdout', '')
+        for key in ('stderr', 'msg'):
+            if result.get(key):
+                text += '\n' + result[key]
+        return text
+    json_caption = 'FAILED!' if status == 'failed' else caption
+    return f"{host} | {json_caption} => {json.dumps(result, indent=4, ensure_ascii=False)}"
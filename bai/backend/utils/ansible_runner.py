@@ -1,40 +1,311 @@
 import subprocess
 import json
+import math
 import os
 import tempfile
-from typing import Dict, List, Any
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+from utils.ansible_engine import AnsibleEngine, ansible_api_available
+from utils.ansible_results import from_json_callback
+from utils.inventory import Inventory
+from utils.ssh_pool import SSHConnectionPool
+from utils.facts_cache import FactsCache, FACT_SUBSETS, setup_args
+from utils.single_flight import SingleFlight
+from utils.telemetry import (
+    registry, ANSIBLE_DURATION, ANSIBLE_RUNS, ANSIBLE_HOST_TASK_DURATION, ANSIBLE_HOST_RESULTS, PARSE_DURATION
+)
+
+logger = logging.getLogger(__name__)
+
+# CLI模式下收集结构化结果所用的callback(随ansible包中的ansible.posix集合发布)
+JSON_CALLBACK_ENV = {
+    "ANSIBLE_STDOUT_CALLBACK": "ansible.posix.json",
+    "ANSIBLE_LOAD_CALLBACK_PLUGINS": "1",
+    "ANSIBLE_SHOW_CUSTOM_STATS": "1"
+}
+
+# 与目标主机数无关的固定开销(进程启动、inventory加载、收尾)
+TIMEOUT_OVERHEAD = 10
+
+# 可以通过API指定的playbook执行策略
+STRATEGIES = ('linear', 'free', 'host_pinned')
+
+# 应用自身使用的模块, 在指标标签中记录模块名; 其他模块(API请求中任意指定的)和不在playbook_dir中的
+# playbook统一记为other, 避免标签取值无限增长。playbook_dir/library中的自定义模块同样记录模块名
+METRIC_MODULES = frozenset({
+    'ping', 'setup', 'gather_facts', 'shell', 'command', 'raw', 'copy', 'stat', 'file',
+    'get_url', 'wait_for', 'set_stats'
+})
+
+# 只读取目标主机状态的模块和playbook: 相同的并发调用合并为一次执行(见SingleFlight)
+READ_ONLY_MODULES = ('ping', 'setup')
+READ_ONLY_PLAYBOOKS = ('resource_monitor.yml', 'network_scan.yml')
 
 class AnsibleRunner:
-    def __init__(self, inventory_path: str = "/app/ansible/hosts"):
+    def __init__(self, inventory_path: str = "/app/ansible/hosts", use_engine: bool = None,
+                 coalesce: bool = True):
         self.inventory_path = inventory_path
         self.playbook_dir = "/app/ansible/playbooks"
+        self.inventory = Inventory(inventory_path)
+        
+        # 并发数随目标主机数增长, 上限默认为CPU数×25(每个fork大部分时间在等待网络)
+        self.max_forks = int(os.environ.get('ANSIBLE_MAX_FORKS', 0)) or min(500, (os.cpu_count() or 1) * 25)
+        # 单台主机的时间预算, 总超时 = 预算 × 执行轮数 + 固定开销
+        self.adhoc_host_timeout = int(os.environ.get('ANSIBLE_ADHOC_HOST_TIMEOUT', 15))
+        self.playbook_host_timeout = int(os.environ.get('ANSIBLE_PLAYBOOK_HOST_TIMEOUT', 30))
+        
+        # SSH连接复用: 所有Ansible进程共用ControlMaster socket目录并打开pipelining,
+        # 已在环境中显式设置的ANSIBLE_*变量优先
+        self.ssh_pool = None
+        self.ansible_env = {}
+        if os.environ.get('SSH_MULTIPLEX', '1') != '0':
+            self.ssh_pool = SSHConnectionPool(
+                os.environ.get('SSH_CONTROL_DIR', '/tmp/dashboard-ssh'),
+                persist=int(os.environ.get('SSH_CONTROL_PERSIST', 120)),
+                max_masters=int(os.environ.get('SSH_MAX_MASTERS', 256)),
+                pipelining=os.environ.get('SSH_PIPELINING', '1') != '0'
+            )
+            self.ansible_env = {
+                key: value for key, value in self.ssh_pool.ansible_env().items() if key not in os.environ
+            }
+        
+        # facts缓存: 按分组设置有效期, 只对过期的主机和分组执行setup
+        self.facts_cache = FactsCache(
+            os.environ.get('FACTS_CACHE_DIR', '/app/data/facts'),
+            ttls={
+                name: int(os.environ[f'FACTS_TTL_{name.upper()}'])
+                for name in FACT_SUBSETS if os.environ.get(f'FACTS_TTL_{name.upper()}')
+            }
+        )
+        self._facts_lock = threading.Lock()
+        
+        # 相同的只读操作(模块/playbook、参数和目标主机集合都相同)正在执行时, 后来的调用共享其结果;
+        # 结束后的结果在ANSIBLE_COALESCE_TTL秒内继续复用, 执行出错(超时等)的结果不复用;
+        # coalesce=False时每次调用都实际执行(如基准测试需要测量重复调用)
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight(
+            ttl=float(os.environ.get('ANSIBLE_COALESCE_TTL', 2)),
+            keep=lambda result: result["return_code"] != -1
+        )
+        
+        # 默认使用常驻执行引擎, ANSIBLE_ENGINE=0 时退回到每次调用CLI
+        if use_engine is None:
+            use_engine = os.environ.get('ANSIBLE_ENGINE', '1') != '0'
+        self.engine = None
+        if use_engine and ansible_api_available():
+            self.engine = AnsibleEngine(
+                self.inventory_path,
+                self.playbook_dir,
+                min_workers=int(os.environ.get('ANSIBLE_ENGINE_MIN_WORKERS', 1)),
+                max_workers=int(os.environ.get('ANSIBLE_ENGINE_MAX_WORKERS', 4)),
+                extra_env=self.ansible_env
+            )
+        self._register_metrics()
+    
+    def _register_metrics(self):
+        """导出facts缓存、SSH连接复用和执行引擎的统计(在/metrics被请求时读取)"""
+        facts = self.facts_cache
+        registry.counter(
+            'dashboard_facts_cache_lookups_total', 'facts缓存查询次数(按主机和分组计)', ('result',),
+            callback=lambda: {('hit',): facts.hits, ('miss',): facts.misses}
+        )
+        if self.ssh_pool:
+            pool = self.ssh_pool
+            registry.counter(
+                'dashboard_ssh_connections_total', '目标主机连接次数, reused为复用已有主连接', ('result',),
+                callback=lambda: {(key,): value for key, value in pool.counters().items() if key in ('reused', 'opened')}
+            )
+        flights = self.single_flight
+        registry.counter(
+            'dashboard_ansible_calls_total',
+            '只读Ansible调用次数: executed为实际执行, coalesced为合并到执行中的相同调用, cached为复用刚结束的结果',
+            ('result',),
+            callback=lambda: {(key,): value for key, value in flights.stats().items() if key != 'in_flight'}
+        )
+        if self.engine:
+            engine = self.engine
+            registry.gauge(
+                'dashboard_ansible_engine_workers', '常驻执行引擎的工作进程数', ('state',),
+                callback=lambda: {(key,): value for key, value in engine.stats().items()}
+            )
     
-    def run_adhoc_command(self, module: str, args: str = "", hosts: str = "all") -> Dict[str, Any]:
-        """执行ansible ad-hoc命令"""
+    def _engine_call(self, method: str, *args, **kwargs) -> Dict[str, Any]:
+        """通过常驻引擎执行, 引擎异常时返回与CLI一致的错误结构"""
+        try:
+            return getattr(self.engine, method)(*args, **kwargs)
+        except TimeoutError as e:
+            # 工作进程全部忙碌时带有说明, 执行本身超时时没有
+            return {
+                "success": False,
+                "stdout": "",
+                "stderr": str(e) or ("命令执行超时" if method == 'run_adhoc' else "Playbook执行超时"),
+                "return_code": -1
+            }
+        except Exception as e:
+            logger.error(f"Ansible引擎执行失败: {e}")
+            return {
+                "success": False,
+                "stdout": "",
+                "stderr": str(e),
+                "return_code": -1
+            }
+    
+    def _cli_result(self, result: subprocess.CompletedProcess, structured: bool, on_event=None) -> Dict[str, Any]:
+        """整理CLI子进程的执行结果"""
+        output = {
+            "success": result.returncode == 0,
+            "stdout": result.stdout,
+            "stderr": result.stderr,
+            "return_code": result.returncode
+        }
+        if structured:
+            try:
+                with PARSE_DURATION.time(parser='json_callback'):
+                    output["host_results"], output["custom_stats"] = from_json_callback(result.stdout)
+            except ValueError as e:
+                logger.error(f"解析JSON callback输出失败: {e}")
+                output["host_results"], output["custom_stats"] = {}, {}
+            # CLI只能在结束后一次性拿到结果, 逐条补发任务事件
+            if on_event:
+                for host, entry in output["host_results"].items():
+                    for task in entry["tasks"]:
+                        on_event(dict(task, host=host, host_status=entry["status"]))
+        return output
+    
+    def _observe(self, kind: str, name: str, start: float, result: Dict[str, Any]) -> Dict[str, Any]:
+        """记录一次执行的耗时、返回码、每台主机的结果状态和单任务耗时"""
+        mode = 'engine' if self.engine else 'cli'
+        name = self._metric_label(name, playbook=kind == 'playbook')
+        ANSIBLE_DURATION.observe(time.perf_counter() - start, kind=kind, name=name, mode=mode)
+        ANSIBLE_RUNS.inc(kind=kind, name=name, mode=mode, return_code=result["return_code"])
+        for entry in result.get("host_results", {}).values():
+            ANSIBLE_HOST_RESULTS.inc(kind=kind, name=name, status=entry["status"])
+            for task in entry["tasks"]:
+                # 只有常驻引擎的callback记录了单台主机上的任务耗时
+                if "duration" in task:
+                    ANSIBLE_HOST_TASK_DURATION.observe(task["duration"], action=self._metric_label(task["action"]))
+        return result
+    
+    def _metric_label(self, name: str, playbook: bool = False) -> str:
+        """指标中使用的模块/playbook名: 已知的模块和playbook_dir中的playbook保留原名, 其他记为other"""
+        if name != os.path.basename(name):
+            return 'other'
+        if playbook:
+            return name if os.path.isfile(os.path.join(self.playbook_dir, name)) else 'other'
+        for prefix in ('ansible.builtin.', 'ansible.legacy.'):
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+        if name in METRIC_MODULES or os.path.isfile(os.path.join(self.playbook_dir, 'library', f"{name}.py")):
+            return name
+        return 'other'
+    
+    def plan(self, hosts: str = "all", host_timeout: Optional[int] = None, forks: Optional[int] = None,
+             serial: Optional[int] = None, playbook: bool = False) -> Dict[str, int]:
+        """根据目标主机数计算并发数和总超时
+        
+        forks默认等于目标主机数(不超过max_forks), 所有主机在一轮内并行执行;
+        主机数超过forks或指定了serial分批时, 总超时按执行轮数累加单主机预算。
+        """
+        count = max(len(self.inventory.match(hosts)), 1)
+        host_timeout = host_timeout or (self.playbook_host_timeout if playbook else self.adhoc_host_timeout)
+        forks = min(forks or count, self.max_forks)
+        batch = min(serial or count, count)
+        waves = math.ceil(count / batch) * math.ceil(batch / forks)
+        return {
+            "hosts": count,
+            "forks": min(forks, batch),
+            "host_timeout": host_timeout,
+            "timeout": host_timeout * waves + TIMEOUT_OVERHEAD
+        }
+    
+    def _track_connections(self, hosts: str):
+        """统计本次执行的目标主机中有多少可以复用已有的SSH主连接"""
+        if self.ssh_pool:
+            self.ssh_pool.track(self.ssh_pool.targets(self.inventory, self.inventory.match(hosts)))
+    
+    def _cli_env(self, structured: bool, strategy: Optional[str]) -> Optional[Dict[str, str]]:
+        env = dict(self.ansible_env)
+        if structured:
+            env.update(JSON_CALLBACK_ENV)
+        if strategy:
+            env["ANSIBLE_STRATEGY"] = strategy
+        return dict(os.environ, **env) if env else None
+    
+    def run_adhoc_command(self, module: str, args: str = "", hosts: str = "all", structured: bool = False,
+                          timeout: Optional[int] = None, on_event=None, forks: Optional[int] = None,
+                          host_timeout: Optional[int] = None, strategy: Optional[str] = None) -> Dict[str, Any]:
+        """执行ansible ad-hoc命令
+        
+        常驻引擎总是附带结构化结果(host_results); CLI模式仅在structured=True时
+        改用JSON callback收集, 此时stdout为JSON而不是可读文本。
+        on_event在每台主机的每个任务完成时被调用(引擎模式下实时, CLI模式下在结束后)。
+        未指定timeout时由plan()按目标主机数和单主机预算计算。
+        只读模块(READ_ONLY_MODULES)且没有on_event时, 与正在执行的相同调用合并。
+        """
+        if self.coalesce and on_event is None and module in READ_ONLY_MODULES:
+            key = ('adhoc', module, args, self._host_key(hosts), structured)
+            return self._coalesced(key, lambda: self._run_adhoc_command(
+                module, args, hosts, structured, timeout, None, forks, host_timeout, strategy
+            ))
+        return self._run_adhoc_command(module, args, hosts, structured, timeout, on_event, forks, host_timeout, strategy)
+    
+    def _host_key(self, hosts: str):
+        """目标主机集合, 不同的主机模式匹配到相同的主机时视为相同的调用"""
+        return tuple(sorted(self.inventory.match(hosts)))
+    
+    def _coalesced(self, key, run) -> Dict[str, Any]:
+        result, _ = self.single_flight.do(key, run)
+        # 各调用方拿到各自的顶层字典, 内部的主机结果是共享的, 只能读取
+        return dict(result)
+    
+    def _run_adhoc_command(self, module: str, args: str, hosts: str, structured: bool, timeout: Optional[int],
+                           on_event, forks: Optional[int], host_timeout: Optional[int],
+                           strategy: Optional[str]) -> Dict[str, Any]:
+        plan = self.plan(hosts, host_timeout, forks)
+        timeout = timeout or plan["timeout"]
+        self._track_connections(hosts)
+        start = time.perf_counter()
+        if self.engine:
+            result = self._engine_call(
+                'run_adhoc', module, args, hosts, timeout=timeout, forks=plan["forks"],
+                task_timeout=plan["host_timeout"], strategy=strategy, on_event=on_event
+            )
+        else:
+            result = self.run_cli_adhoc_command(
+                module, args, hosts, structured, timeout, on_event,
+                forks=plan["forks"], task_timeout=plan["host_timeout"], strategy=strategy
+            )
+        return self._observe('adhoc', module, start, result)
+    
+    def run_cli_adhoc_command(self, module: str, args: str = "", hosts: str = "all", structured: bool = False,
+                              timeout: int = 15, on_event=None, forks: int = 5,
+                              task_timeout: Optional[int] = None, strategy: Optional[str] = None) -> Dict[str, Any]:
+        """通过ansible CLI子进程执行ad-hoc命令"""
         try:
             cmd = [
                 "ansible", 
                 hosts, 
                 "-i", self.inventory_path,
-                "-m", module
+                "-m", module,
+                "--forks", str(forks)
             ]
             
             if args:
                 cmd.extend(["-a", args])
+            if task_timeout:
+                cmd.extend(["--task-timeout", str(task_timeout)])
             
             result = subprocess.run(
                 cmd, 
                 capture_output=True, 
                 text=True, 
-                timeout=15
+                timeout=timeout,
+                env=self._cli_env(structured, strategy)
             )
             
-            return {
-                "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "return_code": result.returncode
-            }
+            return self._cli_result(result, structured, on_event)
         except subprocess.TimeoutExpired:
             return {
                 "success": False,
@@ -50,14 +321,57 @@ class AnsibleRunner:
                 "return_code": -1
             }
     
-    def run_playbook(self, playbook_name: str, extra_vars: Dict = None) -> Dict[str, Any]:
-        """执行ansible playbook"""
+    def run_playbook(self, playbook_name: str, extra_vars: Dict = None, structured: bool = False,
+                     timeout: Optional[int] = None, on_event=None, forks: Optional[int] = None,
+                     host_timeout: Optional[int] = None, strategy: Optional[str] = None,
+                     serial: Optional[int] = None, hosts: str = "all") -> Dict[str, Any]:
+        """执行ansible playbook
+        
+        strategy和serial通过dashboard_strategy/dashboard_serial变量传给playbook的play关键字;
+        hosts只用于估算目标主机数, 实际目标由playbook决定。
+        只读playbook(READ_ONLY_PLAYBOOKS)且没有on_event时, 与正在执行的相同调用合并。
+        """
+        if self.coalesce and on_event is None and playbook_name in READ_ONLY_PLAYBOOKS:
+            key = ('playbook', playbook_name, json.dumps(extra_vars or {}, sort_keys=True),
+                   self._host_key(hosts), structured)
+            return self._coalesced(key, lambda: self._run_playbook(
+                playbook_name, extra_vars, structured, timeout, None, forks, host_timeout, strategy, serial, hosts
+            ))
+        return self._run_playbook(playbook_name, extra_vars, structured, timeout, on_event, forks, host_timeout,
+                                  strategy, serial, hosts)
+    
+    def _run_playbook(self, playbook_name: str, extra_vars: Optional[Dict], structured: bool,
+                      timeout: Optional[int], on_event, forks: Optional[int], host_timeout: Optional[int],
+                      strategy: Optional[str], serial: Optional[int], hosts: str) -> Dict[str, Any]:
+        plan = self.plan(hosts, host_timeout, forks, serial, playbook=True)
+        timeout = timeout or plan["timeout"]
+        self._track_connections(hosts)
+        extra_vars = dict(extra_vars or {})
+        if strategy:
+            extra_vars["dashboard_strategy"] = strategy
+        if serial:
+            extra_vars["dashboard_serial"] = serial
+        start = time.perf_counter()
+        if self.engine:
+            result = self._engine_call(
+                'run_playbook', playbook_name, extra_vars, timeout=timeout, forks=plan["forks"], on_event=on_event
+            )
+        else:
+            result = self.run_cli_playbook(
+                playbook_name, extra_vars, structured, timeout, on_event, forks=plan["forks"]
+            )
+        return self._observe('playbook', playbook_name, start, result)
+    
+    def run_cli_playbook(self, playbook_name: str, extra_vars: Dict = None, structured: bool = False,
+                         timeout: int = 30, on_event=None, forks: int = 5) -> Dict[str, Any]:
+        """通过ansible-playbook CLI子进程执行playbook"""
         try:
             playbook_path = os.path.join(self.playbook_dir, playbook_name)
             
             cmd = [
                 "ansible-playbook",
                 "-i", self.inventory_path,
+                "--forks", str(forks),
                 playbook_path
             ]
             
@@ -68,15 +382,11 @@ class AnsibleRunner:
                 cmd,
                 capture_output=True,
                 text=True,
-                timeout=30
+                timeout=timeout,
+                env=self._cli_env(structured, None)
             )
             
-            return {
-                "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "return_code": result.returncode
-            }
+            return self._cli_result(result, structured, on_event)
         except subprocess.TimeoutExpired:
             return {
                 "success": False,
@@ -94,64 +404,91 @@ class AnsibleRunner:
     
     def ping_all_hosts(self) -> Dict[str, Any]:
         """ping所有主机"""
-        return self.run_adhoc_command("ping")
+        return self.run_adhoc_command("ping", structured=True)
     
     def get_host_facts(self, hosts: str = "all") -> Dict[str, Any]:
         """获取主机facts信息"""
-        return self.run_adhoc_command("setup", hosts=hosts)
+        return self.run_adhoc_command("setup", hosts=hosts, structured=True)
     
-    def parse_ping_results(self, ping_output: str) -> List[Dict[str, Any]]:
-        """解析ping命令的输出结果"""
-        results = []
-        lines = ping_output.split('\n')
-        
-        for line in lines:
-            if ' | ' in line and ('SUCCESS' in line or 'UNREACHABLE' in line or 'FAILED' in line):
-                parts = line.split(' | ')
-                if len(parts) >= 2:
-                    host = parts[0].strip()
-                    status_part = parts[1].strip()
-                    
-                    # 判断状态
-                    if 'SUCCESS' in status_part:
-                        status = "online"
-                        raw_status = "SUCCESS"
-                    elif 'UNREACHABLE' in status_part:
-                        status = "offline"
-                        raw_status = "UNREACHABLE"
-                    elif 'FAILED' in status_part:
-                        status = "offline"
-                        raw_status = "FAILED"
-                    else:
-                        status = "unknown"
-                        raw_status = status_part
-                    
-                    results.append({
-                        "host": host,
-                        "status": status,
-                        "raw_status": raw_status
-                    })
+    def cached_facts(self, hosts: str = "all", subsets: Optional[List[str]] = None, refresh: bool = False,
+                     timeout: Optional[int] = None, **options) -> Dict[str, Any]:
+        """从facts缓存读取, 只对缓存过期(refresh=True时为全部)的主机执行setup
         
+        需要相同分组的主机合并为一次setup调用, 并且只收集这些分组对应的gather_subset。
+        返回{"hosts": {主机: {"facts", "gathered_at"}}, "errors": {主机: 错误}, "refreshed": [主机]},
+        收集失败的主机仍返回缓存中的旧数据(如果有)。
+        """
+        subsets = list(subsets or FACT_SUBSETS)
+        unknown = [name for name in subsets if name not in FACT_SUBSETS]
+        if unknown:
+            raise ValueError(f"未知的facts分组: {', '.join(unknown)}, 可选: {', '.join(FACT_SUBSETS)}")
+        targets = self.inventory.match(hosts)
+        errors = {}
+        refreshed = []
+        # 同一时间只有一个刷新在执行, 并发的请求等待后直接读取刷新后的缓存
+        with self._facts_lock:
+            if refresh:
+                stale = {host: subsets for host in targets}
+            else:
+                stale = self.facts_cache.stale(targets, subsets)
+            groups = {}
+            for host, missing in stale.items():
+                groups.setdefault(tuple(missing), []).append(host)
+            for missing, group in groups.items():
+                result = self.run_adhoc_command(
+                    "setup", setup_args(list(missing)), ",".join(group),
+                    structured=True, timeout=timeout, **options
+                )
+                host_results = result.get("host_results", {})
+                for host in group:
+                    entry = host_results.get(host)
+                    if not entry or entry["status"] not in ('ok', 'changed'):
+                        errors[host] = self._task_error(entry) if entry else (result["stderr"] or "未执行")
+                        continue
+                    self.facts_cache.update(host, entry["tasks"][-1]["result"].get("ansible_facts", {}),
+                                            list(missing))
+                    refreshed.append(host)
+        return {
+            "hosts": {host: self.facts_cache.get(host, subsets) for host in targets},
+            "errors": errors,
+            "refreshed": refreshed
+        }
+    
+    @staticmethod
+    def _task_error(entry: Dict[str, Any]) -> str:
+        for task in reversed(entry["tasks"]):
+            if task["status"] in ('failed', 'unreachable'):
+                return task["result"].get("msg") or task["status"]
+        return entry["status"]
+    
+    def ping_results(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """根据结构化的ping结果生成每台主机的连通状态"""
+        raw_statuses = {
+            "ok": "SUCCESS",
+            "changed": "SUCCESS",
+            "unreachable": "UNREACHABLE",
+            "failed": "FAILED"
+        }
+        results = []
+        for host, entry in result.get("host_results", {}).items():
+            raw_status = raw_statuses.get(entry["status"], entry["status"].upper())
+            if raw_status == "SUCCESS":
+                status = "online"
+            elif raw_status in ("UNREACHABLE", "FAILED"):
+                status = "offline"
+            else:
+                status = "unknown"
+            results.append({
+                "host": host,
+                "status": status,
+                "raw_status": raw_status
+            })
         return results
     
     def get_inventory_hosts(self) -> List[str]:
-        """获取inventory中的所有主机"""
+        """获取inventory中的所有主机(读取已解析的inventory索引, 不启动ansible)"""
         try:
-            result = subprocess.run(
-                ["ansible", "all", "-i", self.inventory_path, "--list-hosts"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            hosts = []
-            lines = result.stdout.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('hosts (') and line != 'hosts:':
-                    hosts.append(line)
-            
-            return hosts
-        except Exception as e:
-            print(f"获取主机列表失败: {e}")
-            return [] 
\ No newline at end of file
+            return self.inventory.host_names()
+        except OSError as e:
+            logger.error(f"获取主机列表失败: {e}")
+            return []
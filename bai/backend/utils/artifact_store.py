@@ -0,0 +1,194 @@
+import os
+import re
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """按内容SHA-256寻址的上传文件存储
+
+    相同内容只保存一份, 文件的mtime记录最近一次使用时间;
+    总大小超过max_bytes时按最近最少使用的顺序删除, 正在分发(pin)的文件不会被删除。
+    多工作进程部署时各进程的pin计数记录在shared(SharedState)中, 键为artifact_pin:<sha256>:<pid>,
+    已退出进程留下的记录被忽略; pin和删除在存储目录lock文件的flock下进行, 避免进程间的竞争。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, shared=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._lock = threading.Lock()
+        # 本进程的pin计数
+        self._pins = {}
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """进程内用线程锁、进程间用lock文件上的flock互斥"""
+        with self._lock, open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _set_pins(self, digest: str, count: int):
+        """更新本进程的pin计数(需持有_locked)"""
+        if count > 0:
+            self._pins[digest] = count
+        else:
+            self._pins.pop(digest, None)
+        if self.shared is None:
+            return
+        key = f"artifact_pin:{digest}:{os.getpid()}"
+        try:
+            if count > 0:
+                self.shared.put(key, count)
+            else:
+                self.shared.delete(key)
+        except Exception as e:
+            logger.error(f"记录文件pin状态失败: {e}")
+
+    def _pinned(self) -> Set[str]:
+        """所有存活进程pin住的文件(需持有_locked)"""
+        pinned = set(self._pins)
+        if self.shared is None:
+            return pinned
+        try:
+            for key, _, _ in self.shared.scan("artifact_pin:"):
+                _, digest, pid = key.split(':')
+                if self._alive(int(pid)):
+                    pinned.add(digest)
+                else:
+                    self.shared.delete(key)
+        except Exception as e:
+            logger.error(f"读取文件pin状态失败: {e}")
+        return pinned
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def valid_digest(digest: str) -> bool:
+        return bool(digest) and bool(DIGEST_RE.match(digest))
+
+    def path(self, digest: str) -> str:
+        if not self.valid_digest(digest):
+            raise ValueError(f"无效的SHA-256: {digest}")
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def contains(self, digest: str) -> bool:
+        return self.valid_digest(digest) and os.path.exists(self.path(digest))
+
+    def touch(self, digest: str):
+        """标记为最近使用"""
+        try:
+            os.utime(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def add_file(self, src_path: str, digest: Optional[str] = None) -> str:
+        """把src_path移入存储(同一文件系统内rename), 内容已存在时直接删除src_path
+
+        返回的文件已被pin, 调用方使用完毕后需要unpin。
+        """
+        digest = digest or sha256_file(src_path)
+        target = self.path(digest)
+        with self._locked():
+            if os.path.exists(target):
+                os.remove(src_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.chmod(src_path, 0o644)
+                os.replace(src_path, target)
+            self._set_pins(digest, self._pins.get(digest, 0) + 1)
+        self.touch(digest)
+        self.evict()
+        return digest
+
+    def pin(self, digest: str) -> bool:
+        """防止文件在使用期间被删除, 文件不存在时返回False"""
+        with self._locked():
+            if not os.path.exists(self.path(digest)):
+                return False
+            self._set_pins(digest, self._pins.get(digest, 0) + 1)
+        self.touch(digest)
+        return True
+
+    def unpin(self, digest: str):
+        with self._locked():
+            self._set_pins(digest, self._pins.get(digest, 0) - 1)
+
+    def list(self) -> List[Dict[str, Any]]:
+        artifacts = []
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if not self.valid_digest(name):
+                    continue
+                try:
+                    st = os.stat(os.path.join(prefix_dir, name))
+                except FileNotFoundError:
+                    continue
+                artifacts.append({"sha256": name, "size": st.st_size, "last_used": st.st_mtime})
+        return artifacts
+
+    def evict(self) -> List[str]:
+        """删除最近最少使用的文件, 直到总大小不超过max_bytes"""
+        with self._locked():
+            artifacts = sorted(self.list(), key=lambda a: a["last_used"])
+            total = sum(a["size"] for a in artifacts)
+            evicted = []
+            pinned = self._pinned() if total > self.max_bytes else set()
+            for artifact in artifacts:
+                if total <= self.max_bytes:
+                    break
+                if artifact["sha256"] in pinned:
+                    continue
+                try:
+                    os.remove(self.path(artifact["sha256"]))
+                except FileNotFoundError:
+                    pass
+                total -= artifact["size"]
+                evicted.append(artifact["sha256"])
+        for digest in evicted:
+            logger.info(f"上传存储超过容量, 删除 {digest}")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        artifacts = self.list()
+        with self._locked():
+            pinned = len(self._pinned())
+        return {
+            "artifacts": len(artifacts),
+            "bytes": sum(a["size"] for a in artifacts),
+            "max_bytes": self.max_bytes,
+            "pinned": pinned
+        }
@@ -1,10 +1,12 @@
+import os
 import hashlib
 import secrets
 from functools import wraps
 from flask import request, jsonify, session
+from utils.session_store import SessionStore, create_session_store
 
 class AuthManager:
-    def __init__(self):
+    def __init__(self, sessions: SessionStore):
         # 默认管理员账户 (admin/admin123)
         self.users = {
             "admin": {
@@ -12,7 +14,8 @@ class AuthManager:
                 "role": "admin"
             }
         }
-        self.sessions = {}
+        # 会话存储: 带滑动过期, 使用sqlite后端时多个工作进程共享登录状态
+        self.sessions = sessions
     
     def _hash_password(self, password: str) -> str:
         """密码哈希"""
@@ -25,10 +28,10 @@ class AuthManager:
             if user["password_hash"] == self._hash_password(password):
                 # 生成会话token
                 token = secrets.token_hex(32)
-                self.sessions[token] = {
+                self.sessions.set(token, {
                     "username": username,
                     "role": user["role"]
-                }
+                })
                 return {
                     "success": True,
                     "token": token,
@@ -43,10 +46,11 @@ class AuthManager:
     
     def verify_token(self, token: str) -> dict:
         """验证token"""
-        if token in self.sessions:
+        user = self.sessions.get(token)
+        if user is not None:
             return {
                 "valid": True,
-                "user": self.sessions[token]
+                "user": user
             }
         return {
             "valid": False,
@@ -55,13 +59,14 @@ class AuthManager:
     
     def logout(self, token: str) -> bool:
         """登出"""
-        if token in self.sessions:
-            del self.sessions[token]
-            return True
-        return False
+        return self.sessions.delete(token)
 
 # 全局认证管理器实例
-auth_manager = AuthManager()
+auth_manager = AuthManager(create_session_store(
+    os.environ.get('SESSION_BACKEND', 'memory'),
+    ttl=int(os.environ.get('SESSION_TTL', 8 * 3600)),
+    path=os.environ.get('SESSION_DB', '/app/data/sessions.db')
+))
 
 def require_auth(f):
     """认证装饰器"""
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import zlib
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 从请求体读取并写入磁盘的块大小, 与上传分片大小无关, 内存占用固定
+COPY_BUFSIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """分片上传请求不合法(参数错误/校验失败等)"""
+
+
+class UploadNotFound(UploadError):
+    """上传会话不存在或已过期"""
+
+
+class UploadOffsetError(UploadError):
+    """分片偏移与已接收的字节数不一致, offset为服务端当前偏移"""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class ChunkedUploadStore:
+    """可续传的分片上传
+
+    每个上传会话对应目录下的<id>.part(已接收的数据)和<id>.json(元数据),
+    进程重启后仍可继续上传。分片必须按顺序写入, 偏移以.part文件大小为准:
+    连接中断后客户端查询当前偏移, 从该位置继续发送即可。
+    """
+
+    def __init__(self, directory: str, max_size: int, max_chunk: int, session_ttl: int = 24 * 3600):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_chunk = max_chunk
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._session_locks = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, upload_id: str):
+        if not upload_id.isalnum():
+            raise UploadNotFound("上传会话不存在")
+        base = os.path.join(self.directory, upload_id)
+        return base + '.part', base + '.json'
+
+    def _session_lock(self, upload_id: str) -> threading.Lock:
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    def _load(self, upload_id: str) -> Dict[str, Any]:
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            raise UploadNotFound("上传会话不存在或已过期")
+        session["offset"] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return session
+
+    def _save(self, session: Dict[str, Any]):
+        _, meta_path = self._paths(session["id"])
+        data = {k: v for k, v in session.items() if k != "offset"}
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def create(self, user: str, filename: str, size: int, sha256: Optional[str] = None,
+               **extra) -> Dict[str, Any]:
+        """创建上传会话; extra中的字段(目标主机等)原样保存, finalize时返回"""
+        if size <= 0:
+            raise UploadError("文件大小必须大于0")
+        if size > self.max_size:
+            raise UploadError(f"文件超过大小限制({self.max_size}字节)")
+        self.expire()
+        now = time.time()
+        session = {
+            "id": uuid.uuid4().hex,
+            "user": user,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": now,
+            "updated_at": now,
+            **extra
+        }
+        part_path, _ = self._paths(session["id"])
+        open(part_path, 'wb').close()
+        self._save(session)
+        session["offset"] = 0
+        return session
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        return self._load(upload_id)
+
+    def write_chunk(self, upload_id: str, offset: int, stream, length: int,
+                    sha256: Optional[str] = None, crc32: Optional[str] = None) -> Dict[str, Any]:
+        """从stream读取length字节追加到offset处, 校验失败时回滚到offset"""
+        if length <= 0 or length > self.max_chunk:
+            raise UploadError(f"分片大小必须在1到{self.max_chunk}字节之间")
+        with self._session_lock(upload_id):
+            session = self._load(upload_id)
+            if offset != session["offset"]:
+                raise UploadOffsetError(f"偏移不一致, 服务端已接收{session['offset']}字节", session["offset"])
+            if offset + length > session["size"]:
+                raise UploadError("分片超出文件声明的大小")
+
+            part_path, _ = self._paths(upload_id)
+            digest = hashlib.sha256() if sha256 else None
+            checksum = 0
+            received = 0
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                try:
+                    while received < length:
+                        data = stream.read(min(COPY_BUFSIZE, length - received))
+                        if not data:
+                            break
+                        f.write(data)
+                        received += len(data)
+                        checksum = zlib.crc32(data, checksum)
+                        if digest:
+                            digest.update(data)
+                    if received != length:
+                        raise UploadError(f"分片不完整: 期望{length}字节, 实际收到{received}字节")
+                    if sha256 and digest.hexdigest() != sha256.lower():
+                        raise UploadError("分片SHA-256校验失败")
+                    if crc32 and f"{checksum:08x}" != crc32.lower().rjust(8, '0'):
+                        raise UploadError("分片CRC32校验失败")
+                except Exception:
+                    # 只保留已确认的数据, 客户端从原偏移重发本分片
+                    f.truncate(offset)
+                    raise
+                f.flush()
+                os.fsync(f.fileno())
+
+            session["updated_at"] = time.time()
+            self._save(session)
+            session["offset"] = offset + length
+            return session
+
+    def finalize(self, upload_id: str) -> Dict[str, Any]:
+        """检查文件完整性, 返回的会话中path为完整文件的路径(由调用方负责移走), sha256为内容摘要"""
+        with self._session_lock(upload_id):
+            session = self._load(upload_id)
+            if session["offset"] != session["size"]:
+                raise UploadOffsetError(
+                    f"文件未上传完整: 已接收{session['offset']}/{session['size']}字节", session["offset"]
+                )
+            part_path, meta_path = self._paths(upload_id)
+            digest = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            if session["sha256"] and digest.hexdigest() != session["sha256"]:
+                raise UploadError("文件SHA-256校验失败, 请重新上传")
+            os.remove(meta_path)
+            session["path"] = part_path
+            session["sha256"] = digest.hexdigest()
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+        return session
+
+    def abort(self, upload_id: str):
+        with self._session_lock(upload_id):
+            for path in self._paths(upload_id):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+
+    def expire(self):
+        """删除超过session_ttl未更新的会话"""
+        cutoff = time.time() - self.session_ttl
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            upload_id = name[:-5]
+            try:
+                if self._load(upload_id)["updated_at"] < cutoff:
+                    self.abort(upload_id)
+                    logger.info(f"删除过期的上传会话 {upload_id}")
+            except UploadError:
+                continue
@@ -0,0 +1,106 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+# 只读取主机状态、结果可以缓存的模块, 请求中带cache时可以直接使用缓存;
+# 其他模块(如command/shell执行的查看命令)需要请求同时标记read_only。
+# 与ansible_runner.READ_ONLY_MODULES(参与调用合并的模块)不同, 这里包含更多的查询模块
+CACHEABLE_MODULES = {
+    'ping', 'setup', 'stat', 'find', 'slurp', 'getent',
+    'package_facts', 'service_facts', 'mount_facts'
+}
+
+# 只缓存执行成功的主机, 失败和不可达的主机下次重新执行
+CACHEABLE_STATUSES = ('ok', 'changed')
+
+
+def module_name(module: str) -> str:
+    return module[len('ansible.builtin.'):] if module.startswith('ansible.builtin.') else module
+
+
+class CommandCache:
+    """只读ad-hoc命令的结果缓存, 按(模块, 参数, 主机)保存每台主机的结构化结果
+
+    同一命令再次对部分已缓存的主机执行时, 只需要对其余主机执行。条目在ttl秒后过期,
+    总数超过max_entries时淘汰最久未使用的条目。对主机执行了非只读的命令后应调用invalidate。
+    """
+
+    def __init__(self, ttl: int = 30, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (模块, 参数, 主机) -> (保存时间, 主机结果)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def cacheable(module: str, read_only: bool = False) -> bool:
+        return read_only or module_name(module) in CACHEABLE_MODULES
+
+    @staticmethod
+    def _key(module: str, args: str, host: str) -> Tuple[str, str, str]:
+        return module_name(module), " ".join((args or "").split()), host
+
+    def lookup(self, module: str, args: str, hosts: Iterable[str]
+               ) -> Tuple[Dict[str, Tuple[float, Dict[str, Any]]], List[str]]:
+        """返回({主机: (保存时间, 结果)}, 需要执行的主机)"""
+        now = time.time()
+        cached = {}
+        missing = []
+        with self._lock:
+            for host in hosts:
+                key = self._key(module, args, host)
+                item = self._entries.get(key)
+                if item is not None and now - item[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    cached[host] = item
+                else:
+                    if item is not None:
+                        del self._entries[key]
+                    missing.append(host)
+            self.hits += len(cached)
+            self.misses += len(missing)
+        return cached, missing
+
+    def store(self, module: str, args: str, host_results: Dict[str, Dict[str, Any]]):
+        now = time.time()
+        with self._lock:
+            for host, entry in host_results.items():
+                if entry["status"] not in CACHEABLE_STATUSES:
+                    continue
+                key = self._key(module, args, host)
+                self._entries[key] = (now, entry)
+                self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                # 先丢弃已过期的条目, 仍然超出时按最久未使用淘汰
+                for key in [key for key, (stored_at, _) in self._entries.items() if now - stored_at >= self.ttl]:
+                    del self._entries[key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, hosts: Optional[Iterable[str]] = None):
+        """丢弃指定主机(默认全部)的缓存"""
+        with self._lock:
+            if hosts is None:
+                self._entries.clear()
+                return
+            hosts = set(hosts)
+            for key in [key for key in self._entries if key[2] in hosts]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
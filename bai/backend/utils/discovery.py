@@ -0,0 +1,207 @@
+import sys
+import time
+import queue
+import asyncio
+import argparse
+import resource
+import ipaddress
+import threading
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+from utils.reachability import ReachabilitySweeper
+
+# 单次扫描的地址数上限(默认相当于一个/14)
+DEFAULT_MAX_ADDRESSES = 4 * 65536
+
+
+def parse_targets(targets: Iterable[str], max_addresses: int = DEFAULT_MAX_ADDRESSES) -> List[ipaddress.IPv4Network]:
+    """解析CIDR或单个IPv4地址, 合并重叠的网段; 地址总数超过max_addresses时抛出ValueError"""
+    networks = []
+    for target in targets:
+        try:
+            network = ipaddress.ip_network(str(target).strip(), strict=False)
+        except ValueError:
+            raise ValueError(f"无效的网段: {target}")
+        if network.version != 4:
+            raise ValueError(f"只支持IPv4网段: {target}")
+        networks.append(network)
+    if not networks:
+        raise ValueError("targets不能为空")
+    networks = list(ipaddress.collapse_addresses(networks))
+    total = sum(address_count(network) for network in networks)
+    if total > max_addresses:
+        raise ValueError(f"扫描范围包含{total}个地址, 超过上限{max_addresses}")
+    return networks
+
+
+def address_count(network: ipaddress.IPv4Network) -> int:
+    # hosts()不包含网络地址和广播地址(/31、/32除外)
+    return network.num_addresses - 2 if network.prefixlen < 31 else network.num_addresses
+
+
+def inventory_addresses(inventory) -> Dict[str, str]:
+    """inventory中主机的IPv4地址(ansible_host或主机名本身) -> 主机名; 不做DNS解析"""
+    addresses = {}
+    for record in inventory.hosts():
+        address = record["vars"].get("ansible_host") or record["host"]
+        try:
+            addresses[str(ipaddress.IPv4Address(address))] = record["host"]
+        except ValueError:
+            continue
+    return addresses
+
+
+def fd_limited_concurrency(concurrency: int, sockets_per_probe: int) -> int:
+    """每个探测同时占用sockets_per_probe个socket, 并发数不能超过打开文件数的软限制"""
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return concurrency
+    return max(1, min(concurrency, (soft - 64) // sockets_per_probe))
+
+
+class RateLimiter:
+    """按固定间隔放行, 限制每秒开始探测的地址数"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(self._next, now)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class NetworkDiscovery(ReachabilitySweeper):
+    """在CIDR网段中发现在线主机
+
+    与ReachabilitySweeper检测已知主机不同, 扫描的大部分地址通常不存在, 单个地址的耗时
+    主要是等待超时。因此每个地址同时发出ICMP(允许时)和对各端口的TCP连接, 任一方式
+    得到应答即判定在线并取消其余探测, 无应答的地址只花费一个超时时间。
+    地址按需从网段中生成, 固定数量的协程依次取用, 大网段不会一次创建全部任务;
+    rate限制每秒开始探测的地址数, 避免突发流量触发交换机或防火墙的限速。
+    """
+
+    def __init__(self, method: str = "auto", ports: Optional[List[int]] = None, timeout: float = 1.0,
+                 concurrency: int = 512, rate: float = 2000):
+        super().__init__(method, (ports or [22])[0], timeout, concurrency)
+        self.ports = list(dict.fromkeys(ports or [22]))
+        self.rate = rate
+        self.concurrency = fd_limited_concurrency(concurrency, len(self.ports) + (1 if self.icmp else 0))
+
+    async def _discover(self, address: str, seq: int) -> Optional[Dict[str, Any]]:
+        """返回应答信息, 无应答返回None"""
+        probes = {}
+        if self.icmp:
+            probes[asyncio.ensure_future(self._probe_icmp(address, seq))] = ("icmp", None)
+        if self.method != "icmp":
+            for port in self.ports:
+                probes[asyncio.ensure_future(self._probe_tcp(address, port))] = ("tcp", port)
+        pending = set(probes)
+        found = None
+        try:
+            while pending and found is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    method, port = probes[task]
+                    if method == "icmp":
+                        rtt = task.result()
+                        raw_status = "SUCCESS"
+                    else:
+                        # 连接被拒绝(RST)同样说明地址上有主机
+                        raw_status, rtt = task.result()
+                    if rtt is not None:
+                        found = {"host": address, "status": "online", "method": method, "port": port,
+                                 "raw_status": raw_status, "rtt_ms": round(rtt, 2)}
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return found
+
+    async def _scan(self, networks: List[ipaddress.IPv4Network], on_found, progress: Dict[str, int]):
+        addresses = (str(address) for network in networks for address in network.hosts())
+        limiter = RateLimiter(self.rate)
+
+        async def worker():
+            for address in addresses:
+                await limiter.wait()
+                seq = progress["scanned"] & 0xFFFF
+                progress["scanned"] += 1
+                found = await self._discover(address, seq)
+                if found:
+                    progress["found"] += 1
+                    found["timestamp"] = time.time()
+                    on_found(found)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    def iter_scan(self, networks: List[ipaddress.IPv4Network], progress: Optional[Dict[str, int]] = None
+                  ) -> Iterator[Dict[str, Any]]:
+        """在后台线程中扫描, 按发现的先后逐个产出在线地址; progress记录已扫描和已发现的地址数"""
+        progress = progress if progress is not None else {}
+        progress.update(scanned=0, found=0)
+        results = queue.Queue()
+        done = object()
+
+        def run():
+            try:
+                asyncio.run(self._scan(networks, results.put, progress))
+            finally:
+                results.put(done)
+
+        threading.Thread(target=run, name="network-discovery", daemon=True).start()
+        while True:
+            item = results.get()
+            if item is done:
+                return
+            yield item
+
+
+def diff_inventory(found: List[Dict[str, Any]], networks: List[ipaddress.IPv4Network],
+                   known: Dict[str, str]) -> Dict[str, List]:
+    """与inventory比较: new为未登记的在线地址, known为已登记的, missing为扫描范围内已登记但无应答的主机"""
+    alive = {item["host"] for item in found}
+    in_range = {
+        address: host for address, host in known.items()
+        if any(ipaddress.IPv4Address(address) in network for network in networks)
+    }
+    key = ipaddress.IPv4Address
+    return {
+        "new": sorted((address for address in alive if address not in known), key=key),
+        "known": sorted((known[address] for address in alive if address in known)),
+        "missing": sorted(host for address, host in in_range.items() if address not in alive)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在CIDR网段中发现在线主机, 每行输出一个地址')
+    parser.add_argument('targets', nargs='+', help='CIDR网段或IPv4地址, 如 192.168.1.0/24')
+    parser.add_argument('--port', type=int, action='append', dest='ports', help='TCP探测端口, 可重复, 默认22')
+    parser.add_argument('--method', default='auto', choices=('auto', 'icmp', 'tcp'))
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--concurrency', type=int, default=512)
+    parser.add_argument('--rate', type=float, default=2000, help='每秒开始探测的地址数, 0为不限制')
+    parser.add_argument('--max-addresses', type=int, default=DEFAULT_MAX_ADDRESSES)
+    opts = parser.parse_args()
+
+    try:
+        networks = parse_targets(opts.targets, opts.max_addresses)
+        scanner = NetworkDiscovery(opts.method, opts.ports, opts.timeout, opts.concurrency, opts.rate)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(str(e))
+    progress = {}
+    start = time.time()
+    for item in scanner.iter_scan(networks, progress):
+        print(item["host"], flush=True)
+    print(f"扫描{progress['scanned']}个地址, 发现{progress['found']}台主机, 耗时{time.time() - start:.1f}秒",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import json
+import time
+import queue
+import threading
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """按Server-Sent Events格式编码一条消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventBus:
+    """进程内事件总线, 把采集结果和主机状态变化推送给所有SSE订阅者
+
+    每个订阅者一个有界队列; 队列写满说明客户端消费过慢, 直接断开该订阅,
+    浏览器的EventSource会自动重连并重新收到完整快照。
+    """
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._next_id = 1
+        self._host_status = {}
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: str, data: Any):
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event_id, event, data))
+            except queue.Full:
+                self.unsubscribe(subscriber)
+                # 放入结束标记, 让对应的响应生成器退出
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def set_host_status(self, host: str, status: str, **details) -> bool:
+        """更新主机在线状态, 只有状态变化时才推送host_status事件"""
+        data = {"host": host, "status": status, "timestamp": time.time(), **details}
+        with self._lock:
+            previous = self._host_status.get(host)
+            self._host_status[host] = data
+        if previous and previous["status"] == status:
+            return False
+        self.publish("host_status", data)
+        return True
+
+    def remove_hosts(self, hosts: Iterable[str]):
+        with self._lock:
+            for host in hosts:
+                self._host_status.pop(host, None)
+
+    def host_statuses(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(data) for data in self._host_status.values()]
+
+    def stream(self, subscriber: queue.Queue, initial: List[Tuple[str, Any]], heartbeat: float = 15):
+        """SSE响应生成器: 先发送快照, 之后只发送增量, 空闲时发送心跳注释"""
+        try:
+            yield "retry: 5000\n\n"
+            for event, data in initial:
+                yield format_sse(event, data)
+            while True:
+                try:
+                    item = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    return
+                event_id, event, data = item
+                yield format_sse(event, data, event_id)
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import fnmatch
+import logging
+import threading
+from urllib.parse import quote, unquote
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# facts按变化频率分组, 每组只收集对应的gather_subset并用filter裁剪返回的字段
+FACT_SUBSETS = {
+    "platform": {
+        "gather_subset": ["distribution", "platform"],
+        "filter": ["ansible_distribution*", "ansible_kernel*", "ansible_os_family", "ansible_architecture",
+                   "ansible_machine", "ansible_system", "ansible_hostname", "ansible_fqdn"]
+    },
+    "hardware": {
+        "gather_subset": ["hardware"],
+        "filter": ["ansible_processor*", "ansible_memtotal_mb", "ansible_swaptotal_mb", "ansible_uptime_seconds"]
+    },
+    "network": {
+        "gather_subset": ["network"],
+        "filter": ["ansible_default_ipv4", "ansible_all_ipv4_addresses", "ansible_interfaces"]
+    }
+}
+
+# 默认有效期(秒): 发行版/内核几乎不变; ansible_uptime_seconds是收集时的值, 需结合gathered_at使用
+DEFAULT_TTLS = {
+    "platform": 24 * 3600,
+    "hardware": 3600,
+    "network": 600
+}
+
+
+def setup_args(subsets: List[str]) -> str:
+    """一次setup调用同时收集多个分组所需的参数"""
+    gather = []
+    patterns = []
+    for name in subsets:
+        gather += [s for s in FACT_SUBSETS[name]["gather_subset"] if s not in gather]
+        patterns += FACT_SUBSETS[name]["filter"]
+    return f"gather_subset=!all,!min,{','.join(gather)} filter={','.join(patterns)}"
+
+
+def split_facts(facts: Dict[str, Any], subsets: List[str]) -> Dict[str, Dict[str, Any]]:
+    """把setup返回的facts按分组的filter拆开"""
+    return {
+        name: {
+            key: value for key, value in facts.items()
+            if any(fnmatch.fnmatch(key, pattern) for pattern in FACT_SUBSETS[name]["filter"])
+        }
+        for name in subsets
+    }
+
+
+class FactsCache:
+    """按主机和facts分组缓存的setup结果
+
+    内存中保存全部数据, 每台主机对应目录下的一个JSON文件, 进程重启后继续使用;
+    每个分组有独立的有效期, 过期的分组才需要重新收集。目录不可写时只使用内存缓存。
+    """
+
+    def __init__(self, directory: Optional[str], ttls: Optional[Dict[str, int]] = None):
+        self.directory = directory
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        self._facts = {}
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self._load()
+            except OSError as e:
+                logger.warning(f"facts缓存目录不可用, 只使用内存缓存: {e}")
+                self.directory = None
+
+    def _path(self, host: str) -> str:
+        return os.path.join(self.directory, quote(host, safe='') + '.json')
+
+    def _load(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    self._facts[unquote(name[:-5])] = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"跳过无法读取的facts缓存文件 {name}: {e}")
+
+    def _save(self, host: str, entry: Dict[str, Any]):
+        if not self.directory:
+            return
+        path = self._path(host)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入{host}的facts缓存失败: {e}")
+
+    def _reload(self, host: str):
+        """重新读取磁盘上的缓存, 其他工作进程可能已经刷新过"""
+        try:
+            with open(self._path(host)) as f:
+                self._facts[host] = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def is_fresh(self, host: str, subset: str, now: Optional[float] = None) -> bool:
+        item = self._facts.get(host, {}).get(subset)
+        return bool(item) and (now or time.time()) - item["gathered_at"] < self.ttls[subset]
+
+    def stale(self, hosts: List[str], subsets: List[str]) -> Dict[str, List[str]]:
+        """返回每台主机已过期或不存在的分组, 全部有效的主机不出现在结果中"""
+        now = time.time()
+        result = {}
+        with self._lock:
+            for host in hosts:
+                missing = [subset for subset in subsets if not self.is_fresh(host, subset, now)]
+                if missing and self.directory:
+                    self._reload(host)
+                    missing = [subset for subset in subsets if not self.is_fresh(host, subset, now)]
+                self.hits += len(subsets) - len(missing)
+                self.misses += len(missing)
+                if missing:
+                    result[host] = missing
+        return result
+
+    def update(self, host: str, facts: Dict[str, Any], subsets: List[str], gathered_at: Optional[float] = None):
+        """保存一次setup的结果, facts中包含subsets中所有分组的字段"""
+        gathered_at = gathered_at or time.time()
+        with self._lock:
+            entry = dict(self._facts.get(host, {}))
+            for name, values in split_facts(facts, subsets).items():
+                entry[name] = {"facts": values, "gathered_at": gathered_at}
+            self._facts[host] = entry
+            self._save(host, entry)
+
+    def get(self, host: str, subsets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """合并后的facts以及每个分组的收集时间, 不检查是否过期"""
+        with self._lock:
+            entry = self._facts.get(host, {})
+            facts = {}
+            gathered_at = {}
+            for name in subsets or list(FACT_SUBSETS):
+                if name in entry:
+                    facts.update(entry[name]["facts"])
+                    gathered_at[name] = entry[name]["gathered_at"]
+        return {"facts": facts, "gathered_at": gathered_at}
+
+    def invalidate(self, hosts: Optional[List[str]] = None, subsets: Optional[List[str]] = None):
+        """删除缓存, hosts/subsets为空表示全部"""
+        with self._lock:
+            for host in list(self._facts) if hosts is None else hosts:
+                if host not in self._facts:
+                    continue
+                if subsets is None:
+                    del self._facts[host]
+                    if self.directory:
+                        try:
+                            os.remove(self._path(host))
+                        except FileNotFoundError:
+                            pass
+                else:
+                    entry = {k: v for k, v in self._facts[host].items() if k not in subsets}
+                    self._facts[host] = entry
+                    self._save(host, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hosts": len(self._facts),
+                "ttls": dict(self.ttls),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "persistent": bool(self.directory)
+            }
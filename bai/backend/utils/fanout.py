@@ -0,0 +1,152 @@
+import os
+import uuid
+import secrets
+import logging
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def assign_parents(sources: List[str], pending: List[str], width: int) -> Dict[str, str]:
+    """为本轮最多len(sources)×width台主机分配父节点, 每个父节点最多width个子节点"""
+    assignments = {}
+    for i, host in enumerate(pending[:len(sources) * width]):
+        assignments[host] = sources[i % len(sources)]
+    return assignments
+
+
+class FanoutDistributor:
+    """树形文件分发
+
+    控制节点只向前width台主机传输文件, 之后每一轮已收到文件的主机各自为最多width台
+    主机提供下载, 已有文件的主机数每轮增长为(width+1)倍; 控制节点的出口流量为
+    width×文件大小, 与主机总数无关。中继通过目标主机上临时的HTTP服务完成
+    (inventory使用每台主机各自的SSH口令, 主机之间没有SSH互信), 下载时校验SHA-256。
+    HTTP服务只监听中继主机在inventory中的地址, 文件放在每次分发随机生成的路径下,
+    结束时只终止本次分发启动的服务进程。
+    """
+
+    def __init__(self, runner, width: int = 3, port: int = 8765, serve_seconds: int = 600):
+        self.runner = runner
+        self.width = max(1, width)
+        self.port = port
+        self.serve_seconds = serve_seconds
+
+    def _address(self, host: str) -> str:
+        return self.runner.inventory.host_vars(host).get('ansible_host') or host
+
+    def distribute(self, local_path: str, digest: str, hosts: List[str], remote_file_path: str,
+                   timeout: Optional[int] = None, on_event=None, options: Optional[Dict] = None) -> Dict[str, Any]:
+        """把local_path分发到hosts, 返回每台主机的结果和父节点"""
+        options = options or {}
+        staging_dir = f"/tmp/.dashboard-fanout-{uuid.uuid4().hex}"
+        # 下载地址中需要带上的随机路径, 不知道它的主机无法从中继获取文件
+        token = secrets.token_urlsafe(24)
+        # 控制节点复制到目录时保留源文件名, 中继和下载都使用这个文件名
+        filename = os.path.basename(local_path)
+        staged = f"{staging_dir}/www/{token}/{filename}"
+        parents = {}
+        failed = {}
+        have = []
+
+        # 第一层: 控制节点直接传输
+        seeds = hosts[:self.width]
+        result = self.runner.run_adhoc_command(
+            "copy", f"src={local_path} dest={staging_dir}/www/{token}/ mode=0644", ",".join(seeds),
+            structured=True, timeout=timeout, on_event=on_event, **options
+        )
+        for host in seeds:
+            parents[host] = "controller"
+            if self._succeeded(result, host):
+                have.append(host)
+            else:
+                failed[host] = self._error(result, host)
+
+        # 之后每一轮由已有文件的主机中继, 父节点失败的主机在下一轮重新分配
+        pending = hosts[self.width:]
+        retried = set()
+        while pending and have:
+            assignments = assign_parents(have, pending, self.width)
+            relays = sorted(set(assignments.values()))
+            result = self.runner.run_playbook(
+                "fanout_relay.yml",
+                extra_vars={
+                    "fanout_relays": ",".join(relays),
+                    "fanout_targets": ",".join(assignments),
+                    "fanout_parents": {host: self._address(parent) for host, parent in assignments.items()},
+                    "fanout_binds": {relay: self._address(relay) for relay in relays},
+                    "fanout_dir": staging_dir,
+                    "fanout_token": token,
+                    "fanout_file": filename,
+                    "fanout_digest": digest,
+                    "fanout_port": self.port,
+                    "fanout_serve_seconds": self.serve_seconds
+                },
+                structured=True,
+                timeout=timeout,
+                on_event=on_event,
+                hosts=",".join(relays + list(assignments)),
+                **options
+            )
+            dead_relays = {relay for relay in relays if not self._succeeded(result, relay)}
+            for relay in dead_relays:
+                have.remove(relay)
+                failed[relay] = f"中继启动失败: {self._error(result, relay)}"
+
+            next_pending = pending[len(assignments):]
+            for host, parent in assignments.items():
+                if self._succeeded(result, host):
+                    parents[host] = parent
+                    have.append(host)
+                elif parent in dead_relays and host not in retried:
+                    retried.add(host)
+                    next_pending.append(host)
+                else:
+                    parents[host] = parent
+                    failed[host] = self._error(result, host)
+            pending = next_pending
+
+        for host in pending:
+            failed[host] = "没有可用的中继主机"
+
+        # 从暂存目录放到目标路径, 全部完成后再结束中继进程并清理暂存目录
+        if have:
+            placed = self.runner.run_adhoc_command(
+                "copy", f"src={staged} dest={remote_file_path} remote_src=yes mode=0644", ",".join(have),
+                structured=True, timeout=timeout, on_event=on_event, **options
+            )
+            for host in have:
+                if not self._succeeded(placed, host):
+                    failed[host] = self._error(placed, host)
+        # 只终止relay.pid中记录的进程, 并确认它仍是HTTP服务(服务超时退出后PID可能已被复用)
+        pid_file = f"{staging_dir}/relay.pid"
+        self.runner.run_adhoc_command(
+            "shell",
+            f"pid=$(cat {pid_file} 2>/dev/null) && grep -qa http.server /proc/$pid/cmdline 2>/dev/null "
+            f"&& kill $pid; rm -rf {staging_dir}",
+            ",".join(hosts),
+            structured=True, timeout=timeout, **options
+        )
+
+        return {
+            "success": not failed,
+            "hosts": {host: "failed" if host in failed else "ok" for host in hosts},
+            "parents": parents,
+            "errors": failed,
+            "controller_transfers": len(seeds)
+        }
+
+    @staticmethod
+    def _succeeded(result: Dict[str, Any], host: str) -> bool:
+        entry = result.get("host_results", {}).get(host)
+        return bool(entry) and entry["status"] in ('ok', 'changed')
+
+    @staticmethod
+    def _error(result: Dict[str, Any], host: str) -> str:
+        entry = result.get("host_results", {}).get(host)
+        if not entry:
+            return result.get("stderr") or "未执行"
+        for task in reversed(entry["tasks"]):
+            if task["status"] in ('failed', 'unreachable'):
+                return task["result"].get("msg") or task["status"]
+        return entry["status"]
@@ -0,0 +1,414 @@
+import os
+import re
+import json
+import errno
+import fcntl
+import fnmatch
+import shlex
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+from utils.telemetry import PARSE_DURATION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USERNAME = 'root'
+
+
+class _InventoryIndex:
+    """一次解析得到的inventory索引"""
+
+    def __init__(self, lines: List[str], version: str):
+        self.lines = lines
+        self.version = version
+        self.hosts = {}            # 主机 -> 记录
+        self.groups = {}           # 组 -> 主机列表(按文件顺序)
+        self.children = {}         # 组 -> 子组列表
+        self.group_vars = {}       # 组 -> 变量
+        self._parse()
+        self.hosts_json = json.dumps({
+            "success": True,
+            "hosts": [public_record(record) for record in self.hosts.values()],
+            "total": len(self.hosts)
+        }, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+    def _parse(self):
+        group = 'ungrouped'
+        section = 'hosts'
+        for number, raw in enumerate(self.lines):
+            line = raw.strip()
+            if not line or line.startswith(('#', ';')):
+                continue
+            if line.startswith('[') and line.endswith(']'):
+                group, _, section = line[1:-1].partition(':')
+                section = section or 'hosts'
+                if section == 'hosts':
+                    self.groups.setdefault(group, [])
+                elif section == 'vars':
+                    self.group_vars.setdefault(group, {})
+                elif section == 'children':
+                    self.children.setdefault(group, [])
+                continue
+
+            if section == 'vars':
+                key, _, value = line.partition('=')
+                self.group_vars[group][key.strip()] = _unquote(value.strip())
+            elif section == 'children':
+                self.children[group].append(line)
+            else:
+                self._add_host_line(line, group, number)
+
+    def _add_host_line(self, line: str, group: str, number: int):
+        parsed = _parse_host_line(line)
+        if parsed is None:
+            return
+        host, host_vars = parsed
+
+        members = self.groups.setdefault(group, [])
+        if host not in members:
+            members.append(host)
+
+        record = self.hosts.get(host)
+        if record is None:
+            self.hosts[host] = {
+                "host": host,
+                "group": group,
+                "groups": [group],
+                "vars": host_vars,
+                "lines": [number]
+            }
+        else:
+            # 同一主机出现在多个组: 合并变量, 主组保持第一次出现的组
+            if group not in record["groups"]:
+                record["groups"].append(group)
+            record["vars"].update(host_vars)
+            record["lines"].append(number)
+
+
+def _parse_host_line(line: str):
+    """解析主机行, 返回(主机, 变量)"""
+    try:
+        parts = shlex.split(line, comments=True)
+    except ValueError:
+        parts = line.split()
+    if not parts:
+        return None
+    host_vars = {}
+    for part in parts[1:]:
+        if '=' in part:
+            key, value = part.split('=', 1)
+            host_vars[key] = value
+    return parts[0], host_vars
+
+
+def format_host_line(host: str, host_vars: Dict[str, Any]) -> str:
+    parts = [host]
+    for key, value in host_vars.items():
+        value = str(value)
+        parts.append(f"{key}={shlex.quote(value) if value else value}")
+    return ' '.join(parts)
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    return value
+
+
+def public_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """API返回的主机信息, 不包含密码"""
+    host_vars = record["vars"]
+    return {
+        'ip': record["host"],
+        'group': record["group"],
+        'username': host_vars.get('ansible_user', DEFAULT_USERNAME),
+        'description': f'主机 {record["host"]}',
+        'has_password': 'ansible_ssh_pass' in host_vars
+    }
+
+
+class Inventory:
+    """按文件mtime/大小缓存的inventory模型
+
+    解析后按主机和组建立索引, 查询都是精确匹配的字典查找;
+    文件未变化时直接复用上次的解析结果和序列化好的/api/hosts响应。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._index = None
+
+    def _current(self) -> _InventoryIndex:
+        st = os.stat(self.path)
+        # 写入通过rename完成, inode变化即可发现其他进程的修改, 不依赖mtime精度
+        version = f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                with open(self.path, 'r') as f:
+                    lines = f.read().split('\n')
+                with PARSE_DURATION.time(parser='inventory'):
+                    self._index = _InventoryIndex(lines, version)
+            return self._index
+
+    def invalidate(self):
+        """本进程写入文件后调用, 原地写入(无法rename)时避免同一时间粒度内大小不变的修改被漏掉"""
+        with self._lock:
+            self._index = None
+
+    @contextmanager
+    def transaction(self):
+        """加锁读取-修改-写回
+
+        进程内用线程锁、进程间用lock文件上的flock互斥; 新内容先写入同目录的临时文件,
+        fsync后rename覆盖, 写到一半崩溃也不会留下被截断的inventory。
+        with块内抛出异常时不写回。
+        """
+        with self._write_lock, open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path, 'r') as f:
+                    editor = InventoryEditor(f.read().split('\n'))
+                yield editor
+                if editor.changed:
+                    self._write(editor.render())
+            finally:
+                self.invalidate()
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, content: str):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.hosts.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, os.stat(self.path).st_mode & 0o7777)
+            try:
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                # 单文件bind mount无法被rename覆盖, 退回到加锁后原地写入
+                if e.errno not in (errno.EBUSY, errno.EXDEV):
+                    raise
+                logger.warning(f"inventory无法原子替换({e}), 改为原地写入")
+                with open(self.path, 'w') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.remove(tmp_path)
+                return
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @property
+    def version(self) -> str:
+        """文件版本标识(inode、mtime与大小), 用作ETag"""
+        return self._current().version
+
+    def lines(self) -> List[str]:
+        return list(self._current().lines)
+
+    def get(self, host: str) -> Optional[Dict[str, Any]]:
+        return self._current().hosts.get(host)
+
+    def __contains__(self, host: str) -> bool:
+        return host in self._current().hosts
+
+    def host_names(self) -> List[str]:
+        return list(self._current().hosts)
+
+    def hosts(self) -> List[Dict[str, Any]]:
+        return list(self._current().hosts.values())
+
+    def groups(self) -> List[str]:
+        return list(self._current().groups)
+
+    def group_hosts(self, group: str) -> List[str]:
+        """组内主机, 包含子组的主机"""
+        index = self._current()
+        if group == 'all':
+            return list(index.hosts)
+        hosts, seen, pending = {}, set(), [group]
+        while pending:
+            name = pending.pop(0)
+            if name in seen:
+                continue
+            seen.add(name)
+            hosts.update(dict.fromkeys(index.groups.get(name, [])))
+            pending.extend(index.children.get(name, []))
+        return list(hosts)
+
+    def match(self, pattern: str) -> List[str]:
+        """解析ansible主机模式(逗号/冒号分隔, !排除, &交集, 通配符), 返回匹配的主机"""
+        index = self._current()
+        selected, intersect, exclude = {}, None, set()
+        for token in re.split(r'[,:]', pattern or 'all'):
+            token = token.strip()
+            if not token:
+                continue
+            op = token[0] if token[0] in '!&' else ''
+            hosts = self._match_token(index, token[1:] if op else token)
+            if op == '!':
+                exclude.update(hosts)
+            elif op == '&':
+                intersect = set(hosts) if intersect is None else intersect & set(hosts)
+            else:
+                selected.update(dict.fromkeys(hosts))
+        return [h for h in selected if h not in exclude and (intersect is None or h in intersect)]
+
+    def _match_token(self, index: _InventoryIndex, token: str) -> List[str]:
+        if token in ('all', '*'):
+            return list(index.hosts)
+        if token in index.hosts:
+            return [token]
+        if token in index.groups or token in index.children:
+            return self.group_hosts(token)
+        if any(c in token for c in '*?['):
+            hosts = [h for h in index.hosts if fnmatch.fnmatchcase(h, token)]
+            for group in index.groups:
+                if fnmatch.fnmatchcase(group, token):
+                    hosts.extend(self.group_hosts(group))
+            return hosts
+        return []
+
+    def group_vars(self, group: str) -> Dict[str, str]:
+        return dict(self._current().group_vars.get(group, {}))
+
+    def host_vars(self, host: str) -> Dict[str, str]:
+        """主机的有效变量: 所属组的[group:vars]在前, 主机行上的变量覆盖组变量"""
+        index = self._current()
+        record = index.hosts.get(host)
+        if record is None:
+            return {}
+        merged = dict(index.group_vars.get('all', {}))
+        for group in record["groups"]:
+            merged.update(index.group_vars.get(group, {}))
+        merged.update(record["vars"])
+        return merged
+
+    def ports(self) -> Dict[str, int]:
+        """设置了ansible_port的主机及其SSH端口"""
+        ports = {}
+        for host, record in self._current().hosts.items():
+            port = record["vars"].get('ansible_port')
+            if port and port.isdigit():
+                ports[host] = int(port)
+        return ports
+
+    def hosts_json(self):
+        """预先序列化的主机列表响应, 返回(版本, JSON字节)"""
+        index = self._current()
+        return index.version, index.hosts_json
+
+
+class InventoryError(Exception):
+    """inventory修改失败(主机已存在/不存在等)"""
+
+
+class _Section:
+    __slots__ = ('header', 'group', 'kind', 'lines')
+
+    def __init__(self, header: Optional[str], group: str, kind: str):
+        self.header = header
+        self.group = group
+        self.kind = kind
+        self.lines = []
+
+
+class InventoryEditor:
+    """按行编辑inventory, 保留注释、空行和变量段的原样内容
+
+    文件被拆成若干段(组), 主机到所在行的索引使增删改不需要重新扫描整个文件。
+    """
+
+    def __init__(self, lines: List[str]):
+        self.sections = [_Section(None, 'ungrouped', 'hosts')]
+        self.hosts = {}
+        for raw in lines:
+            line = raw.strip()
+            if line.startswith('[') and line.endswith(']'):
+                group, _, kind = line[1:-1].partition(':')
+                self.sections.append(_Section(raw, group, kind or 'hosts'))
+                continue
+            section = self.sections[-1]
+            section.lines.append(raw)
+            if section.kind == 'hosts' and line and not line.startswith(('#', ';')):
+                parsed = _parse_host_line(line)
+                if parsed:
+                    self.hosts.setdefault(parsed[0], []).append((section, raw, parsed[1]))
+        self.changed = False
+
+    def get(self, host: str) -> Optional[Dict[str, Any]]:
+        entries = self.hosts.get(host)
+        if not entries:
+            return None
+        host_vars = {}
+        for _, _, entry_vars in entries:
+            host_vars.update(entry_vars)
+        return {"host": host, "group": entries[0][0].group, "vars": host_vars}
+
+    def _section_for(self, group: str) -> _Section:
+        for section in self.sections:
+            if section.group == group and section.kind == 'hosts' and section.header is not None:
+                return section
+        # 组不存在, 在文件末尾创建新组
+        last = self.sections[-1]
+        if last.lines and last.lines[-1].strip():
+            last.lines.append('')
+        section = _Section(f"[{group}]", group, 'hosts')
+        section.lines.append('')
+        self.sections.append(section)
+        return section
+
+    def add_host(self, host: str, group: str, host_vars: Dict[str, Any]):
+        if host in self.hosts:
+            raise InventoryError(f"主机 {host} 已存在")
+        section = self._section_for(group)
+        line = format_host_line(host, host_vars)
+        # 插在组内最后一个非空行之后, 保留组之间的空行
+        position = len(section.lines)
+        while position > 0 and not section.lines[position - 1].strip():
+            position -= 1
+        section.lines.insert(position, line)
+        self.hosts[host] = [(section, line, dict(host_vars))]
+        self.changed = True
+
+    def delete_host(self, host: str):
+        entries = self.hosts.pop(host, None)
+        if not entries:
+            raise InventoryError(f"主机 {host} 不存在")
+        for section, line, _ in entries:
+            section.lines.remove(line)
+        self.changed = True
+
+    def update_host(self, host: str, group: Optional[str] = None, host_vars: Optional[Dict[str, Any]] = None):
+        """替换主机所在组和变量, 未给出的变量保持原值"""
+        record = self.get(host)
+        if record is None:
+            raise InventoryError(f"主机 {host} 不存在")
+        merged = record["vars"]
+        merged.update(host_vars or {})
+        self.delete_host(host)
+        self.add_host(host, group or record["group"], merged)
+
+    def render(self) -> str:
+        lines = []
+        for section in self.sections:
+            if section.header is not None:
+                lines.append(section.header)
+            lines.extend(section.lines)
+        return '\n'.join(lines)
@@ -0,0 +1,259 @@
+import time
+import uuid
+import logging
+import threading
+from collections import deque, OrderedDict
+from typing import Dict, List, Any, Optional
+from utils.event_bus import format_sse
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = ('succeeded', 'failed')
+
+
+class JobLimitError(Exception):
+    """任务队列已满"""
+
+
+class Job:
+    """一个后台任务: 状态、按顺序编号的进度事件和最终结果"""
+
+    def __init__(self, kind: str, user: str, description: str, fn, max_events: int, registry=None):
+        self.registry = registry
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.user = user
+        self.description = description
+        self.fn = fn
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self.dropped_events = 0
+        self.max_events = max_events
+        self.hosts = {}
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        """追加一条进度事件并唤醒等待中的读取者"""
+        with self._cond:
+            if event == 'host':
+                self.hosts[data["host"]] = data.get("host_status", data.get("status"))
+            if len(self.events) >= self.max_events and event == 'host':
+                # 事件数超过上限时只保留每台主机的汇总状态
+                self.dropped_events += 1
+            else:
+                seq = self.events[-1]["seq"] + 1 if self.events else 1
+                self.events.append({"seq": seq, "event": event, "time": time.time(), "data": data})
+                if self.registry:
+                    self.registry.add_job_event(self.id, self.events[-1])
+            self._cond.notify_all()
+
+    def _set_status(self, status: str, **fields):
+        with self._cond:
+            self.status = status
+            for key, value in fields.items():
+                setattr(self, key, value)
+        self.emit('status', {"status": status})
+        # 先写事件再写状态, 其他进程看到任务结束时所有事件都已可读
+        self.save()
+
+    def save(self):
+        """写入共享的任务登记表, 其他工作进程据此查询状态"""
+        if self.registry:
+            self.registry.save_job(self.to_dict())
+
+    def events_since(self, seq: int, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """返回编号大于seq的事件; 没有新事件且任务未结束时最多等待timeout秒"""
+        with self._cond:
+            if timeout and not self.finished and (not self.events or self.events[-1]["seq"] <= seq):
+                self._cond.wait(timeout)
+            return [e for e in self.events if e["seq"] > seq]
+
+    def to_dict(self, since: Optional[int] = None) -> Dict[str, Any]:
+        with self._cond:
+            data = {
+                "id": self.id,
+                "kind": self.kind,
+                "user": self.user,
+                "description": self.description,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "hosts": dict(self.hosts),
+                "error": self.error
+            }
+            if self.finished:
+                data["result"] = self.result
+            if since is not None:
+                data["events"] = [e for e in self.events if e["seq"] > since]
+                data["dropped_events"] = self.dropped_events
+            return data
+
+
+class SharedJob:
+    """其他工作进程中执行的任务, 状态和事件从共享登记表读取"""
+
+    def __init__(self, registry, data: Dict[str, Any], poll_interval: float = 0.5):
+        self.registry = registry
+        self.id = data["id"]
+        self.user = data["user"]
+        self._data = data
+        self.poll_interval = poll_interval
+
+    def _refresh(self):
+        self._data = self.registry.get_job(self.id) or self._data
+
+    @property
+    def finished(self) -> bool:
+        return self._data["status"] in FINISHED_STATES
+
+    def events_since(self, seq: int, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        deadline = time.time() + (timeout or 0)
+        while True:
+            self._refresh()
+            events = self.registry.job_events(self.id, seq)
+            if events or self.finished or time.time() >= deadline:
+                return events
+            time.sleep(self.poll_interval)
+
+    def to_dict(self, since: Optional[int] = None) -> Dict[str, Any]:
+        self._refresh()
+        data = dict(self._data)
+        if since is not None:
+            data["events"] = self.registry.job_events(self.id, since)
+            data["dropped_events"] = 0
+        return data
+
+
+class JobManager:
+    """有界工作线程池上的后台任务队列
+
+    全局最多max_workers个任务同时执行, 每个用户最多per_user_limit个;
+    超出的任务排队等待, 同一用户的任务不会占满整个线程池。
+    传入registry(SharedState)时任务同时登记在共享存储中, 多个工作进程都能查询;
+    并发和排队限制仍按进程计算。
+    """
+
+    def __init__(self, max_workers: int = 4, per_user_limit: int = 2, max_queued: int = 100,
+                 keep_finished: int = 200, max_events: int = 10000, registry=None):
+        self.registry = registry
+        self.max_workers = max_workers
+        self.per_user_limit = per_user_limit
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.max_events = max_events
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._running = {}
+        self._jobs = OrderedDict()
+        self._workers = []
+
+    def _ensure_workers(self):
+        self._workers = [t for t in self._workers if t.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, name="job-worker", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, kind: str, user: str, description: str, fn) -> Job:
+        """提交任务, 立即返回; fn(job)在工作线程中执行并返回结果字典"""
+        job = Job(kind, user, description, fn, self.max_events, self.registry)
+        with self._cond:
+            if len(self._pending) >= self.max_queued:
+                raise JobLimitError(f"任务队列已满({self.max_queued}), 请稍后重试")
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            job.save()
+            self._prune()
+            self._ensure_workers()
+            self._cond.notify_all()
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+        if self.registry:
+            self.registry.prune_jobs(self.keep_finished)
+
+    def _next_job(self) -> Job:
+        """取出第一个所属用户未达到并发上限的任务"""
+        while True:
+            for job in self._pending:
+                if self._running.get(job.user, 0) < self.per_user_limit:
+                    self._pending.remove(job)
+                    self._running[job.user] = self._running.get(job.user, 0) + 1
+                    return job
+            self._cond.wait()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+            try:
+                self._run(job)
+            finally:
+                with self._cond:
+                    self._running[job.user] -= 1
+                    self._cond.notify_all()
+
+    def _run(self, job: Job):
+        job._set_status('running', started_at=time.time())
+        try:
+            result = job.fn(job)
+            status = 'succeeded' if result.get("success") else 'failed'
+            job._set_status(status, result=result, finished_at=time.time())
+        except Exception as e:
+            logger.error(f"任务 {job.id} 执行失败: {e}")
+            job._set_status('failed', error=str(e), finished_at=time.time())
+
+    def get(self, job_id: str):
+        with self._cond:
+            job = self._jobs.get(job_id)
+        if job is None and self.registry:
+            data = self.registry.get_job(job_id)
+            if data:
+                return SharedJob(self.registry, data)
+        return job
+
+    def list(self, user: Optional[str] = None) -> List:
+        with self._cond:
+            local = [job for job in self._jobs.values() if user is None or job.user == user]
+        if not self.registry:
+            return local
+        # 本进程的任务直接使用内存中的对象
+        by_id = {job.id: job for job in local}
+        return [by_id.get(data["id"]) or SharedJob(self.registry, data) for data in self.registry.list_jobs(user)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": len(self._pending),
+                "running": sum(self._running.values()),
+                "max_workers": self.max_workers,
+                "per_user_limit": self.per_user_limit
+            }
+
+    def stream(self, job: Job, since: int = 0, heartbeat: float = 15):
+        """SSE响应生成器: 推送since之后的事件, 任务结束后发送done并关闭"""
+        yield "retry: 3000\n\n"
+        while True:
+            events = job.events_since(since, heartbeat)
+            if not events and not job.finished:
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                since = event["seq"]
+                yield format_sse(event["event"], event["data"], event["seq"])
+            if job.finished and not job.events_since(since):
+                yield format_sse("done", job.to_dict())
+                return
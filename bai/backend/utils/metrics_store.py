@@ -0,0 +1,173 @@
+import time
+import threading
+from array import array
+from typing import Dict, List, Any, Optional, Tuple
+
+# 默认记录的资源指标
+DEFAULT_METRICS = ('cpu', 'memory', 'disk', 'load')
+
+
+class _Ring:
+    """固定容量的时间序列环形缓冲区
+
+    槽位由 (桶起始时间 // 步长) % 容量 决定, 创建时一次性分配全部内存;
+    写入同一个桶的多个样本会合并为平均值/最小值/最大值。
+    """
+
+    __slots__ = ('step', 'capacity', 'ts', 'count', 'avg', 'min', 'max')
+
+    def __init__(self, step: int, capacity: int, rollup: bool):
+        self.step = step
+        self.capacity = capacity
+        self.ts = array('I', bytes(4 * capacity))
+        self.avg = array('f', bytes(4 * capacity))
+        # 原始数据每个桶只有一个样本, 不需要计数和最值
+        self.count = array('H', bytes(2 * capacity)) if rollup else None
+        self.min = array('f', bytes(4 * capacity)) if rollup else None
+        self.max = array('f', bytes(4 * capacity)) if rollup else None
+
+    def add(self, ts: int, value: float):
+        bucket = ts - ts % self.step
+        slot = (bucket // self.step) % self.capacity
+        if self.count is None:
+            self.ts[slot] = bucket
+            self.avg[slot] = value
+            return
+        if self.ts[slot] != bucket or self.count[slot] == 0:
+            self.ts[slot] = bucket
+            self.count[slot] = 1
+            self.avg[slot] = self.min[slot] = self.max[slot] = value
+            return
+        n = min(self.count[slot] + 1, 0xFFFF)
+        self.count[slot] = n
+        self.avg[slot] += (value - self.avg[slot]) / n
+        if value < self.min[slot]:
+            self.min[slot] = value
+        if value > self.max[slot]:
+            self.max[slot] = value
+
+    def range(self, start: int, end: int) -> List[Tuple[int, float, float, float]]:
+        points = []
+        # 环形缓冲区最多只保留capacity个桶
+        bucket = max(start - start % self.step, end - end % self.step - (self.capacity - 1) * self.step)
+        while bucket <= end:
+            slot = (bucket // self.step) % self.capacity
+            if self.ts[slot] == bucket:
+                if self.count is None:
+                    value = self.avg[slot]
+                    points.append((bucket, value, value, value))
+                else:
+                    points.append((bucket, self.avg[slot], self.min[slot], self.max[slot]))
+            bucket += self.step
+        return points
+
+
+class MetricsStore:
+    """进程内的主机指标时间序列存储
+
+    每台主机每个指标对应三级环形缓冲区: 原始采样、1分钟汇总、1小时汇总。
+    容量由保留时长/步长固定, 因此内存占用 = 主机数 × 指标数 × 单序列大小, 可预先估算。
+    """
+
+    def __init__(self, raw_step: int = 30, raw_retention: int = 2 * 3600,
+                 minute_retention: int = 24 * 3600, hour_retention: int = 30 * 86400,
+                 metrics=DEFAULT_METRICS):
+        self.metrics = tuple(metrics)
+        self.tiers = [
+            ('raw', raw_step, max(1, raw_retention // raw_step), False),
+            ('1m', 60, max(1, minute_retention // 60), True),
+            ('1h', 3600, max(1, hour_retention // 3600), True)
+        ]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, host: str, metric: str) -> List[_Ring]:
+        key = (host, metric)
+        series = self._series.get(key)
+        if series is None:
+            series = [_Ring(step, capacity, rollup) for _, step, capacity, rollup in self.tiers]
+            self._series[key] = series
+        return series
+
+    def record(self, host: str, values: Dict[str, Any], ts: Optional[float] = None):
+        """记录一台主机一次采样的所有指标, 缺失的值被忽略"""
+        ts = int(ts if ts is not None else time.time())
+        with self._lock:
+            for metric in self.metrics:
+                value = values.get(metric)
+                if value is None:
+                    continue
+                for ring in self._get_series(host, metric):
+                    ring.add(ts, float(value))
+
+    def record_snapshot(self, records: List[Dict[str, Any]], ts: float):
+        """ResourceCollector监听器: 记录本轮采集到数据的主机, 并清理已删除主机的序列"""
+        for record in records:
+            if record.get("updated_at") == ts:
+                self.record(record["host"], record, ts)
+        if records:
+            current = {record["host"] for record in records}
+            with self._lock:
+                for key in [key for key in self._series if key[0] not in current]:
+                    del self._series[key]
+
+    def query(self, host: str, metric: str, start: float, end: float, step: Optional[int] = None) -> Dict[str, Any]:
+        """查询区间数据
+
+        选择能覆盖起始时间、且步长不大于请求步长的最细一级;
+        请求步长大于该级步长时再按请求步长合并。
+        """
+        start, end = int(start), int(end)
+        now = int(time.time())
+        chosen = self.tiers[-1]
+        for tier in self.tiers:
+            name, tier_step, capacity, _ = tier
+            covers = start >= now - tier_step * capacity
+            if covers and (step is None or tier_step <= step):
+                chosen = tier
+                if step is None or tier_step == step:
+                    break
+
+        name, tier_step, _, _ = chosen
+        index = self.tiers.index(chosen)
+        with self._lock:
+            series = self._series.get((host, metric))
+            points = series[index].range(start, end) if series else []
+
+        if step and step > tier_step:
+            points = _downsample(points, step)
+        return {
+            "tier": name,
+            "step": max(step or tier_step, tier_step),
+            "points": [[ts, round(avg, 3), round(lo, 3), round(hi, 3)] for ts, avg, lo, hi in points]
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """当前序列数与内存占用"""
+        with self._lock:
+            series_count = len(self._series)
+        per_series = sum(
+            capacity * (18 if rollup else 8) for _, _, capacity, rollup in self.tiers
+        )
+        return {
+            "series": series_count,
+            "bytes_per_series": per_series,
+            "bytes": series_count * per_series,
+            "tiers": [
+                {"name": name, "step": step, "retention": step * capacity}
+                for name, step, capacity, _ in self.tiers
+            ]
+        }
+
+
+def _downsample(points, step: int):
+    """把相邻的点按更大的步长合并(平均值按点数加权近似)"""
+    merged = []
+    for ts, avg, lo, hi in points:
+        bucket = ts - ts % step
+        if merged and merged[-1][0] == bucket:
+            b, total, n, cur_lo, cur_hi = merged[-1]
+            merged[-1] = (b, total + avg, n + 1, min(cur_lo, lo), max(cur_hi, hi))
+        else:
+            merged.append((bucket, avg, 1, lo, hi))
+    return [(b, total / n, lo, hi) for b, total, n, lo, hi in merged]
@@ -0,0 +1,211 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+# 删除的主机保留多久(秒), 在此期间?since=查询会在removed中返回它们
+TOMBSTONE_TTL = 86400
+
+# 后台线程检查是否需要刷新的间隔(秒)
+CHECK_INTERVAL = 30
+
+
+def fingerprint(config: Dict[str, Any]) -> str:
+    """网络配置的指纹, 地址和DNS的顺序不影响结果"""
+    canonical = json.dumps({
+        "ip": sorted(config.get("ip") or []),
+        "gateway": config.get("gateway"),
+        "dns": sorted(config.get("dns") or [])
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class NetworkInventory:
+    """按主机保存的网络配置(地址、网关、DNS)与变化时间
+
+    网络配置很少变化, 因此network_scan.yml只在后台按较长的间隔执行一次全量刷新,
+    或按需刷新指定的主机; /api/network读取保存的数据。每台主机记录配置指纹,
+    指纹或可达状态变化时更新changed_at, ?since=据此只返回有变化的主机。
+
+    多进程部署时传入shared(SharedState)和election(LeaderElection): 数据保存在共享存储中,
+    只有主进程执行定时的全量刷新, 任一进程都可以按需刷新并写回共享存储。
+    """
+
+    def __init__(self, runner, interval: int = 3600, playbook: str = "network_scan.yml",
+                 shared=None, election=None):
+        self.runner = runner
+        self.interval = interval
+        self.playbook = playbook
+        self.shared = shared
+        self.election = election
+        self._state = {"hosts": {}, "removed": {}, "refreshed_at": None, "updated_at": None}
+        self._synced_at = None
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    # ---- 状态读写 ----
+
+    def _load(self) -> Dict[str, Any]:
+        """返回当前状态; 多进程部署时共享存储中有更新才重新读取"""
+        with self._lock:
+            if self.shared:
+                try:
+                    updated_at = self.shared.updated_at("network")
+                    if updated_at is not None and updated_at != self._synced_at:
+                        self._state, self._synced_at = self.shared.get("network")
+                except Exception as e:
+                    logger.error(f"读取共享网络信息失败: {e}")
+            return self._state
+
+    def _apply(self, result: Dict[str, Any], targets: List[str], full: bool) -> Dict[str, List[str]]:
+        """把一次network_scan.yml的结果合并到状态中, 返回有变化的主机"""
+        host_results = result.get("host_results", {})
+        custom_stats = result.get("custom_stats", {})
+        with self._lock:
+            state = self._load()
+            hosts = dict(state["hosts"])
+            removed = dict(state["removed"])
+            now = time.time()
+            changed = []
+            for host in targets:
+                entry = host_results.get(host)
+                if entry is None:
+                    continue
+                record = dict(hosts.get(host) or {"host": host, "ip": [], "gateway": None, "dns": [],
+                                                   "fingerprint": None, "changed_at": None})
+                stats = custom_stats.get(host)
+                if stats is not None:
+                    config = {"ip": stats.get("ip") or [], "gateway": stats.get("gateway") or None,
+                              "dns": stats.get("dns") or []}
+                    record.update(config, status="OK", error=None)
+                    digest = fingerprint(config)
+                else:
+                    # 不可达或执行失败时保留上一次的配置
+                    record.update(status="UNREACHABLE" if entry["status"] == "unreachable" else "FAILED",
+                                  error=self.runner._task_error(entry))
+                    digest = record["fingerprint"]
+                previous = hosts.get(host)
+                if previous is None or previous["fingerprint"] != digest or previous["status"] != record["status"]:
+                    record["changed_at"] = now
+                    changed.append(host)
+                record["fingerprint"] = digest
+                record["checked_at"] = now
+                hosts[host] = record
+                removed.pop(host, None)
+            if full and host_results:
+                # 全量刷新覆盖inventory中的全部主机, 不在其中的主机已被删除
+                for host in [host for host in hosts if host not in targets]:
+                    del hosts[host]
+                    removed[host] = now
+            removed = {host: at for host, at in removed.items() if now - at < TOMBSTONE_TTL}
+            state = {
+                "hosts": hosts,
+                "removed": removed,
+                "refreshed_at": now if full else state["refreshed_at"],
+                "updated_at": now
+            }
+            self._state = state
+            if self.shared:
+                try:
+                    self.shared.put("network", state)
+                    self._synced_at = self.shared.updated_at("network")
+                except Exception as e:
+                    logger.error(f"写入共享网络信息失败: {e}")
+        return {"changed": changed, "removed": [host for host, at in removed.items() if at == now]}
+
+    # ---- 刷新 ----
+
+    def refresh(self, hosts: Optional[Iterable[str]] = None, timeout: Optional[int] = None,
+                **options) -> Dict[str, Any]:
+        """对指定主机(默认全部)执行network_scan.yml并合并结果
+
+        返回{"refreshed": [主机], "changed": [主机], "removed": [主机], "errors": {主机: 错误}}。
+        """
+        full = hosts is None
+        targets = self.runner.inventory.match("all") if full else list(dict.fromkeys(hosts))
+        if not targets:
+            return {"refreshed": [], "changed": [], "removed": [], "errors": {}}
+        extra_vars = None if full else {"dashboard_hosts": ",".join(targets)}
+        # 同一进程内的刷新依次执行, 避免重复的全量刷新
+        with self._refresh_lock:
+            result = self.runner.run_playbook(self.playbook, extra_vars, structured=True, timeout=timeout,
+                                              hosts="all" if full else ",".join(targets), **options)
+        host_results = result.get("host_results", {})
+        if not host_results:
+            raise RuntimeError(result.get("stderr") or "没有网络检测输出结果")
+        diff = self._apply(result, targets, full)
+        records = self._load()["hosts"]
+        return dict(
+            diff,
+            refreshed=[host for host in targets if host in host_results],
+            errors={host: records[host]["error"] for host in targets
+                    if host in records and records[host]["status"] != "OK"}
+        )
+
+    # ---- 查询 ----
+
+    def view(self, since: Optional[float] = None, hosts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """保存的网络信息; since为上次返回的as_of时只包含之后有变化的主机和已删除的主机"""
+        state = self._load()
+        records = state["hosts"]
+        selected = [records[host] for host in hosts if host in records] if hosts else list(records.values())
+        if since is not None:
+            selected = [record for record in selected if record["changed_at"] and record["changed_at"] > since]
+        view = {
+            "network": selected,
+            "as_of": state["updated_at"],
+            "refreshed_at": state["refreshed_at"],
+            "pending": state["refreshed_at"] is None,
+            "interval": self.interval
+        }
+        if since is not None:
+            view["removed"] = sorted(host for host, at in state["removed"].items() if at > since)
+        return view
+
+    # ---- 后台定时刷新 ----
+
+    def is_leader(self) -> bool:
+        return self.election is None or self.election.is_leader
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name="network-inventory", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def trigger(self):
+        """立即开始一次全量刷新; 非主进程通过共享存储通知主进程"""
+        if self.shared and not self.is_leader():
+            self.shared.put("network_trigger", time.time())
+        self._wakeup.set()
+
+    def _due(self) -> bool:
+        refreshed_at = self._load()["refreshed_at"]
+        if refreshed_at is None or time.time() - refreshed_at >= self.interval:
+            return True
+        triggered = self.shared.updated_at("network_trigger") if self.shared else None
+        return bool(triggered and triggered > refreshed_at)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            woken = self._wakeup.is_set()
+            self._wakeup.clear()
+            try:
+                if self.is_leader() and (woken or self._due()):
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"网络信息刷新失败: {e}")
+            self._wakeup.wait(CHECK_INTERVAL)
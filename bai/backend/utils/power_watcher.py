@@ -0,0 +1,336 @@
+import time
+import uuid
+import logging
+import threading
+from typing import Dict, List, Any, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 主机状态: scheduled(已下发, 仍在线) -> unreachable(第一次无应答) -> down(确认关机);
+# 取消关机后为cancelled, 超过期限仍未关机为timeout
+PENDING_STATES = ("scheduled", "unreachable")
+
+# 关机时间到达后的首次检测间隔(秒), 主机持续在线时按BACKOFF倍数放慢, 最长MAX_INTERVAL
+MIN_INTERVAL = 2
+MAX_INTERVAL = 30
+BACKOFF = 1.5
+
+# 连续多少次无应答确认为已关机, 避免单次丢包误判
+CONFIRM_PROBES = 3
+
+# 非主进程读取共享记录的间隔(秒)
+FOLLOW_INTERVAL = 2
+
+# 结束的跟踪记录保留时间(秒)
+RETENTION = 3600
+
+
+def summarize(watch: Dict[str, Any]) -> Dict[str, int]:
+    counts = {}
+    for record in watch["hosts"].values():
+        counts[record["state"]] = counts.get(record["state"], 0) + 1
+    return counts
+
+
+class PowerWatcher:
+    """在服务端跟踪关机命令下发后各主机的实际状态
+
+    /api/shutdown成功后登记目标主机, 后台线程从预定的关机时间开始并发检测(ReachabilitySweeper):
+    仍在线的主机检测间隔逐渐放慢, 出现无应答的主机立即按最短间隔复查, 连续CONFIRM_PROBES次
+    无应答确认为已关机。每台主机记录各状态的时间(scheduled_at/unreachable_at/down_at),
+    变化通过event_bus的power事件推送, 所有浏览器标签页看到的是同一份结果, 关闭页面也不影响跟踪。
+
+    多进程部署时传入shared(SharedState)和election(LeaderElection): 每次跟踪保存为共享存储中的
+    power:<id>, 只有主进程执行检测并更新记录; 其他进程登记新的跟踪、提交取消请求(power_cancel:<id>),
+    并定期读取记录推送事件。
+    """
+
+    def __init__(self, sweeper, ports: Optional[Callable[[], Dict[str, int]]] = None, timeout: int = 600,
+                 event_bus=None, shared=None, election=None):
+        self.sweeper = sweeper
+        self.ports = ports
+        self.timeout = timeout
+        self.event_bus = event_bus
+        self.shared = shared
+        self.election = election
+        self._lock = threading.Lock()
+        self._watches = {}
+        # (跟踪ID, 主机) -> [下次检测时间, 当前间隔], 只在执行检测的进程内使用
+        self._schedule = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # ---- 登记与取消 ----
+
+    def watch(self, hosts: Iterable[str], delay: float = 0, action: str = "shutdown",
+              user: Optional[str] = None) -> Dict[str, Any]:
+        """登记一次关机, delay为命令中的延迟(秒); 返回跟踪记录"""
+        now = time.time()
+        due_at = now + delay
+        watch = {
+            "id": uuid.uuid4().hex[:12],
+            "action": action,
+            "user": user,
+            "status": "active",
+            "created_at": now,
+            "due_at": due_at,
+            "deadline": due_at + self.timeout,
+            "finished_at": None,
+            "updated_at": now,
+            "hosts": {
+                host: {"host": host, "state": "scheduled", "scheduled_at": now, "unreachable_at": None,
+                       "down_at": None, "cancelled_at": None, "last_seen_at": None, "last_probe_at": None,
+                       "probes": 0, "failures": 0}
+                for host in dict.fromkeys(hosts)
+            }
+        }
+        self._finish_if_done(watch, now)
+        with self._lock:
+            self._watches[watch["id"]] = watch
+        self._save(watch)
+        self._publish(watch, list(watch["hosts"].values()))
+        self.ensure_started()
+        self._wakeup.set()
+        return self._copy(watch)
+
+    def cancel(self, hosts: Iterable[str]) -> List[str]:
+        """取消关机后停止跟踪仍在线的主机, 返回被取消的主机"""
+        hosts = set(hosts)
+        if self.shared and not self.is_leader():
+            self.shared.put(f"power_cancel:{uuid.uuid4().hex[:12]}", {"hosts": sorted(hosts), "at": time.time()})
+            with self._lock:
+                return sorted({
+                    host for watch in self._watches.values() if watch["status"] == "active"
+                    for host, record in watch["hosts"].items() if host in hosts and record["state"] == "scheduled"
+                })
+        return self._apply_cancel(hosts, time.time())
+
+    def _apply_cancel(self, hosts, at: float) -> List[str]:
+        cancelled = set()
+        changed = []
+        with self._lock:
+            for watch in self._watches.values():
+                if watch["status"] != "active" or watch["created_at"] > at:
+                    continue
+                # 已无应答的主机多半已经在关机, 继续确认
+                records = [record for host, record in watch["hosts"].items()
+                           if host in hosts and record["state"] == "scheduled"]
+                for record in records:
+                    record.update(state="cancelled", cancelled_at=at)
+                    self._schedule.pop((watch["id"], record["host"]), None)
+                    cancelled.add(record["host"])
+                if records:
+                    self._finish_if_done(watch, at)
+                    changed.append((watch, records))
+        for watch, records in changed:
+            self._save(watch)
+            self._publish(watch, records)
+        return sorted(cancelled)
+
+    # ---- 查询 ----
+
+    def watches(self, active_only: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [self._copy(watch) for watch in self._watches.values()
+                     if not active_only or watch["status"] == "active"]
+        return sorted(items, key=lambda watch: watch["created_at"], reverse=True)
+
+    def get(self, watch_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            watch = self._watches.get(watch_id)
+            return self._copy(watch) if watch else None
+
+    def state_counts(self) -> Dict[str, int]:
+        """跟踪中的主机按状态计数(只统计进行中的跟踪)"""
+        counts = dict.fromkeys(PENDING_STATES, 0)
+        with self._lock:
+            for watch in self._watches.values():
+                if watch["status"] == "active":
+                    for state, count in watch["summary"].items():
+                        counts[state] = counts.get(state, 0) + count
+        return counts
+
+    @staticmethod
+    def _copy(watch: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(watch, hosts=[dict(record) for record in watch["hosts"].values()],
+                    summary=dict(watch["summary"]))
+
+    # ---- 后台检测 ----
+
+    def is_leader(self) -> bool:
+        return self.election is None or self.election.is_leader
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name="power-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            delay = FOLLOW_INTERVAL
+            try:
+                if self.shared:
+                    self.sync_once()
+                if self.is_leader():
+                    delay = self.check_once()
+                    if self.shared:
+                        delay = min(delay, FOLLOW_INTERVAL)
+            except Exception as e:
+                logger.error(f"关机状态检测失败: {e}")
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def check_once(self) -> float:
+        """检测已到时间的主机并更新状态, 返回距下一次检测的秒数"""
+        now = time.time()
+        due = {}
+        with self._lock:
+            for watch in self._watches.values():
+                if watch["status"] != "active":
+                    continue
+                for host, record in watch["hosts"].items():
+                    if record["state"] not in PENDING_STATES:
+                        continue
+                    entry = self._schedule.setdefault((watch["id"], host), [watch["due_at"], MIN_INTERVAL])
+                    if entry[0] <= now:
+                        due.setdefault(host, []).append(watch["id"])
+
+        results = {}
+        if due:
+            for result in self.sweeper.sweep(due, self.ports() if self.ports else None):
+                results[result["host"]] = result
+
+        now = time.time()
+        changed = []
+        with self._lock:
+            for watch in self._watches.values():
+                if watch["status"] != "active":
+                    continue
+                records = []
+                probed = False
+                for host, record in watch["hosts"].items():
+                    moved = False
+                    if host in results and watch["id"] in due.get(host, ()):
+                        probed = True
+                        moved = self._observe(watch["id"], record, results[host], now)
+                    # 期限到达时仍在线的主机记为timeout; 确认中的主机再给几轮检测的时间
+                    limit = watch["deadline"] + (MAX_INTERVAL * CONFIRM_PROBES if record["state"] == "unreachable" else 0)
+                    if record["state"] in PENDING_STATES and now >= limit:
+                        record["state"] = "timeout"
+                        self._schedule.pop((watch["id"], host), None)
+                        moved = True
+                    if moved:
+                        records.append(record)
+                if records or probed:
+                    self._finish_if_done(watch, now)
+                    changed.append((watch, records))
+            next_at = min((entry[0] for entry in self._schedule.values()), default=now + MAX_INTERVAL)
+        for watch, records in changed:
+            self._save(watch)
+            if records:
+                self._publish(watch, records)
+        self._prune(now)
+        return min(MAX_INTERVAL, max(0.5, next_at - time.time()))
+
+    def _observe(self, watch_id: str, record: Dict[str, Any], result: Dict[str, Any], now: float) -> bool:
+        """根据一次检测结果推进主机状态, 状态变化时返回True"""
+        entry = self._schedule[(watch_id, record["host"])]
+        record["probes"] += 1
+        record["last_probe_at"] = now
+        previous = record["state"]
+        if result["status"] == "online":
+            record.update(state="scheduled", unreachable_at=None, failures=0, last_seen_at=now)
+            # 仍在线: 逐渐放慢检测
+            entry[1] = MIN_INTERVAL if previous == "unreachable" else min(MAX_INTERVAL, entry[1] * BACKOFF)
+        else:
+            record["failures"] += 1
+            if previous == "scheduled":
+                record.update(state="unreachable", unreachable_at=now)
+            if record["failures"] >= CONFIRM_PROBES:
+                record.update(state="down", down_at=now)
+            entry[1] = MIN_INTERVAL
+        entry[0] = now + entry[1]
+        if record["state"] not in PENDING_STATES:
+            self._schedule.pop((watch_id, record["host"]), None)
+        return record["state"] != previous
+
+    def _finish_if_done(self, watch: Dict[str, Any], now: float):
+        watch["summary"] = summarize(watch)
+        watch["updated_at"] = now
+        if not any(record["state"] in PENDING_STATES for record in watch["hosts"].values()):
+            watch["status"] = "completed"
+            watch["finished_at"] = now
+
+    def _prune(self, now: float):
+        with self._lock:
+            expired = [watch_id for watch_id, watch in self._watches.items()
+                       if watch["finished_at"] and now - watch["finished_at"] > RETENTION]
+            for watch_id in expired:
+                del self._watches[watch_id]
+        if self.shared and self.is_leader():
+            for watch_id in expired:
+                self.shared.delete(f"power:{watch_id}")
+
+    # ---- 共享存储与事件 ----
+
+    def _save(self, watch: Dict[str, Any]):
+        if not self.shared:
+            return
+        try:
+            with self._lock:
+                value = dict(watch, hosts={host: dict(record) for host, record in watch["hosts"].items()})
+            self.shared.put(f"power:{watch['id']}", value)
+        except Exception as e:
+            logger.error(f"写入关机跟踪记录失败: {e}")
+
+    def sync_once(self):
+        """读取共享存储: 主进程接收其他进程登记的跟踪和取消请求, 其他进程同步检测结果"""
+        leader = self.is_leader()
+        updates = []
+        with self._lock:
+            stored = {key.split(":", 1)[1]: value for key, value, _ in self.shared.scan("power:")}
+            for watch_id, value in stored.items():
+                current = self._watches.get(watch_id)
+                if leader and current is not None:
+                    continue
+                if current is None or current["updated_at"] != value["updated_at"]:
+                    previous = current["hosts"] if current else {}
+                    records = [record for host, record in value["hosts"].items()
+                               if host not in previous or previous[host]["state"] != record["state"]]
+                    self._watches[watch_id] = value
+                    updates.append((value, records))
+            if not leader:
+                # 主进程已清理的记录
+                for watch_id in [watch_id for watch_id in self._watches if watch_id not in stored]:
+                    del self._watches[watch_id]
+                self._schedule.clear()
+        for watch, records in updates:
+            if records:
+                self._publish(watch, records)
+        if leader:
+            for key, value, _ in self.shared.scan("power_cancel:"):
+                self._apply_cancel(set(value["hosts"]), value["at"])
+                self.shared.delete(key)
+
+    def _publish(self, watch: Dict[str, Any], records: List[Dict[str, Any]]):
+        if not self.event_bus:
+            return
+        with self._lock:
+            summary = {key: value for key, value in watch.items() if key != "hosts"}
+            summary["summary"] = dict(watch["summary"])
+            summary["total"] = len(watch["hosts"])
+            changed = [dict(record) for record in records]
+        self.event_bus.publish("power", {"watch": summary, "hosts": changed})
+        for record in changed:
+            # 确认关机或重新出现应答时同步主机在线状态
+            if record["state"] == "down" or (record["state"] == "scheduled" and record["last_seen_at"]):
+                self.event_bus.set_host_status(record["host"], "offline" if record["state"] == "down" else "online",
+                                               source="power")
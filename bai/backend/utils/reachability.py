@@ -0,0 +1,169 @@
+import time
+import queue
+import socket
+import struct
+import asyncio
+import threading
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+
+# 非特权ICMP(SOCK_DGRAM)回显请求/应答类型
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+def icmp_available() -> bool:
+    """当前进程是否允许创建非特权ICMP socket(由net.ipv4.ping_group_range控制)"""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except (OSError, AttributeError):
+        return False
+    sock.close()
+    return True
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(seq: int) -> bytes:
+    payload = struct.pack('!d', time.time())
+    # 非特权ICMP socket的identifier由内核填写
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, 0, seq)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, _checksum(header + payload), 0, seq) + payload
+
+
+class ReachabilitySweeper:
+    """基于asyncio的批量连通性检测
+
+    method:
+        icmp - 只发送ICMP回显请求
+        tcp  - 只尝试连接SSH端口, 收到RST(连接被拒绝)也说明主机在线
+        auto - 允许时先ICMP, 无应答再尝试TCP; 不允许ICMP时只用TCP
+    并发数由信号量限制, 单个慢主机只占用自己的超时时间, 不影响其它主机。
+    """
+
+    def __init__(self, method: str = "auto", port: int = 22, timeout: float = 2.0, concurrency: int = 512):
+        if method not in ("auto", "icmp", "tcp"):
+            raise ValueError(f"不支持的检测方式: {method}")
+        self.method = method
+        self.port = port
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.icmp = icmp_available() if method != "tcp" else False
+        if method == "icmp" and not self.icmp:
+            raise RuntimeError("当前环境不允许发送ICMP, 请检查net.ipv4.ping_group_range")
+
+    async def _resolve(self, host: str) -> Optional[str]:
+        loop = asyncio.get_event_loop()
+        try:
+            infos = await loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            return None
+        return infos[0][4][0] if infos else None
+
+    async def _probe_icmp(self, address: str, seq: int) -> Optional[float]:
+        """返回RTT(毫秒), 无应答返回None"""
+        loop = asyncio.get_event_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        sock.setblocking(False)
+        try:
+            sock.connect((address, 0))
+            start = time.perf_counter()
+            await loop.sock_sendall(sock, _echo_request(seq))
+            deadline = start + self.timeout
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                data = await asyncio.wait_for(loop.sock_recv(sock, 1024), remaining)
+                if len(data) >= 8:
+                    icmp_type, _, _, _, reply_seq = struct.unpack('!BBHHH', data[:8])
+                    if icmp_type == ICMP_ECHO_REPLY and reply_seq == seq:
+                        return (time.perf_counter() - start) * 1000
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            sock.close()
+
+    async def _probe_tcp(self, address: str, port: int):
+        """返回(状态, RTT毫秒)"""
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+        except ConnectionRefusedError:
+            # 主机回复了RST, 网络可达但端口未开放
+            return "REFUSED", (time.perf_counter() - start) * 1000
+        except asyncio.TimeoutError:
+            return "TIMEOUT", None
+        except OSError:
+            return "UNREACHABLE", None
+        rtt = (time.perf_counter() - start) * 1000
+        writer.close()
+        return "SUCCESS", rtt
+
+    async def _probe(self, host: str, port: int, seq: int) -> Dict[str, Any]:
+        result = {"host": host, "status": "offline", "raw_status": "UNREACHABLE", "method": None, "rtt_ms": None}
+        address = await self._resolve(host)
+        if address is None:
+            result["raw_status"] = "UNRESOLVED"
+            return result
+
+        if self.icmp:
+            rtt = await self._probe_icmp(address, seq)
+            result["method"] = "icmp"
+            if rtt is not None:
+                result.update(status="online", raw_status="SUCCESS", rtt_ms=round(rtt, 2))
+                return result
+            result["raw_status"] = "TIMEOUT"
+            if self.method == "icmp":
+                return result
+
+        raw_status, rtt = await self._probe_tcp(address, port)
+        result["method"] = "tcp"
+        result["raw_status"] = raw_status
+        if rtt is not None:
+            result.update(status="online", rtt_ms=round(rtt, 2))
+        return result
+
+    async def _sweep(self, hosts: List[str], ports: Dict[str, int], on_result):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(host, seq):
+            async with semaphore:
+                result = await self._probe(host, ports.get(host, self.port), seq)
+            result["timestamp"] = time.time()
+            on_result(result)
+
+        await asyncio.gather(*(bounded(host, i & 0xFFFF) for i, host in enumerate(hosts)))
+
+    def sweep(self, hosts: Iterable[str], ports: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """检测全部主机, 按输入顺序返回结果"""
+        hosts = list(dict.fromkeys(hosts))
+        results = {}
+        asyncio.run(self._sweep(hosts, ports or {}, lambda r: results.__setitem__(r["host"], r)))
+        return [results[host] for host in hosts]
+
+    def iter_sweep(self, hosts: Iterable[str], ports: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+        """按应答先后逐个产出结果, 供流式响应使用"""
+        hosts = list(dict.fromkeys(hosts))
+        results = queue.Queue()
+        done = object()
+
+        def run():
+            try:
+                asyncio.run(self._sweep(hosts, ports or {}, results.put))
+            finally:
+                results.put(done)
+
+        threading.Thread(target=run, name="reachability-sweep", daemon=True).start()
+        while True:
+            item = results.get()
+            if item is done:
+                return
+            yield item
+
@@ -0,0 +1,313 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+from utils.telemetry import PARSE_DURATION
+
+logger = logging.getLogger(__name__)
+
+# 新主机第一次采样后没有CPU/网络速率数据, 间隔这么多秒后补采一次, 不必等待完整的采集间隔
+BASELINE_DELAY = 5
+
+# 多进程部署时非主进程读取共享快照的间隔(秒)
+FOLLOW_INTERVAL = 2
+
+
+def percent(part, whole):
+    return round(part * 100 / whole, 2) if whole else None
+
+
+def cpu_percent(current, previous):
+    """两次/proc/stat采样之间非空闲时间的占比, 计数器回绕(主机重启)时返回None"""
+    if not current or not previous or len(current) != len(previous):
+        return None
+    delta = [c - p for c, p in zip(current, previous)]
+    total = sum(delta)
+    if total <= 0 or min(delta) < 0:
+        return None
+    # idle + iowait
+    return percent(total - delta[3] - delta[4], total)
+
+
+def rate(current, previous, elapsed):
+    if previous is None or elapsed <= 0 or current < previous:
+        return None
+    return round((current - previous) / elapsed, 2)
+
+
+def probe_metrics(probe: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """把resource_probe模块返回的计数器换算为指标, 需要差值的指标在没有上一次采样时为None"""
+    memory = probe["memory"]
+    disks = [
+        # 与df一致: 已用 / (已用 + 普通用户可用)
+        dict(disk, percent=percent(disk["used"], disk["used"] + disk["available"]))
+        for disk in probe["disks"]
+    ]
+    root = next((disk for disk in disks if disk["mount"] == "/"), None)
+    metrics = {
+        "cpu": None,
+        "cpu_cores": None,
+        "memory": percent(memory["total_kb"] - memory["available_kb"], memory["total_kb"]),
+        "swap": percent(memory["swap_total_kb"] - memory["swap_free_kb"], memory["swap_total_kb"]),
+        "disk": root["percent"] if root else None,
+        "disks": disks,
+        "load": probe["load"][0],
+        "load_avg": probe["load"],
+        "network": {
+            name: dict(counters, rx_rate=None, tx_rate=None) for name, counters in probe["network"].items()
+        }
+    }
+    if previous:
+        elapsed = probe["time"] - previous["time"]
+        metrics["cpu"] = cpu_percent(probe["cpu"]["total"], previous["cpu"]["total"])
+        if len(probe["cpu"]["cores"]) == len(previous["cpu"]["cores"]):
+            metrics["cpu_cores"] = [
+                cpu_percent(core, prev) for core, prev in zip(probe["cpu"]["cores"], previous["cpu"]["cores"])
+            ]
+        for name, counters in metrics["network"].items():
+            prev = previous["network"].get(name, {})
+            counters["rx_rate"] = rate(counters["rx_bytes"], prev.get("rx_bytes"), elapsed)
+            counters["tx_rate"] = rate(counters["tx_bytes"], prev.get("tx_bytes"), elapsed)
+    return metrics
+
+
+def extract_resource_stats(result: Dict[str, Any],
+                           previous: Optional[Dict[str, Dict]] = None) -> List[Dict[str, Any]]:
+    """从resource_monitor.yml的set_stats结果中提取每台主机的资源数据
+
+    previous为每台主机上一次的原始采样, 返回的记录中probe字段为本次的原始采样。
+    """
+    previous = previous or {}
+    resources = []
+    for host, stats in result.get("custom_stats", {}).items():
+        probe = stats.get("probe")
+        if not isinstance(probe, dict):
+            continue
+        try:
+            metrics = probe_metrics(probe, previous.get(host))
+        except (KeyError, IndexError, TypeError) as e:
+            logger.warning(f"{host}的资源采样格式不正确: {e}")
+            continue
+        resources.append(dict(metrics, host=host, probe=probe))
+    return resources
+
+
+class ResourceCollector:
+    """后台资源采集器
+
+    单个后台线程按固定间隔对全部主机执行一次resource_monitor.yml, 并保存每台主机
+    最近一次的数据。/api/resources 只读取快照, 不再随浏览器标签页数量触发playbook。
+    传入event_bus时, 每轮只把有变化的主机作为resources事件推送给订阅者。
+
+    多进程部署时传入shared(SharedState)和election(LeaderElection): 只有主进程执行playbook
+    并把快照写入共享存储, 其他进程定期读取快照, 同样更新事件推送和历史数据。
+    """
+
+    def __init__(self, runner, interval: int = 30, stale_after: Optional[int] = None,
+                 playbook: str = "resource_monitor.yml", event_bus=None, shared=None, election=None):
+        self.runner = runner
+        self.shared = shared
+        self.election = election
+        self._synced_at = None
+        self.event_bus = event_bus
+        self.interval = interval
+        self.stale_after = stale_after or interval * 2
+        self.playbook = playbook
+        self._lock = threading.Lock()
+        self._hosts = {}
+        # 每台主机上一次的原始采样, 用于计算CPU使用率和网络速率
+        self._samples = {}
+        self._last_run = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """注册采集完成回调, 参数为(主机记录列表, 采集完成时间)"""
+        self._listeners.append(callback)
+
+    def ensure_started(self):
+        """启动采集线程(重复调用无副作用)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name="resource-collector", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def is_leader(self) -> bool:
+        return self.election is None or self.election.is_leader
+
+    def trigger(self):
+        """立即开始下一轮采集, 不等待间隔结束; 非主进程通过共享存储通知主进程"""
+        if self.shared and not self.is_leader():
+            self.shared.put("resources_trigger", time.time())
+        self._wakeup.set()
+
+    def _loop(self):
+        was_leader = False
+        while not self._stopped.is_set():
+            if self.is_leader():
+                if self.shared and not was_leader:
+                    # 刚接管时先载入上一个主进程的快照, CPU使用率可以继续按差值计算
+                    self.sync_once()
+                was_leader = True
+                new_hosts = self.collect_once()
+                self._wait(min(self.interval, BASELINE_DELAY) if new_hosts else self.interval)
+            else:
+                was_leader = False
+                self.sync_once()
+                self._wait(FOLLOW_INTERVAL)
+
+    def _wait(self, delay: float):
+        if not self.shared:
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            return
+        deadline = time.time() + delay
+        while not self._stopped.is_set() and time.time() < deadline:
+            if self._wakeup.wait(min(FOLLOW_INTERVAL, max(0, deadline - time.time()))):
+                break
+            triggered = self.shared.updated_at("resources_trigger")
+            started_at = self._last_run["started_at"] if self._last_run else 0
+            if self.is_leader() and triggered and triggered > started_at:
+                break
+        self._wakeup.clear()
+
+    def sync_once(self):
+        """读取主进程写入的共享快照, 有更新时替换本进程的数据"""
+        try:
+            entry = self.shared.get("resources")
+        except Exception as e:
+            logger.error(f"读取共享资源快照失败: {e}")
+            return
+        if entry is None or entry[1] == self._synced_at:
+            return
+        data, self._synced_at = entry
+        hosts = {record["host"]: record for record in data["hosts"]}
+        with self._lock:
+            removed = [host for host in self._hosts if host not in hosts]
+            updated = [
+                host for host, record in hosts.items()
+                if host not in self._hosts
+                or self._hosts[host]["updated_at"] != record["updated_at"]
+                or self._hosts[host]["reachable"] != record["reachable"]
+            ]
+            self._hosts = hosts
+            self._samples = data["samples"]
+            self._last_run = data["last_run"]
+            records = [dict(record) for record in hosts.values()]
+            last_run = dict(self._last_run)
+        self._notify(records, updated, removed, last_run)
+
+    def collect_once(self) -> List[str]:
+        """执行一轮采集并更新快照, 返回本轮第一次采样(还没有CPU使用率)的主机"""
+        started_at = time.time()
+        try:
+            result = self.runner.run_playbook(self.playbook, structured=True)
+        except Exception as e:
+            logger.error(f"资源采集失败: {e}")
+            result = {"success": False, "stderr": str(e), "return_code": -1}
+
+        host_results = result.get("host_results", {})
+        with self._lock:
+            previous = dict(self._samples)
+        with PARSE_DURATION.time(parser='resource_probe'):
+            resources = {item["host"]: item for item in extract_resource_stats(result, previous)}
+        new_hosts = [host for host in resources if host not in previous]
+        finished_at = time.time()
+
+        removed = []
+        updated = []
+        with self._lock:
+            # playbook覆盖inventory中的全部主机, 不在结果中的主机已被删除
+            if host_results:
+                for host in list(self._hosts):
+                    if host not in host_results:
+                        del self._hosts[host]
+                        self._samples.pop(host, None)
+                        removed.append(host)
+            for host, entry in host_results.items():
+                record = self._hosts.setdefault(host, {"host": host, "updated_at": None, "reachable": None})
+                reachable = entry["status"] != "unreachable"
+                changed = record["reachable"] != reachable
+                record["reachable"] = reachable
+                if host in resources:
+                    self._samples[host] = resources[host].pop("probe")
+                    record.update(resources[host])
+                    record["updated_at"] = finished_at
+                    changed = True
+                if changed:
+                    updated.append(host)
+            self._last_run = {
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "success": result.get("success", False),
+                "return_code": result.get("return_code"),
+                "error": None if host_results else (result.get("stderr") or "没有资源监控输出结果")
+            }
+            records = [dict(record) for record in self._hosts.values()]
+            last_run = dict(self._last_run)
+            samples = dict(self._samples)
+
+        if self.shared:
+            try:
+                self.shared.put("resources", {"hosts": records, "samples": samples, "last_run": last_run})
+            except Exception as e:
+                logger.error(f"写入共享资源快照失败: {e}")
+        self._notify(records, updated, removed, last_run)
+        return new_hosts
+
+    def _notify(self, records, updated, removed, last_run):
+        if self.event_bus:
+            self._publish(records, updated, removed, last_run)
+
+        for callback in self._listeners:
+            try:
+                callback(records, last_run["finished_at"])
+            except Exception as e:
+                logger.error(f"资源采集回调失败: {e}")
+
+    def _publish(self, records, updated, removed, last_run):
+        changed = [self._with_age(dict(record), last_run["finished_at"])
+                   for record in records if record["host"] in updated]
+        if changed or removed or last_run["error"]:
+            self.event_bus.publish("resources", {
+                "updated": changed,
+                "removed": removed,
+                "collected_at": last_run["finished_at"],
+                "error": last_run["error"]
+            })
+        if removed:
+            self.event_bus.remove_hosts(removed)
+        for record in records:
+            self.event_bus.set_host_status(
+                record["host"], "online" if record["reachable"] else "offline", source="collector"
+            )
+
+    def _with_age(self, record, now):
+        updated_at = record["updated_at"]
+        record["age"] = round(now - updated_at, 3) if updated_at else None
+        record["stale"] = updated_at is None or now - updated_at > self.stale_after
+        return record
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回最近一次采集的快照, 附带数据年龄与每台主机的过期标记"""
+        now = time.time()
+        with self._lock:
+            last_run = dict(self._last_run) if self._last_run else None
+            hosts = [self._with_age(dict(record), now) for record in self._hosts.values()]
+
+        return {
+            "resources": hosts,
+            "pending": last_run is None,
+            "collected_at": last_run["finished_at"] if last_run else None,
+            "age": round(now - last_run["finished_at"], 3) if last_run else None,
+            "interval": self.interval,
+            "last_run": last_run
+        }
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def token_key(token: str) -> str:
+    """存储中只保存token的SHA-256, 存储内容泄露时无法直接得到可用的token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionStore(ABC):
+    """会话存储接口
+
+    会话在ttl秒内没有被访问就过期(滑动过期), 每次get成功都会延长有效期。
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @abstractmethod
+    def set(self, token: str, data: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """返回会话数据并延长有效期, 不存在或已过期时返回None"""
+        pass
+
+    @abstractmethod
+    def delete(self, token: str) -> bool:
+        pass
+
+    @abstractmethod
+    def purge(self) -> int:
+        """删除已过期的会话, 返回删除的数量"""
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """进程内会话存储, 只适用于单个工作进程
+
+    所有会话的ttl相同, 按最近访问时间排列在OrderedDict中(访问时移到末尾),
+    过期的会话总在最前面, 清理时从头部弹出, 不需要遍历全部会话。
+    """
+
+    def __init__(self, ttl: int):
+        super().__init__(ttl)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_locked(self, now: float) -> int:
+        removed = 0
+        while self._sessions:
+            key, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[key]
+            removed += 1
+        return removed
+
+    def set(self, token: str, data: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._purge_locked(now)
+            self._sessions[token_key(token)] = (now + self.ttl, data)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        key = token_key(token)
+        with self._lock:
+            self._purge_locked(now)
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            self._sessions[key] = (now + self.ttl, entry[1])
+            self._sessions.move_to_end(key)
+            return entry[1]
+
+    def delete(self, token: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(token_key(token), None) is not None
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._purge_locked(time.time())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "ttl": self.ttl}
+
+
+class SQLiteSessionStore(SessionStore):
+    """基于SQLite文件的会话存储, 同一主机上的多个工作进程共享
+
+    expires_at上有索引, 清理过期会话是一次按索引的范围删除。为减少写入,
+    距离上次延长超过touch_interval秒的访问才更新expires_at。
+    """
+
+    def __init__(self, path: str, ttl: int, touch_interval: int = 60, purge_interval: int = 60):
+        super().__init__(ttl)
+        self.path = path
+        self.touch_interval = min(touch_interval, ttl)
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "token TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3连接不能跨线程使用, 每个线程一个连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self, now: float):
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self.purge()
+
+    def set(self, token: str, data: Dict[str, Any]):
+        now = time.time()
+        self._maybe_purge(now)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (token, data, expires_at) VALUES (?, ?, ?)",
+                (token_key(token), json.dumps(data, ensure_ascii=False), now + self.ttl)
+            )
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        key = token_key(token)
+        conn = self._connect()
+        row = conn.execute("SELECT data, expires_at FROM sessions WHERE token = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if row[1] - now < self.ttl - self.touch_interval:
+            with conn:
+                conn.execute("UPDATE sessions SET expires_at = ? WHERE token = ?", (now + self.ttl, key))
+        return json.loads(row[0])
+
+    def delete(self, token: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE token = ?", (token_key(token),)).rowcount > 0
+
+    def purge(self) -> int:
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        if removed:
+            logger.info(f"删除{removed}个过期会话")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._connect().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "sessions": count, "ttl": self.ttl}
+
+
+def create_session_store(backend: str, ttl: int, path: Optional[str] = None) -> SessionStore:
+    if backend == 'memory':
+        return MemorySessionStore(ttl)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(path, ttl)
+    raise ValueError(f"不支持的会话存储: {backend}, 可选: memory, sqlite")
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, user TEXT NOT NULL, created_at REAL NOT NULL, finished INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class SharedState:
+    """同一主机上多个Web工作进程共享的状态(SQLite, WAL模式)
+
+    kv: 后台采集快照等小对象; leases: 主进程选举; jobs/job_events: 后台任务登记表,
+    任务在接收它的进程中执行, 其他进程通过登记表查询状态和进度事件。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3连接不能跨线程使用, 每个线程一个连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- kv ----
+
+    def put(self, key: str, value: Any):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time())
+        )
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """返回(值, 更新时间), 不存在时返回None"""
+        row = self._connect().execute("SELECT value, updated_at FROM kv WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def updated_at(self, key: str) -> Optional[float]:
+        row = self._connect().execute("SELECT updated_at FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def scan(self, prefix: str) -> List[Tuple[str, Any, float]]:
+        """返回键以prefix开头的所有(键, 值, 更新时间)"""
+        rows = self._connect().execute(
+            "SELECT key, value, updated_at FROM kv WHERE key >= ? AND key < ? ORDER BY key",
+            (prefix, prefix + '\uffff')
+        ).fetchall()
+        return [(row[0], json.loads(row[1]), row[2]) for row in rows]
+
+    # ---- leases ----
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """获取或续期租约; 租约被其他未过期的持有者占用时返回False"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl)
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release_lease(self, name: str, owner: str):
+        self._connect().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    # ---- jobs ----
+
+    def save_job(self, job: Dict[str, Any]):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO jobs (id, user, created_at, finished, data) VALUES (?, ?, ?, ?, ?)",
+            (job["id"], job["user"], job["created_at"], int(job["status"] in ('succeeded', 'failed')),
+             json.dumps(job, ensure_ascii=False))
+        )
+
+    def add_job_event(self, job_id: str, event: Dict[str, Any]):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_events (job_id, seq, data) VALUES (?, ?, ?)",
+            (job_id, event["seq"], json.dumps(event, ensure_ascii=False))
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_jobs(self, user: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按创建时间排序"""
+        if user is None:
+            rows = self._connect().execute("SELECT data FROM jobs ORDER BY created_at").fetchall()
+        else:
+            rows = self._connect().execute(
+                "SELECT data FROM jobs WHERE user = ? ORDER BY created_at", (user,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def job_events(self, job_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, since)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def prune_jobs(self, keep_finished: int):
+        """只保留最近keep_finished个已结束的任务"""
+        conn = self._connect()
+        stale = [row[0] for row in conn.execute(
+            "SELECT id FROM jobs WHERE finished = 1 ORDER BY created_at DESC LIMIT -1 OFFSET ?", (keep_finished,)
+        )]
+        for job_id in stale:
+            conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+class LeaderElection:
+    """基于SharedState租约的主进程选举
+
+    每个工作进程一个后台线程, 每ttl/3秒续期一次; 持有租约的进程负责资源采集等
+    只需要运行一份的后台任务。主进程退出后租约最多ttl秒后被其他进程接管。
+    """
+
+    def __init__(self, shared: SharedState, name: str = "background", ttl: float = 15):
+        self.shared = shared
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._renew()
+            self._thread = threading.Thread(target=self._loop, name="leader-election", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_leader:
+            self.shared.release_lease(self.name, self.owner)
+            self.is_leader = False
+
+    def _renew(self):
+        try:
+            leader = self.shared.acquire_lease(self.name, self.owner, self.ttl)
+        except sqlite3.Error as e:
+            logger.error(f"续期租约失败: {e}")
+            leader = False
+        if leader != self.is_leader:
+            logger.info(f"进程{os.getpid()}{'成为' if leader else '不再是'}主进程")
+        self.is_leader = leader
+
+    def _loop(self):
+        while not self._stopped.wait(self.ttl / 3):
+            self._renew()
@@ -0,0 +1,83 @@
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并并发的相同调用: 同一key已有调用在执行时, 后来的调用等待并共享它的结果
+
+    ttl大于0时, 结束的调用结果在ttl秒内直接返回给相同key的调用, 吸收短时间内的突发请求;
+    keep(result)返回False的结果(如执行出错)不缓存。只合并同一进程内的调用。
+    """
+
+    def __init__(self, ttl: float = 0, keep: Optional[Callable[[Any], bool]] = None):
+        self.ttl = ttl
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._recent = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.cached = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, str]:
+        """执行fn或共享相同key的结果, 返回(结果, 来源), 来源为executed/coalesced/cached"""
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent.get(key)
+            if recent is not None:
+                if recent[0] > now:
+                    self.cached += 1
+                    return recent[1], "cached"
+                del self._recent[key]
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                source = "coalesced"
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                source = "executed"
+
+        if source == "coalesced":
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    if self.ttl > 0 and call.error is None and (self.keep is None or self.keep(call.result)):
+                        self._prune(time.monotonic())
+                        self._recent[key] = (time.monotonic() + self.ttl, call.result)
+                call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.result, source
+
+    def _prune(self, now: float):
+        for key in [key for key, (expires, _) in self._recent.items() if expires <= now]:
+            del self._recent[key]
+
+    def forget(self):
+        """丢弃缓存的结果(如inventory或目标主机状态已变化)"""
+        with self._lock:
+            self._recent.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "cached": self.cached,
+                "in_flight": len(self._calls)
+            }
@@ -0,0 +1,184 @@
+import os
+import time
+import errno
+import socket
+import getpass
+import logging
+import threading
+import subprocess
+from typing import Dict, List, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class SSHConnectionPool:
+    """Ansible SSH连接复用(ControlMaster)的管理
+
+    所有Ansible执行(常驻引擎和CLI)共用一个控制socket目录, socket按
+    主机-端口-用户命名, 同一主机的后续任务复用已建立的SSH连接;
+    同时打开pipelining, 每个任务只需一次SSH会话。
+    后台线程定期清理已失效的socket, 并在主连接数超过上限时关闭最久未使用的连接。
+    复用率按每次执行前目标主机是否已有存活的主连接统计。
+    """
+
+    def __init__(self, control_dir: str, persist: int = 120, max_masters: int = 256,
+                 reap_interval: float = 30, pipelining: bool = True):
+        self.control_dir = control_dir
+        self.persist = persist
+        self.max_masters = max_masters
+        self.reap_interval = reap_interval
+        self.pipelining = pipelining
+        self.default_user = getpass.getuser()
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._counters = {"runs": 0, "reused": 0, "opened": 0, "reaped": 0, "evicted": 0}
+        self._stopped = threading.Event()
+        self._thread = None
+        os.makedirs(control_dir, mode=0o700, exist_ok=True)
+
+    def ansible_env(self) -> Dict[str, str]:
+        """Ansible SSH连接插件的配置, 以环境变量形式传给引擎工作进程和CLI子进程"""
+        return {
+            "ANSIBLE_PIPELINING": "True" if self.pipelining else "False",
+            "ANSIBLE_SSH_ARGS": f"-C -o ControlMaster=auto -o ControlPersist={self.persist}s",
+            "ANSIBLE_SSH_CONTROL_PATH_DIR": self.control_dir,
+            # %(directory)s由ansible替换, %%h/%%p/%%r由ssh替换为主机/端口/用户
+            "ANSIBLE_SSH_CONTROL_PATH": "%(directory)s/%%h-%%p-%%r"
+        }
+
+    def socket_path(self, address: str, port: int, user: str) -> str:
+        return os.path.join(self.control_dir, f"{address}-{port}-{user}")
+
+    @staticmethod
+    def is_alive(path: str) -> bool:
+        """主连接进程是否仍在监听控制socket"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    def track(self, targets: Iterable[Dict[str, Any]]):
+        """在一次执行前记录目标主机的连接复用情况
+
+        targets为主机的连接参数(address/port/user), 已有存活主连接的计为复用, 否则计为新建连接。
+        """
+        now = time.time()
+        reused = opened = 0
+        for target in targets:
+            path = self.socket_path(target["address"], target["port"], target["user"])
+            if self.is_alive(path):
+                reused += 1
+            else:
+                opened += 1
+            with self._lock:
+                self._last_used[path] = now
+        with self._lock:
+            self._counters["runs"] += 1
+            self._counters["reused"] += reused
+            self._counters["opened"] += opened
+        return reused, opened
+
+    def targets(self, inventory, hosts: List[str]) -> List[Dict[str, Any]]:
+        """从inventory变量计算主机的SSH连接参数, 跳过非SSH连接的主机"""
+        targets = []
+        for host in hosts:
+            host_vars = inventory.host_vars(host)
+            if host_vars.get('ansible_connection', 'ssh') not in ('ssh', 'smart'):
+                continue
+            port = host_vars.get('ansible_port') or host_vars.get('ansible_ssh_port') or '22'
+            targets.append({
+                "address": host_vars.get('ansible_host') or host,
+                "port": int(port) if str(port).isdigit() else 22,
+                "user": host_vars.get('ansible_user') or host_vars.get('ansible_ssh_user') or self.default_user
+            })
+        return targets
+
+    def masters(self) -> List[str]:
+        try:
+            names = os.listdir(self.control_dir)
+        except OSError:
+            return []
+        return [os.path.join(self.control_dir, name) for name in names]
+
+    def _close_master(self, path: str):
+        """通知主连接进程退出; ssh的主机参数在指定ControlPath时不会被使用"""
+        try:
+            subprocess.run(
+                ["ssh", "-O", "exit", "-o", f"ControlPath={path}", "dashboard-master"],
+                capture_output=True, timeout=5
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"关闭SSH主连接失败 {path}: {e}")
+
+    def reap(self) -> Dict[str, int]:
+        """删除失效的socket, 主连接数超过上限时关闭最久未使用的连接"""
+        alive = []
+        reaped = 0
+        for path in self.masters():
+            if self.is_alive(path):
+                alive.append(path)
+                continue
+            try:
+                os.unlink(path)
+                reaped += 1
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    logger.warning(f"删除失效的SSH控制socket失败 {path}: {e}")
+
+        evicted = 0
+        if len(alive) > self.max_masters:
+            with self._lock:
+                alive.sort(key=lambda p: self._last_used.get(p, 0))
+            for path in alive[:len(alive) - self.max_masters]:
+                self._close_master(path)
+                evicted += 1
+
+        with self._lock:
+            live = set(alive)
+            self._last_used = {p: t for p, t in self._last_used.items() if p in live}
+            self._counters["reaped"] += reaped
+            self._counters["evicted"] += evicted
+        return {"alive": len(alive) - evicted, "reaped": reaped, "evicted": evicted}
+
+    def ensure_started(self):
+        """启动清理线程(重复调用无副作用)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name="ssh-reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _loop(self):
+        while not self._stopped.wait(self.reap_interval):
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"清理SSH主连接失败: {e}")
+
+    def counters(self) -> Dict[str, int]:
+        """累计计数(不检查主连接是否存活, 开销很小)"""
+        with self._lock:
+            return dict(self._counters)
+
+    def stats(self) -> Dict[str, Any]:
+        masters = self.masters()
+        counters = self.counters()
+        total = counters["reused"] + counters["opened"]
+        return {
+            "control_dir": self.control_dir,
+            "persist": self.persist,
+            "pipelining": self.pipelining,
+            "max_masters": self.max_masters,
+            "masters": sum(1 for path in masters if self.is_alive(path)),
+            "host_connections": total,
+            "reuse_ratio": round(counters["reused"] / total, 4) if total else None,
+            **counters
+        }
@@ -0,0 +1,260 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶(秒), 覆盖从毫秒级的接口到数分钟的playbook
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """callback不为空时在导出时调用, 返回{标签值元组: 值}, 用于直接导出其他模块已有的统计"""
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), callback=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.callback:
+            try:
+                values = self.callback()
+            except Exception as e:
+                logger.error(f"指标{self.name}读取失败: {e}")
+                values = {}
+            with self._lock:
+                self._values = {tuple(str(v) for v in key): value for key, value in values.items()}
+        with self._lock:
+            return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames),
+                    "values": [[list(key), value] for key, value in self._values.items()]}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [每个分桶的计数(不累加)..., +Inf分桶计数, 总和]
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        data["values"] = [[key, list(value)] for key, value in data["values"]]
+        return data
+
+
+class Registry:
+    """进程内的指标注册表, 以Prometheus文本格式导出
+
+    记录一次指标只是一次字典查找加一把锁, 可以在生产环境常开。多进程部署时每个进程
+    定期把snapshot()写入共享存储, 导出时用merge()把所有进程的数据相加。
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames=(), callback=None) -> Counter:
+        return self._register(Counter(name, help_text, labelnames, callback))
+
+    def gauge(self, name: str, help_text: str, labelnames=(), callback=None) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames, callback))
+
+    def histogram(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """把多个进程的快照相加(计数器、直方图和gauge都按标签求和)"""
+        merged = {}
+        for snapshot in snapshots:
+            for name, data in snapshot.items():
+                target = merged.setdefault(name, dict(data, values={}))
+                for key, value in data["values"]:
+                    key = tuple(key)
+                    if data["kind"] == 'histogram':
+                        current = target["values"].get(key)
+                        target["values"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        target["values"][key] = target["values"].get(key, 0) + value
+        for data in merged.values():
+            data["values"] = [[list(key), value] for key, value in data["values"].items()]
+        return merged
+
+    @staticmethod
+    def render(snapshot: Dict[str, Dict[str, Any]]) -> str:
+        lines = []
+        for name in sorted(snapshot):
+            data = snapshot[name]
+            names = tuple(data["labelnames"])
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['kind']}")
+            for key, value in sorted(data["values"]):
+                key = tuple(key)
+                if data["kind"] != 'histogram':
+                    lines.append(f"{name}{_format_labels(names, key)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(data["buckets"]) + [float('inf')], value[:-1]):
+                    cumulative += count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{name}_bucket{_format_labels(names, key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(names, key)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(names, key)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+class SnapshotPublisher:
+    """多工作进程部署时汇总各进程的指标
+
+    每个进程每interval秒把自己的快照写入SharedState(键为metrics:<pid>);
+    导出时用本进程的实时快照加上其他进程最近写入的快照, 超过3个周期未更新的进程视为已退出。
+    """
+
+    def __init__(self, registry: 'Registry', shared, interval: float = 10):
+        self.registry = registry
+        self.shared = shared
+        self.interval = interval
+        self.key = f"metrics:{os.getpid()}"
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            # gunicorn在fork之后调用, 这里的pid才是工作进程自己的
+            self.key = f"metrics:{os.getpid()}"
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name="metrics-publisher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        try:
+            self.shared.delete(self.key)
+        except Exception as e:
+            logger.error(f"清理指标快照失败: {e}")
+
+    def publish(self):
+        try:
+            self.shared.put(self.key, self.registry.snapshot())
+        except Exception as e:
+            logger.error(f"写入指标快照失败: {e}")
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            self.publish()
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """本进程的实时快照与其他存活进程的快照合并"""
+        snapshots = [self.registry.snapshot()]
+        cutoff = time.time() - self.interval * 3
+        try:
+            for key, value, updated_at in self.shared.scan("metrics:"):
+                if key != self.key and updated_at >= cutoff:
+                    snapshots.append(value)
+        except Exception as e:
+            logger.error(f"读取指标快照失败: {e}")
+        return Registry.merge(snapshots)
+
+
+# 全局注册表, 各模块在导入时注册自己的指标
+registry = Registry()
+
+ANSIBLE_DURATION = registry.histogram(
+    'dashboard_ansible_duration_seconds', 'Ansible ad-hoc命令/playbook的执行耗时',
+    ('kind', 'name', 'mode')
+)
+ANSIBLE_RUNS = registry.counter(
+    'dashboard_ansible_runs_total', 'Ansible执行次数, 按返回码统计', ('kind', 'name', 'mode', 'return_code')
+)
+ANSIBLE_HOST_TASK_DURATION = registry.histogram(
+    'dashboard_ansible_host_task_duration_seconds', '单台主机上单个任务的耗时(仅常驻引擎模式)', ('action',)
+)
+ANSIBLE_HOST_RESULTS = registry.counter(
+    'dashboard_ansible_host_results_total', '主机执行结果, 按状态统计', ('kind', 'name', 'status')
+)
+PARSE_DURATION = registry.histogram(
+    'dashboard_parse_duration_seconds', '解析/提取执行结果的耗时', ('parser',),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+)
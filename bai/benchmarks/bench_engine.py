@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""对比每次调用ansible CLI与常驻执行引擎的延迟
+
+用法:
+    python3 benchmarks/bench_engine.py --inventory ansible/hosts --pattern all
+    python3 benchmarks/bench_engine.py --local-hosts 20      # 使用本地连接的模拟主机, 无需SSH
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from utils.ansible_runner import AnsibleRunner  # noqa: E402
+
+
+def write_local_inventory(count: int) -> str:
+    """生成使用local连接的模拟inventory"""
+    fd, path = tempfile.mkstemp(prefix='bench_inventory_')
+    with os.fdopen(fd, 'w') as f:
+        f.write('[managed_hosts]\n')
+        for i in range(count):
+            f.write(f'bench-host-{i} ansible_connection=local ansible_python_interpreter={sys.executable}\n')
+    return path
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "min_ms": round(ordered[0] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2)
+    }
+
+
+def measure(call, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = call()
+        samples.append(time.perf_counter() - start)
+        if not result["success"]:
+            print(f"警告: 执行失败 rc={result['return_code']}: {result['stderr'][:200]}", file=sys.stderr)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='cold CLI vs warm engine 延迟对比')
+    parser.add_argument('--inventory', default='/app/ansible/hosts')
+    parser.add_argument('--local-hosts', type=int, default=0, help='生成N台local连接的模拟主机代替--inventory')
+    parser.add_argument('--pattern', default='all')
+    parser.add_argument('--module', default='ping')
+    parser.add_argument('--args', default='')
+    parser.add_argument('--iterations', type=int, default=5)
+    opts = parser.parse_args()
+
+    inventory = write_local_inventory(opts.local_hosts) if opts.local_hosts else opts.inventory
+
+    cli_runner = AnsibleRunner(inventory, use_engine=False, coalesce=False)
+    engine_runner = AnsibleRunner(inventory, use_engine=True, coalesce=False)
+    if not engine_runner.engine:
+        sys.exit('当前环境无法导入ansible Python API')
+
+    cold = measure(lambda: cli_runner.run_adhoc_command(opts.module, opts.args, opts.pattern), opts.iterations)
+
+    warmup_start = time.perf_counter()
+    engine_runner.run_adhoc_command(opts.module, opts.args, opts.pattern)
+    warmup = time.perf_counter() - warmup_start
+    warm = measure(lambda: engine_runner.run_adhoc_command(opts.module, opts.args, opts.pattern), opts.iterations)
+    engine_runner.engine.shutdown()
+
+    report = {
+        "inventory": inventory,
+        "pattern": opts.pattern,
+        "module": opts.module,
+        "hosts": len(cli_runner.get_inventory_hosts()),
+        "cold_cli": summarize(cold),
+        "warm_engine": summarize(warm),
+        "engine_warmup_ms": round(warmup * 1000, 2),
+        "speedup": round(statistics.median(cold) / statistics.median(warm), 2)
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if opts.local_hosts:
+        os.remove(inventory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""对比控制节点直接分发与树形分发的耗时和控制节点出口流量
+
+用Docker容器模拟目标主机(ubuntu:20.04 + sshd + python3), 容器挂在独立的bridge网络上;
+控制节点的出口流量从bridge网卡的tx_bytes计算。--egress-rate可以用tc限制控制节点
+到容器的带宽, 模拟上行链路成为瓶颈的情况(需要root)。
+
+用法:
+    python3 benchmarks/bench_fanout.py --hosts 12 --size-mb 50 --width 3
+    python3 benchmarks/bench_fanout.py --hosts 24 --size-mb 80 --width 4 --egress-rate 200mbit
+需要: docker、sshpass, 以及可以导入ansible的Python环境。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from utils.ansible_runner import AnsibleRunner  # noqa: E402
+from utils.fanout import FanoutDistributor  # noqa: E402
+from utils.artifact_store import sha256_file  # noqa: E402
+
+IMAGE = 'ansible-dashboard-bench-target'
+NETWORK = 'ansible-dashboard-bench'
+PASSWORD = 'password'
+PLAYBOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ansible', 'playbooks')
+
+DOCKERFILE = f"""
+FROM ubuntu:20.04
+RUN apt-get update && DEBIAN_FRONTEND=noninteractive apt-get install -y openssh-server python3 && \\
+    mkdir -p /var/run/sshd && echo 'root:{PASSWORD}' | chpasswd && \\
+    sed -i 's/#PermitRootLogin prohibit-password/PermitRootLogin yes/' /etc/ssh/sshd_config
+CMD ["/usr/sbin/sshd", "-D"]
+"""
+
+
+def docker(*args, capture=True):
+    result = subprocess.run(['docker', *args], capture_output=capture, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"docker {' '.join(args)} 失败: {result.stderr}")
+    return result.stdout.strip() if capture else ''
+
+
+def start_targets(count: int):
+    """构建镜像并启动count个容器, 返回[(容器ID, IP)]和bridge网卡名"""
+    subprocess.run(['docker', 'build', '-t', IMAGE, '-'], input=DOCKERFILE, text=True, check=True)
+    network_id = docker('network', 'create', NETWORK)
+    bridge = f"br-{network_id[:12]}"
+    containers = []
+    for i in range(count):
+        cid = docker('run', '-d', '--rm', '--network', NETWORK, '--name', f'{NETWORK}-{i}', IMAGE)
+        ip = docker('inspect', '-f', '{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}', cid)
+        containers.append((cid, ip))
+    return containers, bridge
+
+
+def stop_targets(containers):
+    for cid, _ in containers:
+        subprocess.run(['docker', 'rm', '-f', cid], capture_output=True)
+    subprocess.run(['docker', 'network', 'rm', NETWORK], capture_output=True)
+
+
+def write_inventory(containers) -> str:
+    fd, path = tempfile.mkstemp(prefix='bench_fanout_inventory_')
+    with os.fdopen(fd, 'w') as f:
+        f.write('[bench]\n')
+        for _, ip in containers:
+            f.write(f'{ip} ansible_user=root ansible_ssh_pass={PASSWORD} '
+                    f'ansible_ssh_common_args="-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"\n')
+    return path
+
+
+def tx_bytes(interface: str) -> int:
+    with open(f'/sys/class/net/{interface}/statistics/tx_bytes') as f:
+        return int(f.read())
+
+
+def measure(label, interface, hosts, reset, call):
+    """清理目标文件后执行call, 返回耗时和控制节点出口字节数"""
+    reset()
+    before = tx_bytes(interface)
+    start = time.perf_counter()
+    ok = call()
+    elapsed = time.perf_counter() - start
+    sent = tx_bytes(interface) - before
+    return {
+        "mode": label,
+        "success": ok,
+        "seconds": round(elapsed, 2),
+        "controller_egress_mb": round(sent / 1024 ** 2, 2),
+        "hosts": len(hosts)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='直接分发 vs 树形分发')
+    parser.add_argument('--hosts', type=int, default=12, help='模拟主机(容器)数量')
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--width', type=int, default=3, help='树形分发宽度')
+    parser.add_argument('--egress-rate', default='', help='限制控制节点出口带宽, 如200mbit(需要root)')
+    parser.add_argument('--keep', action='store_true', help='结束后保留容器')
+    opts = parser.parse_args()
+
+    containers, bridge = start_targets(opts.hosts)
+    inventory = write_inventory(containers)
+    fd, payload = tempfile.mkstemp(prefix='bench_fanout_payload_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(opts.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        digest = sha256_file(payload)
+        if opts.egress_rate:
+            subprocess.run(['tc', 'qdisc', 'replace', 'dev', bridge, 'root', 'tbf',
+                            'rate', opts.egress_rate, 'burst', '256kb', 'latency', '50ms'], check=True)
+
+        runner = AnsibleRunner(inventory, coalesce=False)
+        runner.playbook_dir = PLAYBOOK_DIR
+        if runner.engine:
+            runner.engine.playbook_dir = PLAYBOOK_DIR
+        hosts = runner.inventory.match('all')
+        dest = '/tmp/bench_fanout.bin'
+        timeout = 3600
+
+        # 等待sshd就绪
+        for _ in range(30):
+            if runner.run_adhoc_command('ping', hosts='all', timeout=60)["success"]:
+                break
+            time.sleep(2)
+
+        def reset():
+            runner.run_adhoc_command('file', f'path={dest} state=absent', 'all', timeout=timeout)
+
+        direct = measure('direct', bridge, hosts, reset, lambda: runner.run_adhoc_command(
+            'copy', f'src={payload} dest={dest} mode=0644', 'all', timeout=timeout
+        )["success"])
+        distributor = FanoutDistributor(runner, width=opts.width)
+        fanout = measure(f'fanout(width={opts.width})', bridge, hosts, reset, lambda: distributor.distribute(
+            payload, digest, hosts, dest, timeout=timeout
+        )["success"])
+
+        print(json.dumps({
+            "size_mb": opts.size_mb,
+            "egress_rate": opts.egress_rate or None,
+            "results": [direct, fanout],
+            "egress_ratio": round(fanout["controller_egress_mb"] / max(direct["controller_egress_mb"], 0.01), 3),
+            "speedup": round(direct["seconds"] / max(fanout["seconds"], 0.01), 2)
+        }, indent=2, ensure_ascii=False))
+        if runner.engine:
+            runner.engine.shutdown()
+    finally:
+        os.remove(payload)
+        os.remove(inventory)
+        if not opts.keep:
+            stop_targets(containers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""对比旧版资源采集(收集facts + 4个shell任务)与resource_probe模块的单轮采集耗时
+
+旧版playbook内嵌在本脚本中; 新版直接使用ansible/playbooks/resource_monitor.yml。
+每轮耗时除以主机数即为每台主机的采集成本。
+
+用法:
+    python3 benchmarks/bench_probe.py --inventory ansible/hosts --rounds 5
+    python3 benchmarks/bench_probe.py --local-hosts 20      # 使用本地连接的模拟主机, 无需SSH
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from utils.ansible_runner import AnsibleRunner  # noqa: E402
+from utils.resource_collector import extract_resource_stats  # noqa: E402
+
+PLAYBOOK_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ansible', 'playbooks'))
+
+LEGACY_PLAYBOOK = """
+- name: 收集主机资源信息(旧版)
+  hosts: all
+  gather_facts: yes
+  tasks:
+    - shell: top -bn1 | grep "Cpu(s)" | awk '{print $2}' | awk -F'%' '{print $1}'
+      register: cpu_usage
+    - shell: free -m | awk 'NR==2{printf "%.2f", $3*100/$2 }'
+      register: memory_usage
+    - shell: df -h | awk '$NF=="/"{printf "%s", $5}' | sed 's/%//'
+      register: disk_usage
+    - shell: uptime | awk -F'load average:' '{print $2}' | awk '{print $1}' | sed 's/,//'
+      register: load_average
+    - set_stats:
+        per_host: yes
+        aggregate: no
+        data:
+          cpu: "{{ cpu_usage.stdout }}"
+          memory: "{{ memory_usage.stdout }}"
+          disk: "{{ disk_usage.stdout }}"
+          load: "{{ load_average.stdout }}"
+"""
+
+
+def write_local_inventory(count: int) -> str:
+    """生成使用local连接的模拟inventory"""
+    fd, path = tempfile.mkstemp(prefix='bench_inventory_')
+    with os.fdopen(fd, 'w') as f:
+        f.write('[managed_hosts]\n')
+        for i in range(count):
+            f.write(f'bench-host-{i} ansible_connection=local ansible_python_interpreter={sys.executable}\n')
+    return path
+
+
+def measure(runner, playbook: str, rounds: int, hosts: int):
+    samples = []
+    remote_tasks = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = runner.run_playbook(playbook, structured=True)
+        samples.append(time.perf_counter() - start)
+        if not result["success"]:
+            print(f"警告: 执行失败 rc={result['return_code']}: {result['stderr'][:200]}", file=sys.stderr)
+        # set_stats在控制节点执行, 不计入远程调用
+        remote_tasks = max((sum(1 for task in entry["tasks"] if task["action"] != "set_stats")
+                            for entry in result.get("host_results", {}).values()), default=0)
+    median = statistics.median(samples)
+    return {
+        "rounds": rounds,
+        "p50_round_ms": round(median * 1000, 2),
+        "mean_round_ms": round(statistics.mean(samples) * 1000, 2),
+        "per_host_ms": round(median * 1000 / max(hosts, 1), 2),
+        "remote_tasks_per_host": remote_tasks
+    }, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='资源采集单轮耗时: 旧版shell任务 vs resource_probe')
+    parser.add_argument('--inventory', default='/app/ansible/hosts')
+    parser.add_argument('--local-hosts', type=int, default=0, help='生成N台local连接的模拟主机代替--inventory')
+    parser.add_argument('--rounds', type=int, default=5)
+    opts = parser.parse_args()
+
+    inventory = write_local_inventory(opts.local_hosts) if opts.local_hosts else opts.inventory
+    fd, legacy = tempfile.mkstemp(prefix='bench_legacy_monitor_', suffix='.yml')
+    with os.fdopen(fd, 'w') as f:
+        f.write(LEGACY_PLAYBOOK)
+
+    runner = AnsibleRunner(inventory, coalesce=False)
+    runner.playbook_dir = PLAYBOOK_DIR
+    if runner.engine:
+        runner.engine.playbook_dir = PLAYBOOK_DIR
+    hosts = len(runner.get_inventory_hosts())
+    try:
+        # 预热引擎进程和SSH主连接, 两种方式在相同条件下比较
+        runner.run_adhoc_command("ping")
+        before, _ = measure(runner, legacy, opts.rounds, hosts)
+        after, result = measure(runner, "resource_monitor.yml", opts.rounds, hosts)
+        sample = extract_resource_stats(result)
+        report = {
+            "inventory": inventory,
+            "hosts": hosts,
+            "legacy": before,
+            "probe": after,
+            "speedup": round(before["p50_round_ms"] / max(after["p50_round_ms"], 0.01), 2),
+            "probe_metrics": sorted(k for k in sample[0] if k not in ("host", "probe")) if sample else []
+        }
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    finally:
+        if runner.engine:
+            runner.engine.shutdown()
+        os.remove(legacy)
+        if opts.local_hosts:
+            os.remove(inventory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""对比关闭/开启SSH连接复用(ControlMaster + pipelining)时每轮资源采集的耗时
+
+每种模式各执行--polls轮采集(默认resource_monitor.yml), 模拟后台资源采集的周期性调用;
+开启复用时第一轮需要建立主连接, 之后各轮复用已有连接, 报告中分开统计。
+需要可以通过SSH访问的主机, local连接的主机不经过SSH, 测不出差别。
+
+用法:
+    python3 benchmarks/bench_ssh_mux.py --inventory ansible/hosts --polls 5
+    python3 benchmarks/bench_ssh_mux.py --inventory ansible/hosts --module ping --pattern managed_hosts
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from utils.ansible_runner import AnsibleRunner  # noqa: E402
+
+# 关闭复用: 每个任务重新建立SSH连接, 并且模块传输和执行分开进行
+NO_REUSE_ENV = {
+    "SSH_MULTIPLEX": "0",
+    "ANSIBLE_SSH_ARGS": "-C -o ControlMaster=no",
+    "ANSIBLE_PIPELINING": "False"
+}
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "min_ms": round(min(samples) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2)
+    }
+
+
+def run_polls(opts, env):
+    """在给定环境变量下创建runner并执行opts.polls轮, 返回每轮耗时和连接统计"""
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        runner = AnsibleRunner(opts.inventory, use_engine=not opts.cli, coalesce=False)
+        if runner.engine:
+            runner.engine.start()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    samples = []
+    try:
+        for _ in range(opts.polls):
+            start = time.perf_counter()
+            if opts.module:
+                result = runner.run_adhoc_command(opts.module, opts.args, opts.pattern)
+            else:
+                runner.playbook_dir = opts.playbook_dir
+                result = runner.run_playbook(opts.playbook, structured=True)
+            samples.append(time.perf_counter() - start)
+            if not result["success"]:
+                print(f"警告: 执行失败 rc={result['return_code']}: {result['stderr'][:200]}", file=sys.stderr)
+            time.sleep(opts.interval)
+        stats = runner.ssh_pool.stats() if runner.ssh_pool else None
+        hosts = len(runner.inventory.match(opts.pattern))
+    finally:
+        if runner.engine:
+            runner.engine.shutdown()
+    return samples, stats, hosts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SSH连接复用对周期性采集耗时的影响')
+    parser.add_argument('--inventory', default='/app/ansible/hosts')
+    parser.add_argument('--playbook', default='resource_monitor.yml')
+    parser.add_argument('--playbook-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              '..', 'ansible', 'playbooks'))
+    parser.add_argument('--module', default='', help='改为执行ad-hoc模块(如ping), 不指定时执行--playbook')
+    parser.add_argument('--args', default='')
+    parser.add_argument('--pattern', default='all')
+    parser.add_argument('--polls', type=int, default=5)
+    parser.add_argument('--interval', type=float, default=1.0, help='两轮之间的间隔(秒), 需小于ControlPersist')
+    parser.add_argument('--cli', action='store_true', help='使用CLI而不是常驻引擎')
+    opts = parser.parse_args()
+
+    control_dir = tempfile.mkdtemp(prefix='bench_ssh_')
+    try:
+        off, _, hosts = run_polls(opts, NO_REUSE_ENV)
+        on, stats, _ = run_polls(opts, {"SSH_MULTIPLEX": "1", "SSH_CONTROL_DIR": control_dir})
+    finally:
+        shutil.rmtree(control_dir, ignore_errors=True)
+
+    warm = on[1:]
+    report = {
+        "inventory": opts.inventory,
+        "target": opts.module or opts.playbook,
+        "hosts": hosts,
+        "no_reuse": summarize(off),
+        "multiplexed_first_poll_ms": round(on[0] * 1000, 2) if on else None,
+        "multiplexed_warm": summarize(warm),
+        "connection_stats": stats
+    }
+    if off and warm:
+        saved = statistics.median(off) - statistics.median(warm)
+        report["saved_per_poll_ms"] = round(saved * 1000, 2)
+        report["saved_per_host_ms"] = round(saved * 1000 / max(hosts, 1), 2)
+        report["speedup"] = round(statistics.median(off) / statistics.median(warm), 2)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
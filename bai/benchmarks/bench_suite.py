@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""后端热点路径的基准测试套件, 使用模拟主机群(10 ~ 10000台)
+
+三类测试, 结果统一输出为JSON, 可用--output保存、--baseline与之前的结果比较:
+
+- parse: inventory解析与查询、ping/资源结果的提取、网络信息的合并与增量查询、JSON callback输出的解析,
+  输入由fleet.py按主机数和固定随机种子生成, 不需要Ansible和目标主机
+- endpoints: 在进程内(Flask测试客户端)请求主要接口, 统计吞吐量和延迟分位数;
+  inventory替换为模拟主机群, 资源快照由模拟的采集结果填充
+- e2e: 通过AnsibleRunner真实执行ping/resource_monitor.yml/network_scan.yml,
+  目标为--local-hosts生成的local连接主机, 或--inventory指定的主机(如本地的SSH容器)
+
+用法:
+    python3 benchmarks/bench_suite.py --sizes 10,100,1000,10000 --output results/v1.json
+    python3 benchmarks/bench_suite.py --baseline results/v1.json --tolerance 0.2   # 有退化时返回码为1
+    python3 benchmarks/bench_suite.py --only e2e --local-hosts 20 --rounds 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'backend'))
+sys.path.insert(0, BENCH_DIR)
+
+import fleet  # noqa: E402
+from utils.inventory import Inventory  # noqa: E402
+from utils.ansible_results import from_json_callback  # noqa: E402
+from utils.resource_collector import extract_resource_stats  # noqa: E402
+from utils.network_inventory import NetworkInventory  # noqa: E402
+
+PLAYBOOK_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'ansible', 'playbooks'))
+SUITES = ('parse', 'endpoints', 'e2e')
+
+
+def timed(fn, repeat: int, setup=None):
+    """执行repeat次, 返回每次的耗时(秒); setup的耗时不计入"""
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def case(name: str, hosts: int, samples, **extra):
+    median = statistics.median(samples)
+    return dict({
+        "name": name,
+        "hosts": hosts,
+        "repeat": len(samples),
+        "median_ms": round(median * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "per_host_us": round(median * 1e6 / max(hosts, 1), 3)
+    }, **extra)
+
+
+def repeat_for(hosts: int, base: int) -> int:
+    """主机数越多重复次数越少, 每项测试的总耗时大致相同"""
+    return max(3, min(base, base * 100 // max(hosts, 1)))
+
+
+def bench_parse(sizes, repeat: int, workdir: str):
+    from utils.ansible_runner import AnsibleRunner
+    ping_results = AnsibleRunner.ping_results
+
+    results = []
+    for hosts in sizes:
+        n = repeat_for(hosts, repeat)
+        path = fleet.write_inventory(hosts, workdir)
+        # 每次使用新的Inventory对象, 测量冷启动解析; 之后的查询使用已解析的索引
+        results.append(case("inventory_parse", hosts, timed(lambda inv: inv.hosts(), n, lambda: Inventory(path))))
+        inventory = Inventory(path)
+        inventory.hosts()
+        results.append(case("inventory_hosts_json", hosts, timed(inventory.hosts_json, n)))
+        results.append(case("inventory_match_group", hosts, timed(lambda: inventory.match('webservers:databases'), n)))
+
+        ping = fleet.ping_result(hosts)
+        results.append(case("ping_results", hosts, timed(lambda: ping_results(None, ping), n)))
+        ping_text = fleet.json_callback_output(ping)
+        results.append(case("json_callback_ping", hosts, timed(lambda: from_json_callback(ping_text), n),
+                            input_bytes=len(ping_text)))
+
+        first = fleet.resource_result(hosts, now=1000.0)
+        second = fleet.resource_result(hosts, now=1030.0, previous=first)
+        previous = {host: stats["probe"] for host, stats in first["custom_stats"].items()}
+        results.append(case("resource_extract", hosts, timed(lambda: extract_resource_stats(second, previous), n)))
+        resource_text = fleet.json_callback_output(second)
+        results.append(case("json_callback_resources", hosts,
+                            timed(lambda: from_json_callback(resource_text), n), input_bytes=len(resource_text)))
+
+        network = fleet.network_result(hosts)
+        targets = list(network["host_results"])
+        # 首次合并(全部主机都有变化)与配置未变时的再次合并
+        results.append(case("network_apply", hosts, timed(lambda inv: inv._apply(network, targets, True), n,
+                                                          lambda: NetworkInventory(None))))
+        network_inventory = NetworkInventory(None)
+        network_inventory._apply(network, targets, True)
+        results.append(case("network_reapply", hosts, timed(lambda: network_inventory._apply(network, targets, True), n)))
+        as_of = network_inventory.view()["as_of"]
+        results.append(case("network_view_since", hosts, timed(lambda: network_inventory.view(since=as_of), n)))
+        os.remove(path)
+    return results
+
+
+class FixtureRunner:
+    """代替AnsibleRunner返回模拟的资源采集结果, 每次调用时间前进30秒"""
+
+    def __init__(self, hosts: int):
+        self.hosts = hosts
+        self.result = None
+        self.now = time.time() - 60
+
+    def run_playbook(self, playbook_name, **kwargs):
+        self.now += 30
+        self.result = fleet.resource_result(self.hosts, self.now, self.result)
+        return self.result
+
+
+def bench_endpoints(sizes, requests: int, workdir: str):
+    import app as dashboard
+
+    client = dashboard.app.test_client()
+    token = client.post('/api/login', json={"username": "admin", "password": "admin123"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    results = []
+    for hosts in sizes:
+        path = fleet.write_inventory(hosts, workdir)
+        # 所有路由共用同一个Inventory对象, 改变路径后下次读取时按新文件重新解析
+        dashboard.inventory.path = path
+        dashboard.inventory.invalidate()
+        dashboard.ansible_runner.inventory_path = path
+        collector = dashboard.resource_collector
+        collector.runner = FixtureRunner(hosts)
+        collector.collect_once()
+        collector.collect_once()
+        first = fleet.host_names(hosts)[0]
+        for route in ('/api/hosts', f'/api/hosts/{first}', '/api/resources', '/api/jobs', '/metrics'):
+            # 第一次请求包含inventory解析等一次性开销, 不计入
+            client.get(route, headers=headers).get_data()
+            samples = []
+            statuses = set()
+            for _ in range(repeat_for(hosts, requests)):
+                start = time.perf_counter()
+                response = client.get(route, headers=headers)
+                response.get_data()
+                samples.append(time.perf_counter() - start)
+                statuses.add(response.status_code)
+            ordered = sorted(samples)
+            name = route.replace(first, '<host_ip>')
+            results.append(case(f"GET {name}", hosts, samples, statuses=sorted(statuses),
+                                rps=round(len(samples) / sum(samples), 1),
+                                p99_ms=round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+                                response_bytes=len(response.get_data())))
+        os.remove(path)
+    collector.stop()
+    return results
+
+
+def bench_e2e(inventory: str, rounds: int):
+    from utils.ansible_runner import AnsibleRunner
+
+    runner = AnsibleRunner(inventory, coalesce=False)
+    runner.playbook_dir = PLAYBOOK_DIR
+    if runner.engine:
+        runner.engine.playbook_dir = PLAYBOOK_DIR
+    hosts = len(runner.get_inventory_hosts())
+    calls = {
+        "e2e_adhoc_ping": lambda: runner.run_adhoc_command("ping", structured=True),
+        "e2e_resource_monitor": lambda: runner.run_playbook("resource_monitor.yml", structured=True),
+        "e2e_network_scan": lambda: runner.run_playbook("network_scan.yml", structured=True)
+    }
+    results = []
+    try:
+        # 预热引擎进程和SSH主连接
+        runner.run_adhoc_command("ping")
+        for name, call in calls.items():
+            samples = []
+            failed = 0
+            for _ in range(rounds):
+                start = time.perf_counter()
+                result = call()
+                samples.append(time.perf_counter() - start)
+                failed += not result["success"]
+            results.append(case(name, hosts, samples, failed_rounds=failed,
+                                mode='engine' if runner.engine else 'cli'))
+    finally:
+        if runner.engine:
+            runner.engine.shutdown()
+    return results
+
+
+def metadata():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                  capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = ''
+    return {
+        "revision": revision or None,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def compare(results, baseline_path: str, tolerance: float):
+    """按(测试名, 主机数)与基线比较中位数, 变慢超过tolerance比例的记为退化"""
+    with open(baseline_path) as f:
+        baseline = {(item["name"], item["hosts"]): item for item in json.load(f)["results"]}
+    regressions = []
+    for item in results:
+        before = baseline.get((item["name"], item["hosts"]))
+        if not before or not before["median_ms"]:
+            continue
+        ratio = item["median_ms"] / before["median_ms"]
+        item["baseline_ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append({"name": item["name"], "hosts": item["hosts"], "ratio": round(ratio, 3),
+                                "baseline_ms": before["median_ms"], "median_ms": item["median_ms"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='后端热点路径基准测试(模拟主机群)')
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='模拟主机数, 逗号分隔')
+    parser.add_argument('--only', action='append', choices=SUITES, help='只运行指定的测试类别, 可重复')
+    parser.add_argument('--repeat', type=int, default=50, help='解析测试在100台主机时的重复次数, 随主机数缩放')
+    parser.add_argument('--requests', type=int, default=200, help='接口测试在100台主机时每个接口的请求数')
+    parser.add_argument('--local-hosts', type=int, default=10, help='e2e测试生成N台local连接的模拟主机')
+    parser.add_argument('--inventory', help='e2e测试使用的inventory(如本地SSH容器), 代替--local-hosts')
+    parser.add_argument('--rounds', type=int, default=3, help='e2e测试每项的执行轮数')
+    parser.add_argument('--output', help='把结果写入JSON文件')
+    parser.add_argument('--baseline', help='与之前保存的结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='中位数变慢超过该比例记为退化')
+    opts = parser.parse_args()
+
+    sizes = [int(size) for size in opts.sizes.split(',') if size]
+    suites = opts.only or ['parse', 'endpoints']
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    results = []
+    if 'parse' in suites:
+        results += bench_parse(sizes, opts.repeat, workdir)
+    if 'endpoints' in suites:
+        results += bench_endpoints(sizes, opts.requests, workdir)
+    if 'e2e' in suites:
+        inventory = opts.inventory or fleet.write_inventory(opts.local_hosts, workdir, local=True)
+        results += bench_e2e(inventory, opts.rounds)
+        if not opts.inventory:
+            os.remove(inventory)
+    os.rmdir(workdir)
+
+    report = {"meta": dict(metadata(), sizes=sizes, suites=suites), "results": results}
+    if opts.baseline:
+        report["regressions"] = compare(results, opts.baseline, opts.tolerance)
+    if opts.output:
+        os.makedirs(os.path.dirname(os.path.abspath(opts.output)), exist_ok=True)
+        with open(opts.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""基准测试用的模拟主机群: 生成inventory和与真实执行结构一致的Ansible输出
+
+所有数据由主机数和随机种子决定, 同样的参数在不同版本之间生成完全相同的输入,
+基准结果才可以相互比较。输出的结构与AnsibleRunner返回的结构化结果一致:
+host_results来自ping/resource_probe任务, custom_stats来自playbook的set_stats。
+"""
+import os
+import sys
+import json
+import random
+import tempfile
+from typing import Dict, List, Any
+
+GROUPS = ('webservers', 'databases', 'cache', 'workers')
+
+
+def host_names(count: int) -> List[str]:
+    """10.x.y.z形式的主机名(与inventory中直接使用IP的习惯一致)"""
+    return [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(1, count + 1)]
+
+
+def write_inventory(count: int, directory: str = None, local: bool = False) -> str:
+    """生成count台主机的inventory文件并返回路径
+
+    主机按顺序分到managed_hosts和GROUPS中的一个分组, 带有常见的主机变量;
+    local=True时使用local连接, 可以不依赖SSH真实执行playbook。
+    """
+    fd, path = tempfile.mkstemp(prefix=f'fleet_{count}_', suffix='.ini', dir=directory)
+    names = host_names(count)
+    if local:
+        host_vars = f"ansible_connection=local ansible_python_interpreter={sys.executable}"
+    else:
+        host_vars = "ansible_user=root ansible_port=22"
+    with os.fdopen(fd, 'w') as f:
+        f.write('[managed_hosts]\n')
+        for i, name in enumerate(names):
+            if i % 5 == 0:
+                f.write(f'{name} {host_vars}\n')
+        for g, group in enumerate(GROUPS, start=1):
+            f.write(f'\n[{group}]\n')
+            for i, name in enumerate(names):
+                if i % 5 == g:
+                    f.write(f'{name} {host_vars}\n')
+        f.write('\n[all:vars]\nansible_ssh_common_args="-o StrictHostKeyChecking=no"\n')
+    return path
+
+
+def _task(task: str, action: str, status: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"task": task, "action": action, "status": status, "result": result}
+
+
+def _result(host_results: Dict[str, Dict], custom_stats: Dict[str, Dict], failed: bool) -> Dict[str, Any]:
+    return {
+        "success": not failed,
+        "stdout": "",
+        "stderr": "",
+        "return_code": 4 if failed else 0,
+        "host_results": host_results,
+        "custom_stats": custom_stats
+    }
+
+
+def ping_result(count: int, unreachable: float = 0.02, seed: int = 1) -> Dict[str, Any]:
+    """ad-hoc ping的结构化结果, 约unreachable比例的主机不可达"""
+    rng = random.Random(seed)
+    host_results = {}
+    for name in host_names(count):
+        if rng.random() < unreachable:
+            result = {"msg": f"Failed to connect to the host via ssh: ssh: connect to host {name} port 22: "
+                             "No route to host", "unreachable": True, "changed": False}
+            host_results[name] = {"status": "unreachable", "tasks": [_task("ping", "ping", "unreachable", result)]}
+        else:
+            result = {"ping": "pong", "changed": False}
+            host_results[name] = {"status": "ok", "tasks": [_task("ping", "ping", "ok", result)]}
+    return _result(host_results, {}, any(e["status"] != "ok" for e in host_results.values()))
+
+
+def probe_sample(rng: random.Random, cores: int, now: float, previous: Dict[str, Any] = None) -> Dict[str, Any]:
+    """一次resource_probe采样; 给出previous时计数器在其基础上递增"""
+    def advance(counters):
+        return [value + rng.randint(0, 400) for value in counters]
+
+    if previous:
+        total = advance(previous["cpu"]["total"])
+        core_counters = [advance(core) for core in previous["cpu"]["cores"]]
+        network = {
+            name: {key: value + rng.randint(0, 10 ** 6) for key, value in counters.items()}
+            for name, counters in previous["network"].items()
+        }
+    else:
+        total = [rng.randint(10 ** 5, 10 ** 7) for _ in range(8)]
+        core_counters = [[rng.randint(10 ** 4, 10 ** 6) for _ in range(8)] for _ in range(cores)]
+        network = {
+            name: {"rx_bytes": rng.randint(0, 10 ** 12), "rx_packets": rng.randint(0, 10 ** 9),
+                   "tx_bytes": rng.randint(0, 10 ** 12), "tx_packets": rng.randint(0, 10 ** 9)}
+            for name in ("eth0", "eth1", "docker0")
+        }
+    total_kb = rng.choice((4, 8, 16, 64, 256)) * 1024 * 1024
+    disks = []
+    for mount in ("/", "/var", "/data"):
+        size = rng.randint(20, 2000) * 1024 ** 3
+        used = int(size * rng.uniform(0.05, 0.95))
+        disks.append({"mount": mount, "fstype": "ext4", "total": size, "used": used,
+                      "available": int((size - used) * 0.95)})
+    return {
+        "time": now,
+        "cpu": {"total": total, "cores": core_counters},
+        "memory": {"total_kb": total_kb, "available_kb": int(total_kb * rng.uniform(0.1, 0.9)),
+                   "swap_total_kb": 2 * 1024 * 1024, "swap_free_kb": rng.randint(0, 2 * 1024 * 1024)},
+        "load": [round(rng.uniform(0, cores), 2) for _ in range(3)],
+        "disks": disks,
+        "network": network
+    }
+
+
+def resource_result(count: int, now: float, previous: Dict[str, Any] = None, seed: int = 2) -> Dict[str, Any]:
+    """resource_monitor.yml的结构化结果; previous为上一次的结果, 用于生成递增的计数器"""
+    rng = random.Random(seed)
+    host_results = {}
+    custom_stats = {}
+    for name in host_names(count):
+        before = previous["custom_stats"][name]["probe"] if previous else None
+        probe = probe_sample(rng, rng.choice((2, 4, 8, 16, 32)) if not before else len(before["cpu"]["cores"]),
+                             now, before)
+        custom_stats[name] = {"probe": probe}
+        host_results[name] = {"status": "ok", "tasks": [
+            _task("采集资源使用情况", "resource_probe", "ok", {"probe": probe, "changed": False}),
+            _task("汇总资源数据", "set_stats", "ok", {"changed": False})
+        ]}
+    return _result(host_results, custom_stats, False)
+
+
+def network_result(count: int, seed: int = 3) -> Dict[str, Any]:
+    """network_scan.yml的结构化结果"""
+    rng = random.Random(seed)
+    host_results = {}
+    custom_stats = {}
+    for name in host_names(count):
+        custom_stats[name] = {
+            "status": "OK",
+            "ip": [f"{name}/24"] + [f"172.17.{rng.randint(0, 255)}.1/16"] * rng.randint(0, 1),
+            "gateway": name.rsplit('.', 1)[0] + '.1',
+            "dns": ["10.0.0.2", "10.0.0.3"]
+        }
+        host_results[name] = {"status": "ok", "tasks": [
+            _task("采集网络配置", "network_probe", "ok", {"network": {
+                key: custom_stats[name][key] for key in ("ip", "gateway", "dns")}, "changed": False}),
+            _task("汇总网络信息", "set_stats", "ok", {"changed": False})
+        ]}
+    return _result(host_results, custom_stats, False)
+
+
+def json_callback_output(result: Dict[str, Any]) -> str:
+    """把结构化结果转换为ansible.posix.json callback的输出(CLI模式下需要解析的文本)"""
+    tasks = {}
+    for host, entry in result["host_results"].items():
+        for task in entry["tasks"]:
+            item = tasks.setdefault(task["task"], {"task": {"name": task["task"]}, "hosts": {}})
+            data = dict(task["result"], action=task["action"])
+            if task["status"] == 'failed':
+                data["failed"] = True
+            item["hosts"][host] = data
+    return json.dumps({
+        "custom_stats": result["custom_stats"],
+        "global_custom_stats": {},
+        "plays": [{"play": {"name": "bench"}, "tasks": list(tasks.values())}],
+        "stats": {host: {"ok": 1} for host in result["host_results"]}
+    })
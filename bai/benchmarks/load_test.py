@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Web接口压力测试: 每秒请求数和延迟分位数
+
+并发的客户端线程各自保持一个HTTP长连接, 循环请求指定的接口; --slow可以另外启动若干
+线程持续执行耗时的Ansible调用(默认 /api/ping?mode=deep), 用来观察长请求占用工作线程时
+其他接口的尾延迟。对比开发服务器与gunicorn多进程:
+
+    python3 backend/app.py &                                   # 开发服务器
+    python3 benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 32 --slow 4
+    cd backend && gunicorn -c gunicorn.conf.py app:app &       # 多进程
+    python3 benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 32 --slow 4
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+import http.client
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = ['/api/hosts', '/api/resources', '/api/jobs', '/api/facts/stats']
+
+
+class Client:
+    """单个长连接, 连接断开时重连"""
+
+    def __init__(self, url: str, token: str = ''):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.conn = None
+
+    def request(self, method: str, path: str, body=None, timeout: float = 60):
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self.conn = cls(self.host, self.port, timeout=timeout)
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def login(url: str, username: str, password: str) -> str:
+    status, data = Client(url).request('POST', '/api/login', {'username': username, 'password': password})
+    if status != 200:
+        sys.exit(f'登录失败: {status} {data[:200]}')
+    return json.loads(data)['token']
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+
+def summarize(samples, errors, statuses, elapsed):
+    ordered = sorted(samples)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "status_codes": statuses,
+        "rps": round(len(samples) / elapsed, 1),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2) if ordered else None,
+        "p50_ms": percentile(ordered, 0.50),
+        "p90_ms": percentile(ordered, 0.90),
+        "p99_ms": percentile(ordered, 0.99),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else None
+    }
+
+
+def run_clients(url, token, count, paths, deadline):
+    """count个线程轮流请求paths直到deadline, 返回(延迟列表, 错误数, 状态码计数)"""
+    samples = []
+    statuses = {}
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(offset):
+        client = Client(url, token)
+        i = offset
+        local = []
+        local_statuses = {}
+        local_errors = 0
+        while time.time() < deadline:
+            method, _, path = paths[i % len(paths)].rpartition(' ')
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(method or 'GET', path)
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                continue
+            local.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if status >= 500:
+                local_errors += 1
+        with lock:
+            samples.extend(local)
+            errors[0] += local_errors
+            for status, n in local_statuses.items():
+                statuses[str(status)] = statuses.get(str(status), 0) + n
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(count)]
+    return threads, samples, errors, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web接口压力测试')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--concurrency', type=int, default=16, help='快速接口的并发客户端数')
+    parser.add_argument('--duration', type=float, default=20, help='测试时长(秒)')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='请求的接口, 可重复, 格式为"/api/x"或"POST /api/x"; 默认: ' + ', '.join(DEFAULT_PATHS))
+    parser.add_argument('--slow', type=int, default=0, help='同时持续执行慢请求的客户端数')
+    parser.add_argument('--slow-path', default='/api/ping?mode=deep')
+    opts = parser.parse_args()
+
+    token = login(opts.url, opts.username, opts.password)
+    deadline = time.time() + opts.duration
+    fast = run_clients(opts.url, token, opts.concurrency, opts.paths or DEFAULT_PATHS, deadline)
+    slow = run_clients(opts.url, token, opts.slow, [opts.slow_path], deadline)
+
+    start = time.time()
+    for thread in fast[0] + slow[0]:
+        thread.start()
+    for thread in fast[0] + slow[0]:
+        thread.join()
+    elapsed = time.time() - start
+
+    report = {
+        "url": opts.url,
+        "duration_s": round(elapsed, 2),
+        "concurrency": opts.concurrency,
+        "paths": opts.paths or DEFAULT_PATHS,
+        "fast": summarize(fast[1], fast[2][0], fast[3], elapsed)
+    }
+    if opts.slow:
+        report["slow"] = dict(summarize(slow[1], slow[2][0], slow[3], elapsed), path=opts.slow_path,
+                              clients=opts.slow)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,10 @@
 let authToken = null;
 let cpuChart = null;
 let memoryChart = null;
-let refreshInterval = null;
+let eventSource = null;
 let currentHostData = null;
+// 最近一次收到的各主机资源数据, 由事件流增量更新
+const resourceState = new Map();
 
 // DOM元素
 const loginModal = document.getElementById('loginModal');
@@ -50,6 +52,7 @@ async function validateToken(token) {
             hideLoginModal();
             showMainContent();
             loadDashboardData();
+            startEventStream();
         } else {
             // Token无效，清除并显示登录界面
             localStorage.removeItem('authToken');
@@ -157,6 +160,7 @@ async function handleLogin(event) {
             hideLoginModal();
             showMainContent();
             loadDashboardData();
+            startEventStream();
             showNotification('登录成功', 'success');
         } else {
             document.getElementById('loginError').textContent = data.message || '登录失败';
@@ -185,6 +189,7 @@ async function handleLogout() {
     
     authToken = null;
     localStorage.removeItem('authToken');
+    stopEventStream();
     showLoginModal();
     hideMainContent();
     showNotification('已登出', 'info');
@@ -273,33 +278,16 @@ function hideHostDetailModal() {
 }
 
 // 主机状态检测相关变量
-let statusCheckInterval = null;
 let currentCheckingHost = null;
 
 function startHostStatusCheck(hostIp) {
-    // 停止之前的检测
-    stopHostStatusCheck();
-    
     currentCheckingHost = hostIp;
     
-    // 立即执行一次检测
+    // 打开时检测一次, 之后的状态变化由事件流推送
     checkHostStatus(hostIp);
-    
-    // 设置定时检测（每5秒检测一次）
-    statusCheckInterval = setInterval(() => {
-        if (hostDetailModal.style.display === 'flex' && currentCheckingHost === hostIp) {
-            checkHostStatus(hostIp);
-        } else {
-            stopHostStatusCheck();
-        }
-    }, 5000);
 }
 
 function stopHostStatusCheck() {
-    if (statusCheckInterval) {
-        clearInterval(statusCheckInterval);
-        statusCheckInterval = null;
-    }
     currentCheckingHost = null;
 }
 
@@ -366,7 +354,7 @@ function updateHostStatusDisplay(status, rawStatus, responseTime, timestamp) {
     `;
     
     // 添加详细信息作为提示
-    if (responseTime !== undefined) {
+    if (responseTime !== undefined && responseTime !== null) {
         statusContent += `<div class="status-detail">响应: ${responseTime}ms</div>`;
     }
     
@@ -456,15 +444,19 @@ async function loadResourceData(silent = false) {
         if (!silent) {
             showLoading();
         }
-        const response = await fetch('/api/resources');
+        // 手动刷新时让后台采集器立即开始新一轮采集
+        const response = await fetch(silent ? '/api/resources' : '/api/resources?refresh=1');
         const data = await response.json();
         
         if (data.success) {
-            updateResourceData(data.resources);
-            updateCharts(data.resources);
+            applyResourceSnapshot(data.resources);
             
             if (!silent) {
-                showNotification('资源数据更新完成', 'success');
+                if (data.pending) {
+                    showNotification('资源数据采集中，请稍后刷新', 'info');
+                } else {
+                    showNotification(`资源数据更新完成（${Math.round(data.age)}秒前采集）`, 'success');
+                }
             }
         } else {
             if (!silent) {
@@ -796,15 +788,18 @@ function updateResourceData(resources) {
         if (row) {
             // 更新状态列
             const statusCell = row.cells[1];
+            const online = resource.reachable !== false;
             statusCell.innerHTML = `
-                <span class="status-badge status-online">在线</span>
+                <span class="status-badge ${online ? 'status-online' : 'status-offline'}">${online ? '在线' : '离线'}</span>
             `;
+            // 数据超过过期阈值未更新时降低显示亮度
+            row.classList.toggle('resource-stale', Boolean(resource.stale));
             
             // 更新资源信息
-            row.cells[2].innerHTML = createUsageBar(resource.cpu || 'N/A');
-            row.cells[3].innerHTML = createUsageBar(resource.memory || 'N/A');
-            row.cells[4].innerHTML = createUsageBar(resource.disk || 'N/A');
-            row.cells[5].textContent = resource.load || 'N/A';
+            row.cells[2].innerHTML = createUsageBar(resource.cpu ?? 'N/A');
+            row.cells[3].innerHTML = createUsageBar(resource.memory ?? 'N/A');
+            row.cells[4].innerHTML = createUsageBar(resource.disk ?? 'N/A');
+            row.cells[5].textContent = resource.load ?? 'N/A';
         }
     });
 }
@@ -948,24 +943,84 @@ function updateMemoryChart(resources) {
     });
 }
 
-// 自动刷新
-function startAutoRefresh() {
-    if (refreshInterval) {
-        clearInterval(refreshInterval);
+// 实时事件流: 连接时收到完整快照, 之后只收到变化的主机
+function startEventStream() {
+    if (eventSource) {
+        return;
     }
     
-    refreshInterval = setInterval(() => {
-        if (authToken) {
-            loadResourceData(true);
-        }
-    }, 30000); // 30秒刷新一次
+    // 断线后EventSource会自动重连, 重连时服务端重新发送快照
+    eventSource = new EventSource('/api/events');
+    
+    eventSource.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        applyResourceSnapshot(data.resources.resources);
+        data.hosts.forEach(handleHostStatusEvent);
+        (data.power || []).forEach(watch => applyPowerWatch(watch, watch.hosts, false));
+    });
+    
+    eventSource.addEventListener('resources', (event) => {
+        const data = JSON.parse(event.data);
+        data.removed.forEach(host => resourceState.delete(host));
+        data.updated.forEach(resource => resourceState.set(resource.host, resource));
+        updateResourceData(data.updated);
+        updateCharts(collectedResources());
+    });
+    
+    eventSource.addEventListener('host_status', (event) => {
+        handleHostStatusEvent(JSON.parse(event.data));
+    });
+    
+    // 关机跟踪的状态变化(服务端检测)
+    eventSource.addEventListener('power', (event) => {
+        const data = JSON.parse(event.data);
+        applyPowerWatch(data.watch, data.hosts, true);
+    });
+    
+    eventSource.onerror = () => {
+        console.warn('事件流连接中断, 正在重连...');
+    };
+}
+
+function stopEventStream() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+}
+
+function applyResourceSnapshot(resources) {
+    resourceState.clear();
+    resources.forEach(resource => resourceState.set(resource.host, resource));
+    updateResourceData(resources);
+    updateCharts(collectedResources());
+}
+
+function collectedResources() {
+    return Array.from(resourceState.values()).filter(r => r.updated_at);
+}
+
+function handleHostStatusEvent(data) {
+    // 详情窗口打开时同步更新
+    if (hostDetailModal.style.display === 'flex' && currentCheckingHost === data.host) {
+        updateHostStatusDisplay(data.status, data.raw_status, data.response_time,
+            data.timestamp * 1000);
+    }
+    
+    setHostRowStatus(data.host, data.status);
 }
 
-function stopAutoRefresh() {
-    if (refreshInterval) {
-        clearInterval(refreshInterval);
-        refreshInterval = null;
+function setHostRowStatus(hostIp, status) {
+    const row = Array.from(document.querySelectorAll('#hostsTableBody tr'))
+        .find(r => r.cells[0].textContent === hostIp);
+    if (!row) {
+        return;
     }
+    const online = status === 'online';
+    row.cells[1].innerHTML = `
+        <span class="status-badge ${online ? 'status-online' : 'status-offline'}">${online ? '在线' : '离线'}</span>
+    `;
+    updateStatsFromTable();
 }
 
 // 新功能实现
@@ -1104,16 +1159,24 @@ async function handleUpload(event) {
     const hostsValue = selectedHosts.includes('all') ? 'all' : selectedHosts.join(',');
     formData.set('hosts', hostsValue);
     
+    const file = fileInput.files[0];
+    
     try {
-        showUploadProgress();
-        
-        const response = await fetch('/api/upload', {
-            method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            },
-            body: formData
-        });
+        let response;
+        if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+            // 大文件分片上传, 显示真实进度, 断线后自动续传
+            showUploadProgress(false);
+            response = await chunkedUpload(file, hostsValue, formData.get('remote_path'));
+        } else {
+            showUploadProgress();
+            response = await fetch('/api/upload', {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${authToken}`
+                },
+                body: formData
+            });
+        }
         
         const data = await response.json();
         
@@ -1188,8 +1251,11 @@ async function handleShutdown(event) {
             hideShutdownModal();
             showNotification(data.message, 'success');
             
-            // 启动关机后状态监控
-            startShutdownStatusMonitoring(hostsValue, shutdownData.delay);
+            // 关机进度由服务端跟踪, 通过事件流推送; 这里先读取一次, 不依赖事件流是否已连接
+            if (data.watch_id) {
+                showNotification(`将在 ${shutdownData.delay} 分钟后开始确认主机关机状态`, 'monitoring');
+                loadPowerWatch(data.watch_id);
+            }
         } else {
             showNotification('关机失败: ' + data.error, 'error');
         }
@@ -1229,8 +1295,8 @@ async function cancelShutdown() {
         
         if (response.ok) {
             showNotification(data.message, 'success');
-            // 停止关机监控
-            stopShutdownMonitoring();
+            // 服务端已停止跟踪这些主机, 事件流稍后也会推送cancelled状态
+            clearShutdownMarks(data.cancelled_hosts || []);
         } else {
             showNotification('取消关机失败: ' + data.error, 'error');
         }
@@ -1242,11 +1308,104 @@ async function cancelShutdown() {
     }
 }
 
-// 上传进度显示
-function showUploadProgress() {
+// 超过该大小的文件使用分片上传
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const CHUNK_RETRIES = 5;
+
+let crc32Table = null;
+
+// 分片的CRC32校验值(十六进制), 服务端据此丢弃传输中损坏的分片
+function crc32Hex(bytes) {
+    if (!crc32Table) {
+        crc32Table = new Uint32Array(256);
+        for (let i = 0; i < 256; i++) {
+            let c = i;
+            for (let k = 0; k < 8; k++) {
+                c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+            }
+            crc32Table[i] = c >>> 0;
+        }
+    }
+    let crc = 0xFFFFFFFF;
+    for (let i = 0; i < bytes.length; i++) {
+        crc = crc32Table[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+    }
+    return ((crc ^ 0xFFFFFFFF) >>> 0).toString(16).padStart(8, '0');
+}
+
+// 分片上传: init -> 按偏移PUT分片 -> finalize, 返回finalize的响应
+async function chunkedUpload(file, hostsValue, remotePath) {
+    const headers = { 'Authorization': `Bearer ${authToken}` };
+    const initResponse = await fetch('/api/upload/init', {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            filename: file.name,
+            size: file.size,
+            hosts: hostsValue,
+            remote_path: remotePath
+        })
+    });
+    if (!initResponse.ok) {
+        return initResponse;
+    }
+    const session = await initResponse.json();
+    
+    let offset = session.offset;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = new Uint8Array(await file.slice(offset, offset + session.chunk_size).arrayBuffer());
+        let response = null;
+        try {
+            response = await fetch(`/api/upload/${session.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { ...headers, 'X-Chunk-CRC32': crc32Hex(chunk) },
+                body: chunk
+            });
+        } catch (error) {
+            console.warn('分片上传中断, 准备续传:', error);
+        }
+        
+        if (response && response.ok) {
+            offset = (await response.json()).offset;
+            retries = 0;
+        } else if (response && response.status !== 409 && response.status !== 400) {
+            return response;
+        } else {
+            // 网络中断、偏移不一致或校验失败: 向服务端查询已接收的字节数后继续
+            if (++retries > CHUNK_RETRIES) {
+                return response || Promise.reject(new Error('分片上传多次失败'));
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            const status = await fetch(`/api/upload/${session.upload_id}`, { headers });
+            if (!status.ok) {
+                return status;
+            }
+            offset = (await status.json()).offset;
+        }
+        setUploadProgress(offset / file.size * 100);
+    }
+    
+    return fetch(`/api/upload/${session.upload_id}/finalize`, {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ async: false })
+    });
+}
+
+function setUploadProgress(progress) {
+    document.querySelector('.progress-fill').style.width = progress + '%';
+    document.querySelector('.progress-text').textContent = Math.round(progress) + '%';
+}
+
+// 上传进度显示, simulate为false时由调用方通过setUploadProgress更新进度
+function showUploadProgress(simulate = true) {
     document.querySelector('.upload-progress').style.display = 'block';
     document.querySelector('.progress-fill').style.width = '0%';
     document.querySelector('.progress-text').textContent = '0%';
+    if (!simulate) {
+        return;
+    }
     
     // 模拟进度
     let progress = 0;
@@ -1367,103 +1526,61 @@ async function validateCurrentToken() {
     }
 }
 
-// 关机状态监控相关变量
-let shutdownMonitoringInterval = null;
-let shutdownMonitoringHosts = [];
+// 关机跟踪: 服务端在预定时间后并发检测目标主机(/api/power), 记录每台主机的
+// scheduled -> unreachable -> down 时间并通过事件流推送, 所有标签页显示同一份进度
+const powerWatches = new Map();
 
-// 启动关机后状态监控
-function startShutdownStatusMonitoring(hostsValue, delayMinutes) {
-    // 清除之前的监控
-    if (shutdownMonitoringInterval) {
-        clearInterval(shutdownMonitoringInterval);
+async function loadPowerWatch(watchId) {
+    try {
+        const response = await fetch(`/api/power/${watchId}`);
+        const data = await response.json();
+        if (data.success) {
+            applyPowerWatch(data.watch, data.watch.hosts, false);
+        }
+    } catch (error) {
+        console.error('读取关机跟踪记录失败:', error);
     }
+}
+
+function applyPowerWatch(watch, hosts, notify) {
+    const previous = powerWatches.get(watch.id);
+    const total = watch.total !== undefined ? watch.total : hosts.length;
+    hosts.forEach(applyPowerHostState);
     
-    // 解析主机列表
-    if (hostsValue === 'all') {
-        // 获取所有主机
-        shutdownMonitoringHosts = Array.from(document.querySelectorAll('#hostsTableBody tr'))
-            .map(row => row.cells[0].textContent);
+    if (watch.status === 'active') {
+        powerWatches.set(watch.id, watch);
     } else {
-        shutdownMonitoringHosts = hostsValue.split(',');
+        powerWatches.delete(watch.id);
+    }
+    if (!notify) {
+        return;
+    }
+    if (watch.status === 'completed' && previous) {
+        reportPowerWatchDone(watch, total);
+    } else if (hosts.some(record => record.state === 'down')) {
+        showNotification(`状态更新: ${watch.summary.down || 0}/${total} 台主机已关机`, 'monitoring');
     }
-    
-    // 计算开始监控的时间（延迟时间 + 30秒缓冲）
-    const startDelay = (delayMinutes * 60 + 30) * 1000;
-    
-    showNotification(`将在 ${delayMinutes} 分钟后开始监控主机状态`, 'monitoring');
-    
-    // 立即标记要关机的主机
-    markHostsAsShuttingDown(shutdownMonitoringHosts);
-    
-    // 延迟后开始监控
-    setTimeout(() => {
-        startActiveShutdownMonitoring();
-    }, startDelay);
 }
 
-// 开始活跃的关机监控
-function startActiveShutdownMonitoring() {
-    let monitoringCount = 0;
-    const maxMonitoringAttempts = 20; // 最多监控20次（约10分钟）
-    
-    showNotification('开始监控主机关机状态...', 'monitoring');
-    
-    shutdownMonitoringInterval = setInterval(async () => {
-        monitoringCount++;
-        
-        // 检查所有目标主机状态
-        await checkShutdownHostsStatus();
-        
-        // 达到最大监控次数后停止
-        if (monitoringCount >= maxMonitoringAttempts) {
-            stopShutdownMonitoring();
-            showNotification('关机状态监控已完成，请手动检查剩余主机状态', 'monitoring');
-        }
-    }, 30000); // 每30秒检查一次
+function applyPowerHostState(record) {
+    if (record.state === 'scheduled' || record.state === 'unreachable') {
+        markHostsAsShuttingDown([record.host]);
+    } else if (record.state === 'down') {
+        updateHostTableStatus(record.host, 'offline');
+    } else {
+        // cancelled / timeout
+        clearShutdownMarks([record.host]);
+    }
 }
 
-// 检查关机主机状态
-async function checkShutdownHostsStatus() {
-    let offlineCount = 0;
-    let onlineCount = 0;
-    
-    for (const hostIp of shutdownMonitoringHosts) {
-        try {
-            const response = await fetch(`/api/ping/host/${hostIp}`);
-            const data = await response.json();
-            
-            if (data.success) {
-                // 更新主机表格状态
-                updateHostTableStatus(hostIp, data.status);
-                
-                // 如果当前在这个主机的详情页面，更新详情状态
-                if (hostDetailModal.style.display === 'flex') {
-                    const currentHost = JSON.parse(hostDetailModal.dataset.hostData || '{}');
-                    if (currentHost.ip === hostIp) {
-                        updateHostStatusDisplay(data.status, data.raw_status, data.response_time, data.timestamp);
-                    }
-                }
-                
-                if (data.status === 'offline') {
-                    offlineCount++;
-                } else {
-                    onlineCount++;
-                }
-            }
-        } catch (error) {
-            console.error(`检查主机 ${hostIp} 状态失败:`, error);
-        }
-    }
-    
-    // 更新统计
-    if (offlineCount > 0 || onlineCount > 0) {
-        showNotification(`状态更新: ${offlineCount} 台主机已关机, ${onlineCount} 台主机仍在线`, 'monitoring');
-    }
-    
-    // 如果所有主机都已离线，停止监控
-    if (offlineCount === shutdownMonitoringHosts.length) {
-        stopShutdownMonitoring();
-        showNotification(`所有 ${offlineCount} 台目标主机已成功关机`, 'shutdown-success');
+function reportPowerWatchDone(watch, total) {
+    const down = watch.summary.down || 0;
+    const timedOut = watch.summary.timeout || 0;
+    if (down === total) {
+        const seconds = Math.max(0, Math.round(watch.finished_at - watch.due_at));
+        showNotification(`所有 ${down} 台目标主机已成功关机 (预定时间后 ${seconds} 秒确认)`, 'shutdown-success');
+    } else if (timedOut > 0) {
+        showNotification(`关机跟踪结束: ${down} 台主机已关机, ${timedOut} 台主机在期限内仍在线, 请手动检查`, 'monitoring');
     }
 }
 
@@ -1512,17 +1629,6 @@ function updateHostTableStatus(hostIp, status) {
     updateStatsFromTable();
 }
 
-// 停止关机监控
-function stopShutdownMonitoring() {
-    if (shutdownMonitoringInterval) {
-        clearInterval(shutdownMonitoringInterval);
-        shutdownMonitoringInterval = null;
-    }
-    // 清除视觉标记
-    clearShutdownMarks();
-    shutdownMonitoringHosts = [];
-}
-
 // 标记主机为关机状态
 function markHostsAsShuttingDown(hostIps) {
     const tbody = document.getElementById('hostsTableBody');
@@ -1538,13 +1644,15 @@ function markHostsAsShuttingDown(hostIps) {
 }
 
 // 清除关机标记
-function clearShutdownMarks() {
+function clearShutdownMarks(hostIps) {
     const tbody = document.getElementById('hostsTableBody');
     const rows = tbody.querySelectorAll('tr');
     
     for (const row of rows) {
-        row.classList.remove('host-shutting-down');
-        row.classList.remove('status-monitoring');
+        if (hostIps.includes(row.cells[0].textContent)) {
+            row.classList.remove('host-shutting-down');
+            row.classList.remove('status-monitoring');
+        }
     }
 }
 
@@ -1582,7 +1690,4 @@ function updateStatsFromTable() {
 }
 
 // 定期检查token有效性
-setInterval(validateCurrentToken, 5 * 60 * 1000); // 每5分钟检查一次
-
-// 启动自动刷新
-setTimeout(startAutoRefresh, 5000); 
\ No newline at end of file
+setInterval(validateCurrentToken, 5 * 60 * 1000); // 每5分钟检查一次
\ No newline at end of file
@@ -68,8 +68,12 @@ scan_active_hosts() {
     # 创建临时文件存储扫描结果
     SCAN_RESULT="/tmp/network_scan_$(date +%s).txt"
     
-    # 使用nmap扫描网络（如果可用）
-    if command -v nmap >/dev/null 2>&1; then
+    # 优先使用后端的并发扫描(ICMP/TCP同时探测, 一个/24约1秒), 其次nmap, 都没有时逐个ping
+    BACKEND_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/../backend" && pwd)"
+    if command -v python3 >/dev/null 2>&1 && [ -f "$BACKEND_DIR/utils/discovery.py" ]; then
+        log_info "并发扫描网络段: $NETWORK_SEGMENT"
+        (cd "$BACKEND_DIR" && python3 -m utils.discovery "$NETWORK_SEGMENT" --port 22) > $SCAN_RESULT
+    elif command -v nmap >/dev/null 2>&1; then
         log_info "使用nmap扫描网络段: $NETWORK_SEGMENT"
         nmap -sn $NETWORK_SEGMENT | grep "Nmap scan report" | awk '{print $5}' > $SCAN_RESULT
     else